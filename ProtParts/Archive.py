@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import os
+import time
+import zipfile
+
+class Archive():
+
+
+    """
+    Output archive of result files
+
+    Result files are streamed into their final form as they are written: entries of
+    one zip file, one gzip file each, or plain files. Nothing is re-read or
+    re-compressed at the end.
+    """
+
+    def __init__(self, output_dir, zip_file=None, compress='zip', num_workers=1):
+        """
+        Parameters
+        ----------
+        output_dir : str
+            Path to output directory
+        zip_file : str
+            Path to zip file, required if compress is 'zip'
+        compress : str
+            'zip': entries of the zip file
+            'gzip': one gzip file per result
+            'none': plain files
+        num_workers : int
+            Number of threads writing results in the background. Results of
+            different thresholds are compressed in parallel with 'gzip' and 'none';
+            a zip file is written by one thread at a time
+        """
+        if compress not in ['zip', 'gzip', 'none']:
+            raise ValueError(f"Invalid compression: {compress}")
+        if compress == 'zip' and zip_file is None:
+            raise ValueError("zip_file is required for zip compression")
+
+        self.output_dir = output_dir
+        self.zip_file = zip_file
+        self.compress = compress
+        self.zipout = zipfile.ZipFile(zip_file, 'w', compression=zipfile.ZIP_DEFLATED) if compress == 'zip' else None
+
+        if num_workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=1 if compress == 'zip' else num_workers)
+        else:
+            self.executor = None
+        self.futures = []
+
+
+    def link(self, name, binary=False):
+        """
+        Parameters
+        ----------
+        name : str
+            File name of the result
+        binary : bool
+            Binary result
+
+        Returns
+        -------
+        link : str
+            Path to the file holding the result
+        """
+        if self.compress == 'zip':
+            return self.zip_file
+        elif self.compress == 'gzip' and not binary:
+            return os.path.join(self.output_dir, name + '.gz')
+        else:
+            return os.path.join(self.output_dir, name)
+
+
+    def write(self, name, writer, binary=False):
+        """
+        Write a result
+
+        Parameters
+        ----------
+        name : str
+            File name of the result
+        writer : callable
+            Function writing the result to the file object passed as its only argument
+        binary : bool
+            The writer needs a binary file object. Binary results are already
+            compressed, so they are stored without another compression
+
+        Returns
+        -------
+        link : str
+            Path to the file holding the result
+        """
+        if self.executor is None:
+            self._write(name, writer, binary)
+        else:
+            self.futures.append(self.executor.submit(self._write, name, writer, binary))
+        return self.link(name, binary)
+
+
+    def _write(self, name, writer, binary):
+        """
+        Stream a result to its destination
+        """
+        if self.compress == 'zip':
+            zip_info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            zip_info.compress_type = zipfile.ZIP_STORED if binary else zipfile.ZIP_DEFLATED
+            with self.zipout.open(zip_info, 'w', force_zip64=True) as raw:
+                if binary:
+                    writer(raw)
+                else:
+                    with io.TextIOWrapper(raw, encoding='utf-8') as f:
+                        writer(f)
+        elif self.compress == 'gzip' and not binary:
+            with gzip.open(self.link(name, binary), 'wt', encoding='utf-8') as f:
+                writer(f)
+        else:
+            with open(self.link(name, binary), 'wb' if binary else 'w') as f:
+                writer(f)
+
+
+    def close(self):
+        """
+        Wait for background writes and close the zip file
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            # raise the first error of the background writes
+            for future in self.futures:
+                future.result()
+        if self.zipout is not None:
+            self.zipout.close()
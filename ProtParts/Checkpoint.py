@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+class Checkpoint():
+
+
+    """
+    Stage checkpoints of a run
+
+    Each stage result is pickled to the checkpoint directory and recorded in
+    manifest.json with a key of the stage inputs and parameters. With resume, a
+    stage whose key matches the manifest is loaded instead of recomputed. Keys are
+    chained, so a changed input invalidates every later stage. Without a
+    checkpoint directory, stages are run and nothing is saved.
+    """
+
+    def __init__(self, checkpoint_dir, resume=False):
+        """
+        Parameters
+        ----------
+        checkpoint_dir : str
+            Path to checkpoint directory. None: no checkpoints
+        resume : bool
+            Load completed stages. False: recompute and overwrite every stage
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.resume = resume and checkpoint_dir is not None
+        self.manifest_file = None if checkpoint_dir is None else os.path.join(checkpoint_dir, 'manifest.json')
+        if checkpoint_dir is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+        self.manifest = {}
+        if self.resume and os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                self.manifest = json.load(f)
+        # stages may be saved from background threads
+        self.lock = threading.Lock()
+
+
+    @staticmethod
+    def key(*parts):
+        """
+        Parameters
+        ----------
+        parts : tuple
+            Stage inputs and parameters, usually starting with the key of the previous stage
+
+        Returns
+        -------
+        key : str
+            Key of the stage
+        """
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+    @staticmethod
+    def file_key(file_path, chunk_size=1<<20):
+        """
+        Parameters
+        ----------
+        file_path : str
+            Path to input file
+
+        Returns
+        -------
+        key : str
+            Key of the file content
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+    def get(self, stage, key):
+        """
+        Parameters
+        ----------
+        stage : str
+            Stage name
+        key : str
+            Key of the stage
+
+        Returns
+        -------
+        found : bool
+            The stage is completed with the same key
+        result : object
+            Result of the stage. None if not found
+        """
+        entry = self.manifest.get(stage)
+        if not self.resume or entry is None or entry['key'] != key:
+            return False, None
+        stage_file = os.path.join(self.checkpoint_dir, entry['file'])
+        if not os.path.exists(stage_file):
+            return False, None
+        with open(stage_file, 'rb') as f:
+            return True, pickle.load(f)
+
+
+    def save(self, stage, key, result):
+        """
+        Parameters
+        ----------
+        stage : str
+            Stage name
+        key : str
+            Key of the stage
+        result : object
+            Result of the stage
+        """
+        if self.checkpoint_dir is None:
+            return
+        file_name = stage + '.pkl'
+        self._replace(file_name, lambda f: pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL), 'wb')
+        with self.lock:
+            self.manifest[stage] = {'key':key, 'file':file_name}
+            self._replace('manifest.json', lambda f: json.dump(self.manifest, f, indent=4), 'w')
+
+
+    def run(self, stage, key, fn, *args, **kwargs):
+        """
+        Load a completed stage, or run it and save its result
+
+        Parameters
+        ----------
+        stage : str
+            Stage name
+        key : str
+            Key of the stage
+        fn : callable
+            Function computing the stage result from args and kwargs
+
+        Returns
+        -------
+        result : object
+            Result of the stage
+        """
+        found, result = self.get(stage, key)
+        if not found:
+            result = fn(*args, **kwargs)
+            self.save(stage, key, result)
+        return result
+
+
+    def _replace(self, file_name, writer, mode):
+        """
+        Write a file next to its destination and move it in place, so an
+        interrupted write never leaves a partial checkpoint
+        """
+        file_path = os.path.join(self.checkpoint_dir, file_name)
+        with open(file_path + '.tmp', mode) as f:
+            writer(f)
+        os.replace(file_path + '.tmp', file_path)
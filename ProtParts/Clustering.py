@@ -1,6 +1,4 @@
-import networkx as nx
 import operator
-from sklearn.metrics import silhouette_samples
 import numpy as np
 from .utils import hobohm1
 
@@ -180,7 +178,7 @@ class Cluster:
     #         return self._silhouette(matrix)
 
     
-    def silhouette(self, measurement):
+    def silhouette(self, measurement, distances=None, symmetric=False):
         """
         Silhouette score
 
@@ -188,41 +186,125 @@ class Cluster:
         ----------
         measurement : tuple
             List of measurement (seq1, seq2, measurement)
+        distances : DistanceMatrix
+            Distance matrix of the measurement covering every sequence of the
+            clusters, reused across thresholds. None: built from the measurement
+        symmetric : bool
+            The measurement is a canonical edge table, see DistanceMatrix
         
         Returns
         -------
         metric : float
             Silhouette score
         """
+        from sklearn.metrics import silhouette_samples
         data_list = list(self.index().keys())
         data_label = list(self.index().values())
 
         if len(self.clusters) == 1 or len(self.clusters) == len(data_list):
             return None, (data_list, data_label, None)
         else:
-            pivot = np.ones((len(data_list), len(data_list))) * 11
-            data_dict = dict(zip(data_list, range(len(data_list))))
-            for row in measurement:
-                seq1, seq2, measure = row[0], row[1], row[2]
-                if (seq1 in data_dict) and (seq2 in data_dict):
-                    i = data_dict[seq1]
-                    j = data_dict[seq2]
-                    pivot[i, j] = measure
-            
-            np.fill_diagonal(pivot, 0)
-            sample_silhouette_values = silhouette_samples(pivot, data_label, metric='precomputed')
+            if distances is None:
+                distances = DistanceMatrix(data_list, measurement, symmetric=symmetric)
+            positions = distances.positions(data_list)
+
+            if len(positions) == len(distances):
+                # labels in matrix order, so the matrix is used without a copy
+                labels = np.empty(len(positions), dtype=np.int64)
+                labels[positions] = data_label
+                sample_silhouette_values = silhouette_samples(distances.matrix, labels, metric='precomputed')[positions]
+            else:
+                pivot = distances.matrix[np.ix_(positions, positions)]
+                sample_silhouette_values = silhouette_samples(pivot, data_label, metric='precomputed')
             metric = np.mean(sample_silhouette_values)
 
             return metric, (data_list, data_label, sample_silhouette_values)
 
 
+class DistanceMatrix:
+
+    """
+    Dense distance matrix of the measurement
+
+    The distances do not depend on the clustering threshold, so the matrix is
+    built once, on first use, and shared by the silhouettes of all thresholds.
+    Pairs without a hit get the distance missing, and the diagonal is 0.
+    """
+
+    def __init__(self, ids, measurement, missing=11, symmetric=False):
+        """
+        Parameters
+        ----------
+        ids : list
+            Sequence ids, the row order of the matrix
+        measurement : tuple
+            List of measurement (seq1, seq2, measurement)
+        missing : float
+            Distance of pairs without a hit
+        symmetric : bool
+            The measurement is a canonical edge table, whose edges fill both
+            directions. False: each hit fills its own direction only
+        """
+        self.ids = list(ids)
+        self.missing = missing
+        self.symmetric = symmetric
+        self._index = dict(zip(self.ids, range(len(self.ids))))
+        self._measurement = measurement
+        self._matrix = None
+
+
+    def __len__(self):
+        """
+        Returns
+        -------
+        length : int
+            Number of sequences
+        """
+        return len(self.ids)
+
+
+    @property
+    def matrix(self):
+        """
+        Distance matrix, built from the measurement on first use
+        """
+        if self._matrix is None:
+            pivot = np.full((len(self.ids), len(self.ids)), self.missing, dtype=np.float64)
+            edges = [(self._index[row[0]], self._index[row[1]], row[2]) for row in self._measurement if (row[0] in self._index) and (row[1] in self._index)]
+            if edges:
+                i, j, measure = (np.asarray(col) for col in zip(*edges))
+                if self.symmetric:
+                    pivot[j, i] = measure
+                pivot[i, j] = measure
+            np.fill_diagonal(pivot, 0)
+            self._matrix = pivot
+            # the measurement is not needed anymore
+            self._measurement = None
+        return self._matrix
+
+
+    def positions(self, data):
+        """
+        Parameters
+        ----------
+        data : list
+            Sequence ids
+
+        Returns
+        -------
+        positions : np.array
+            Row of each sequence in the matrix
+        """
+        return np.fromiter((self._index[name] for name in data), dtype=np.int64, count=len(data))
+
+
 class Clustering:
 
     """
     Clustering methods
     """
 
-    def __init__(self, threshold, method, measurement_type='distance'):
+    def __init__(self, threshold, method, measurement_type='distance', symmetric=False):
         """
         Parameters
         ----------
@@ -232,6 +314,9 @@ class Clustering:
             Clustering method
         measurement_type : str
             Type of measurement (distance or similarity)
+        symmetric : bool
+            The measurement is a canonical edge table, whose edges hold for both
+            directions, see utils.canonical_edges
         
         Returns
         -------
@@ -252,6 +337,7 @@ class Clustering:
         if measurement_type not in ['distance', 'similarity']:
             raise ValueError('Invalid measurement type: {}'.format(measurement_type))
         self.measurement_type = measurement_type
+        self.symmetric = symmetric
     
 
     def clustering(self, sequences, measurement):
@@ -270,6 +356,7 @@ class Clustering:
         result : Cluster
             Clustered sequences
         """
+        import networkx as nx
         if self.measurement_type == 'distance':
             op = operator.le
         elif self.measurement_type == 'similarity':
@@ -301,6 +388,7 @@ class Clustering:
         result : Cluster
             Clustered sequences
         """
+        import networkx as nx
         G = nx.Graph()
         #nodes = list(map(lambda x:x.id, sequences))
         nodes = list(sequences.keys())
@@ -334,7 +422,7 @@ class Clustering:
             Clustered sequences
         """
         
-        result = hobohm1(sequences, measurement, self.threshold, op, reduce_redundancy=False)
+        result = hobohm1(sequences, measurement, self.threshold, op, reduce_redundancy=False, symmetric=self.symmetric)
 
         return Cluster(result)
 
@@ -401,11 +489,14 @@ class Clustering:
         result : Cluster
             Optimized cluster
         """
+        import networkx as nx
         
         #clust = Clustering(threshold=threshold, method='graph', measurement_type='distance')
         G = self._graph(sequences, measurement, operator.le)
         cluster = Cluster({idx:sorted(list(component)) for idx, component in enumerate(nx.connected_components(G))})
-        silhouette_score, silhouette_score_samples = cluster.silhouette(measurement)
+        # removing a node only removes its row and column of the distances
+        distances = DistanceMatrix(list(sequences), measurement, symmetric=self.symmetric)
+        silhouette_score, silhouette_score_samples = cluster.silhouette(measurement, distances=distances)
 
         silhouette_score_tmp = 99
         silhouette_score_current = silhouette_score
@@ -457,7 +548,7 @@ class Clustering:
                 measurement_new = list(filter(lambda x:(x[0] != node) and (x[1] != node), measurement))
                 G_new = self._graph(sequence_new, measurement_new, operator.le)
                 cluster_new = Cluster({idx:sorted(list(component)) for idx, component in enumerate(nx.connected_components(G_new))})
-                silhouette_score_new, silhouette_score_samples_new = cluster_new.silhouette(measurement_new)
+                silhouette_score_new, silhouette_score_samples_new = cluster_new.silhouette(measurement_new, distances=distances)
                 
                 #print(f"{iter}\t{c}\t{node}\t{silhouette_score_new:.5f}\t{silhouette_score_tmp:.5f}\t{best_step['silhouette_score']:.5f}\t{silhouette_score_new > silhouette_score_tmp}\t{best_step_tmp['silhouette_score'] > best_step['silhouette_score']}")
                 
@@ -480,6 +571,71 @@ class Clustering:
         return result
 
 
+    def split(self, cluster, measurement, max_size):
+        """
+        Split clusters larger than max_size along their weakest edges
+
+        Edges of the oversized clusters are added back from the strongest to the
+        weakest, skipping an edge whenever it would join two components beyond
+        max_size, so only the weakest edges are cut.
+
+        Parameters
+        ----------
+        cluster : Cluster
+            Cluster object from this clustering
+        measurement : tuple
+            List of measurement (seq1, seq2, measurement)
+        max_size : int
+            Maximum cluster size
+        
+        Returns
+        -------
+        result : Cluster
+            Clusters with the oversized clusters split
+        cut_edges : list
+            List of cut edges (seq1, seq2, measurement), one per sequence pair
+        """
+        oversized = [c for c in cluster.clusters.values() if len(c) > max_size]
+        if not oversized:
+            return cluster, []
+
+        if self.measurement_type == 'distance':
+            op, reverse = operator.le, False
+        elif self.measurement_type == 'similarity':
+            op, reverse = operator.ge, True
+
+        nodes = [name for c in oversized for name in c]
+        node_index = dict(zip(nodes, range(len(nodes))))
+        edges = [(node_index[x[0]], node_index[x[1]], x[2]) for x in measurement if (x[0] != x[1]) and (x[0] in node_index) and (x[1] in node_index) and (op(x[2], self.threshold))]
+        edges.sort(key=lambda x:x[2], reverse=reverse)
+
+        disjoint_set = _DisjointSet(len(nodes))
+        for node1, node2, _ in edges:
+            root1 = disjoint_set.find(node1)
+            root2 = disjoint_set.find(node2)
+            if root1 != root2 and disjoint_set.size[root1] + disjoint_set.size[root2] <= max_size:
+                disjoint_set.union(root1, root2)
+
+        # edges left between different components are cut
+        cut_edges = {}
+        for node1, node2, measure in edges:
+            if disjoint_set.find(node1) != disjoint_set.find(node2):
+                cut_edges.setdefault(frozenset((node1, node2)), (nodes[node1], nodes[node2], measure))
+
+        result = {}
+        for c in cluster.clusters.values():
+            if len(c) <= max_size:
+                result[len(result)] = c
+                continue
+            components = {}
+            for name in c:
+                components.setdefault(disjoint_set.find(node_index[name]), []).append(name)
+            for component in components.values():
+                result[len(result)] = sorted(component)
+
+        return Cluster(result), list(cut_edges.values())
+
+
     def optimize(self, sequences, measurement, method='ratio'):
         """
         Optimize the cluster
@@ -501,5 +657,268 @@ class Clustering:
         else:
             raise ValueError(f"Invalid optimization method: {method}")
 
-           
 
+class _DisjointSet:
+
+    """
+    Union-find over integer node indices
+    """
+
+    def __init__(self, num_nodes):
+        """
+        Parameters
+        ----------
+        num_nodes : int
+            Number of nodes
+        """
+        self.parent = list(range(num_nodes))
+        self.size = [1] * num_nodes
+
+
+    def find(self, node):
+        """
+        Parameters
+        ----------
+        node : int
+            Node index
+
+        Returns
+        -------
+        root : int
+            Root of the component containing the node
+        """
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+
+    def union(self, node1, node2):
+        """
+        Parameters
+        ----------
+        node1 : int
+            Node index
+        node2 : int
+            Node index
+
+        Returns
+        -------
+        root : int
+            Root of the merged component, None if both nodes were already connected
+        """
+        root1 = self.find(node1)
+        root2 = self.find(node2)
+        if root1 == root2:
+            return None
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        return root1
+
+
+class MergeTree:
+
+    """
+    Single-linkage merge tree of the measurement graph
+
+    The tree records the order in which connected components merge when edges are
+    added from the strongest to the weakest measurement, and the measurement at each
+    merge. The clusters of the graph clustering at any threshold are the components
+    after replaying the merges that pass the threshold.
+    """
+
+    def __init__(self, ids, left, right, measure, measurement_type='distance'):
+        """
+        Parameters
+        ----------
+        ids : list
+            Sequence ids, the node order of the tree
+        left : np.array
+            Index of the first node of each merge
+        right : np.array
+            Index of the second node of each merge
+        measure : np.array
+            Measurement of each merge, in merge order
+        measurement_type : str
+            Type of measurement (distance or similarity)
+        """
+        if measurement_type not in ['distance', 'similarity']:
+            raise ValueError('Invalid measurement type: {}'.format(measurement_type))
+        self.ids = list(ids)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.measure = np.asarray(measure, dtype=np.float64)
+        self.measurement_type = measurement_type
+
+        # merge keys in ascending order, and max component size after each merge
+        self._key = self.measure if measurement_type == 'distance' else -self.measure
+        disjoint_set = _DisjointSet(len(self.ids))
+        max_size = np.ones(len(self.measure), dtype=np.int64)
+        current_max = 1
+        for i, (node1, node2) in enumerate(zip(self.left.tolist(), self.right.tolist())):
+            root = disjoint_set.union(node1, node2)
+            current_max = max(current_max, disjoint_set.size[root])
+            max_size[i] = current_max
+        self._max_size = max_size
+
+
+    def __len__(self):
+        """
+        Returns
+        -------
+        length : int
+            Number of merges
+        """
+        return len(self.measure)
+
+
+    @classmethod
+    def build(cls, sequences, measurement, measurement_type='distance'):
+        """
+        Build the merge tree from the measurement
+
+        Parameters
+        ----------
+        sequences : dict
+            Dict of sequences
+        measurement : tuple
+            List of measurement (seq1, seq2, measurement)
+        measurement_type : str
+            Type of measurement (distance or similarity)
+
+        Returns
+        -------
+        tree : MergeTree
+            Merge tree
+        """
+        ids = list(sequences.keys())
+        node_index = dict(zip(ids, range(len(ids))))
+
+        # same edge selection as Clustering._graph, without the threshold
+        edges = [(node_index[x[0]], node_index[x[1]], x[2]) for x in measurement if (x[0] != x[1]) and (x[0] in node_index) and (x[1] in node_index)]
+        if edges:
+            node1, node2, measure = (np.asarray(col) for col in zip(*edges))
+        else:
+            node1, node2, measure = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        key = measure if measurement_type == 'distance' else -measure
+        order = np.argsort(key, kind='stable')
+
+        disjoint_set = _DisjointSet(len(ids))
+        merges = []
+        for i in order.tolist():
+            if disjoint_set.union(int(node1[i]), int(node2[i])) is not None:
+                merges.append(i)
+                if len(merges) == len(ids) - 1:
+                    break
+        merges = np.asarray(merges, dtype=np.int64)
+
+        return cls(ids, node1[merges], node2[merges], measure[merges], measurement_type)
+
+
+    def _num_merges(self, threshold):
+        """
+        Number of merges passing the threshold
+        """
+        key = threshold if self.measurement_type == 'distance' else -threshold
+        return int(np.searchsorted(self._key, key, side='right'))
+
+
+    def cluster(self, threshold):
+        """
+        Clusters at the threshold
+
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+
+        Returns
+        -------
+        result : Cluster
+            Clustered sequences, identical to the graph clustering at the threshold
+        """
+        num_merges = self._num_merges(threshold)
+        disjoint_set = _DisjointSet(len(self.ids))
+        for node1, node2 in zip(self.left[:num_merges].tolist(), self.right[:num_merges].tolist()):
+            disjoint_set.union(node1, node2)
+
+        # number clusters by their first member in node order, like nx.connected_components
+        components = {}
+        for node, seq_id in enumerate(self.ids):
+            components.setdefault(disjoint_set.find(node), []).append(seq_id)
+        result = {idx:sorted(component) for idx, component in enumerate(components.values())}
+        return Cluster(result)
+
+
+    def num_clusters(self, threshold):
+        """
+        Number of clusters at the threshold
+
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+
+        Returns
+        -------
+        num_clusters : int
+            Number of clusters
+        """
+        return len(self.ids) - self._num_merges(threshold)
+
+
+    def max_cluster_size(self, threshold):
+        """
+        Size of the largest cluster at the threshold
+
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+
+        Returns
+        -------
+        size : int
+            Maximum cluster size
+        """
+        if len(self.ids) == 0:
+            return 0
+        num_merges = self._num_merges(threshold)
+        if num_merges == 0:
+            return 1
+        return int(self._max_size[num_merges - 1])
+
+
+    def save(self, out_file):
+        """
+        Save the merge tree in compressed numpy format
+
+        Parameters
+        ----------
+        out_file : str
+            Path to output file (.npz)
+        """
+        np.savez_compressed(out_file, ids=np.array(self.ids, dtype=str), left=self.left, right=self.right,
+                            measure=self.measure, measurement_type=np.array(self.measurement_type))
+
+
+    @classmethod
+    def load(cls, tree_file):
+        """
+        Load a merge tree saved with MergeTree.save
+
+        Parameters
+        ----------
+        tree_file : str
+            Path to merge tree file (.npz)
+
+        Returns
+        -------
+        tree : MergeTree
+            Merge tree
+        """
+        with np.load(tree_file) as data:
+            return cls(data['ids'].tolist(), data['left'], data['right'], data['measure'], str(data['measurement_type']))
@@ -1,14 +1,18 @@
 import subprocess
+import json
 import os
+import shlex
 import shutil
 from .utils import read_blastp
 
+BLASTP_OUTFMT = "6 qseqid sseqid evalue nident qlen slen"
+
 class Measure:
 
     def __init__(self):
         pass
 
-    def blastp(self, sequences, makeblastdb_exec, blastp_exec, tmp_dir=None, **kwargs):
+    def blastp(self, sequences, makeblastdb_exec, blastp_exec, tmp_dir=None, merge=None, **kwargs):
         """
         Run blastp
 
@@ -20,6 +24,9 @@ class Measure:
             Path to blastp executable
         tmp_dir : str
             Path to temporary directory
+        merge : str
+            Merge rule of canonical edges while reading the hits, see
+            utils.read_blastp. None: keep the hits of both directions
         kwargs : dict
             Keyword arguments for blastp
         
@@ -51,25 +58,185 @@ class Measure:
         for key, value in kwargs.items():
             arglist.append('-' + key)
             arglist.append(str(value))
-        cmd = [blastp_exec, "-query", tmp_seq_file, "-db", tmp_db_file, "-out", tmp_blast_file, "-outfmt", "6 qseqid sseqid evalue nident qlen slen"] + arglist
+        cmd = [blastp_exec, "-query", tmp_seq_file, "-db", tmp_db_file, "-out", tmp_blast_file, "-outfmt", BLASTP_OUTFMT] + arglist
         # Run blastp without stdout
         subprocess.run(cmd, shell=False, stdout=subprocess.DEVNULL) 
         
         # read blastp output
         # blastp outfmt 6: qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore
-        measurement = read_blastp(tmp_blast_file)
+        measurement = read_blastp(tmp_blast_file, merge=merge)
         
         # remove temporary directory
         # shutil.rmtree(tmp_dir)
 
 
         return measurement
-    
 
 
+    def blastp_shards(self, sequences, makeblastdb_exec, blastp_exec, shard_dir, num_shards, input_file=None, **kwargs):
+        """
+        Prepare an all-vs-all blastp search split into query shards
+
+        The database of all sequences is built once in shard_dir, and the queries
+        are split into num_shards FASTA files. Every shard searches the whole
+        database, so E-values are the same as in one search. Each shard writes to
+        a .part file renamed on success, so a missing output is an unfinished or
+        failed shard. shard_dir must be visible to every node.
+
+        Parameters
+        ----------
+        sequences : dict
+            Dict of sequences
+        makeblastdb_exec : str
+            Path to makeblastdb executable
+        blastp_exec : str
+            Path to blastp executable on the nodes
+        shard_dir : str
+            Path to shared shard directory
+        num_shards : int
+            Number of query shards
+        input_file : str
+            Path to the input sequence file, recorded in the manifest
+        kwargs : dict
+            Keyword arguments for blastp
+
+        Returns
+        -------
+        manifest_file : str
+            Path to the manifest (manifest.json), with one command per shard.
+            The commands are also written one per line to commands.sh
+        """
+        shard_dir = os.path.abspath(shard_dir)
+        os.makedirs(os.path.join(shard_dir, 'queries'), exist_ok=True)
+        os.makedirs(os.path.join(shard_dir, 'hits'), exist_ok=True)
+        num_shards = max(1, min(num_shards, len(sequences)))
+
+        seq_file = os.path.join(shard_dir, 'db.fasta')
+        with open(seq_file, 'w') as f:
+            for seqid, seq in sequences.items():
+                f.write('>{}\n{}\n'.format(seq.id, seq.seq))
+        db_file = os.path.join(shard_dir, 'db')
+        cmd = [makeblastdb_exec, "-in", seq_file, "-dbtype", "prot", "-out", db_file]
+        subprocess.run(cmd, shell=False, stdout=subprocess.DEVNULL, check=True)
+
+        arglist = []
+        for key, value in kwargs.items():
+            arglist.append('-' + key)
+            arglist.append(str(value))
 
+        # contiguous chunks of nearly equal size
+        seq_ids = list(sequences)
+        bounds = [len(seq_ids) * i // num_shards for i in range(num_shards + 1)]
+        shards = []
+        for i in range(num_shards):
+            query_file = os.path.join(shard_dir, 'queries', f"shard_{i}.fasta")
+            with open(query_file, 'w') as f:
+                for seqid in seq_ids[bounds[i]:bounds[i + 1]]:
+                    f.write('>{}\n{}\n'.format(sequences[seqid].id, sequences[seqid].seq))
+            output_file = os.path.join(shard_dir, 'hits', f"shard_{i}.tab")
+            cmd = [blastp_exec, "-query", query_file, "-db", db_file, "-out", output_file + '.part', "-outfmt", BLASTP_OUTFMT] + arglist
+            command = ' '.join(map(shlex.quote, cmd)) + ' && mv ' + shlex.quote(output_file + '.part') + ' ' + shlex.quote(output_file)
+            shards.append({'shard':i,
+                           'query':query_file,
+                           'output':output_file,
+                           'num_queries':bounds[i + 1] - bounds[i],
+                           'command':command})
+
+        manifest = {'database':db_file,
+                    'input_file':os.path.abspath(input_file) if input_file is not None else None,
+                    'num_sequences':len(seq_ids),
+                    'outfmt':BLASTP_OUTFMT,
+                    'shards':shards}
+        manifest_file = os.path.join(shard_dir, 'manifest.json')
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        with open(os.path.join(shard_dir, 'commands.sh'), 'w') as f:
+            f.writelines(shard['command'] + '\n' for shard in shards)
+
+        return manifest_file
+
+
+    def shard_status(self, manifest_file):
+        """
+        Check the outputs of the shards in a manifest
 
+        Parameters
+        ----------
+        manifest_file : str
+            Path to the manifest from blastp_shards
 
+        Returns
+        -------
+        status : dict
+            Dict of 'done', 'missing' (not started or failed) and 'partial'
+            (running, or interrupted, or a truncated output) shard indices
+        """
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+
+        status = {'done':[], 'missing':[], 'partial':[]}
+        for shard in manifest['shards']:
+            output_file = shard['output']
+            if os.path.exists(output_file):
+                status['done' if self._complete_output(output_file) else 'partial'].append(shard['shard'])
+            elif os.path.exists(output_file + '.part'):
+                status['partial'].append(shard['shard'])
+            else:
+                status['missing'].append(shard['shard'])
+        return status
+
+
+    def merge_shards(self, manifest_file, merge=None, input_file=None, num_sequences=None):
+        """
+        Collect the outputs of all shards into one measurement
 
+        Parameters
+        ----------
+        manifest_file : str
+            Path to the manifest from blastp_shards
+        merge : str
+            Merge rule of canonical edges while reading the hits, see
+            utils.read_blastp. None: keep the hits of both directions
+        input_file : str
+            Path to the input sequence file, checked against the manifest
+        num_sequences : int
+            Number of unique input sequences, checked against the manifest
 
+        Returns
+        -------
+        measurement : tuple
+            List of measurement (seq1, seq2, evalue, nident, qlen, slen)
 
+        Raises
+        ------
+        ValueError
+            If any shard is missing or partial, or the search was prepared
+            for another input
+        """
+        status = self.shard_status(manifest_file)
+        if status['missing'] or status['partial']:
+            raise ValueError(f"Unfinished BLASTP shards: missing {status['missing']}, partial {status['partial']}")
+
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+        if input_file is not None and manifest.get('input_file') is not None and manifest['input_file'] != os.path.abspath(input_file):
+            raise ValueError(f"BLASTP shards were prepared for {manifest['input_file']}, not {os.path.abspath(input_file)}")
+        if num_sequences is not None and manifest['num_sequences'] != num_sequences:
+            raise ValueError(f"BLASTP shards were prepared for {manifest['num_sequences']} sequences, not {num_sequences}")
+        # queries are disjoint across shards, so the outputs are read as one
+        return read_blastp([shard['output'] for shard in manifest['shards']], merge=merge)
+
+
+    @staticmethod
+    def _complete_output(output_file):
+        """
+        An output is only renamed once blastp succeeds, so it is complete unless
+        it was copied in truncated, without a final newline. An empty output is
+        complete: low complexity queries may not even hit themselves
+        """
+        with open(output_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
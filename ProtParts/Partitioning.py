@@ -1,4 +1,8 @@
 import random
+import bisect
+import operator
+import warnings
+import numpy as np
 # import time
 
 # class Partition:
@@ -140,13 +144,301 @@ class Partitioning:
         ----------
         num_partitions : int
             Number of partitions
+        num_sequences : int
+            Number of sequences
         method : str
-            Partitioning method
+            Partitioning method ('greedy' or 'random')
         """
+        if method not in ['greedy', 'random']:
+            raise ValueError(f"Invalid partitioning method: {method}")
         self.num_partitions = num_partitions
         self.num_sequences = num_sequences
         self.method = method
 
+
+    def partition(self, clusters, random_seed=0):
+        """
+        Partition clusters with the partitioning method
+
+        Parameters
+        ----------
+        clusters : Cluster
+            Cluster object
+        random_seed : int
+            Random seed
+        
+        Returns
+        -------
+        partitions : dict
+            Dict of partitions
+        """
+        if self.method == 'greedy':
+            return self.greedy_partitioning(clusters, random_seed=random_seed)
+        elif self.method == 'random':
+            return self.random_partitioning(clusters, random_seed=random_seed)
+
+
+    def greedy_partitioning(self, clusters, random_seed=None):
+        """
+        Greedy partitioning of clusters
+
+        Clusters are placed largest first into the partition with the least remaining
+        capacity that still fits them (best-fit decreasing), or into the partition
+        with the most remaining capacity if none fits. Partitions are kept sorted by
+        remaining capacity and searched by bisection. Clusters may still exceed the
+        capacity, with a warning; check with excess.
+
+        Parameters
+        ----------
+        clusters : Cluster
+            Cluster object
+        random_seed : int
+            Random seed for breaking ties between clusters of equal size and
+            partitions of equal remaining capacity. None: break ties by index
+        
+        Returns
+        -------
+        partitions : dict
+            Dict of partitions
+        """
+        partitions = {i:dict() for i in range(self.num_partitions)}
+        cluster_ids, sizes = self._check_clusters(clusters)
+        partitions_alloc_size = self._even_split()
+        order, priority = self._greedy_order(sizes, random_seed)
+        sizes, priority = sizes.tolist(), priority.tolist()
+
+        # sorted list of (remaining capacity, tie breaker, partition id)
+        remaining = sorted((size, priority[pidx], pidx) for pidx, size in partitions_alloc_size.items())
+
+        for i in order.tolist():
+            c_id = cluster_ids[i]
+            j = bisect.bisect_left(remaining, (sizes[i], -1))
+            if j == len(remaining):
+                j = bisect.bisect_left(remaining, (remaining[-1][0], -1))
+            left_alloc_size, tie, partition_id = remaining.pop(j)
+            left_alloc_size -= sizes[i]
+            if left_alloc_size < 0:
+                warnings.warn(f"Cluster {c_id} exceeds the capacity of partition {partition_id} by {-left_alloc_size}")
+            partitions[partition_id][c_id] = clusters.clusters[c_id]
+            bisect.insort(remaining, (left_alloc_size, tie, partition_id))
+
+        return partitions
+
+
+    def batch_partitioning(self, clusters, random_seeds):
+        """
+        Partitioning of clusters with the partitioning method for several random
+        seeds at once
+
+        With greedy partitioning, the cluster sizes and capacities are shared by
+        all replicates, and each step places one cluster in every replicate with
+        array operations. Random partitioning is run once per seed. Replicate r is
+        identical to partition(clusters, random_seed=random_seeds[r]).
+
+        Parameters
+        ----------
+        clusters : Cluster
+            Cluster object
+        random_seeds : list
+            List of random seeds, one per replicate
+        
+        Returns
+        -------
+        cluster_ids : list
+            Cluster ids, the column order of assignments
+        assignments : np.array
+            Partition id of each cluster in each replicate, shape (replicates, clusters)
+        """
+        if self.method == 'random':
+            cluster_ids = list(clusters.clusters.keys())
+            column = {c_id:i for i, c_id in enumerate(cluster_ids)}
+            assignments = np.empty((len(random_seeds), len(cluster_ids)), dtype=np.int32)
+            for r, random_seed in enumerate(random_seeds):
+                for partition_id, par in self.random_partitioning(clusters, random_seed=random_seed).items():
+                    assignments[r, [column[c_id] for c_id in par]] = partition_id
+            return cluster_ids, assignments
+
+        cluster_ids, sizes = self._check_clusters(clusters)
+        capacity = np.array(list(self._even_split().values()), dtype=np.int64)
+        num_replicates = len(random_seeds)
+        num_clusters = len(cluster_ids)
+
+        orders = np.empty((num_replicates, num_clusters), dtype=np.int64)
+        priority = np.empty((num_replicates, self.num_partitions), dtype=np.int64)
+        for r, random_seed in enumerate(random_seeds):
+            orders[r], priority[r] = self._greedy_order(sizes, random_seed)
+
+        # least remaining capacity that fits, or else most remaining capacity, then lowest priority
+        remaining = np.tile(capacity, (num_replicates, 1))
+        tie = self.num_partitions - 1 - priority
+        rows = np.arange(num_replicates)
+        assignments = np.empty((num_replicates, num_clusters), dtype=np.int32)
+        for step in range(num_clusters):
+            c = orders[:, step]
+            fits = remaining >= sizes[c][:, None]
+            best_fit = np.argmin(np.where(fits, remaining * self.num_partitions + priority, np.iinfo(np.int64).max), axis=1)
+            partition_id = np.where(fits.any(axis=1), best_fit, np.argmax(remaining * self.num_partitions + tie, axis=1))
+            remaining[rows, partition_id] -= sizes[c]
+            assignments[rows, c] = partition_id
+
+        if (remaining < 0).any():
+            warnings.warn(f"Clusters exceed the partition capacity in {int((remaining < 0).any(axis=1).sum())} replicates")
+
+        return cluster_ids, assignments
+
+
+    def leakage(self, partitions, measurement, bins=(0, 1e-50, 1e-20, 1e-10, 1e-5, 1e-3, 1e-1, float('inf'))):
+        """
+        Hits across partition boundaries
+
+        Parameters
+        ----------
+        partitions : dict
+            Dict of partitions
+        measurement : tuple
+            List of measurement (seq1, seq2, evalue, ...)
+        bins : tuple
+            E-value bin edges
+        
+        Returns
+        -------
+        leakage : dict
+            num_hits: number of hits between partitioned sequences, excluding self hits
+            num_cross: number of hits across partitions
+            pair_counts: np.array of cross-partition hits per partition pair (i <= j)
+            bins: E-value bin edges
+            bin_counts: np.array of cross-partition hits per E-value bin
+            closest: (seq1, seq2, evalue, partition1, partition2) of the cross-partition hit
+                with the lowest E-value, None if no hit crosses partitions
+        """
+        partition_index = {name:pidx for pidx, par in partitions.items() for c in par.values() for name in c}
+        num_hits = len(measurement)
+        seq1, seq2, evalue = (list(map(operator.itemgetter(i), measurement)) for i in range(3))
+        # ids are mapped to integer indices once, so partitions are looked up per sequence, not per hit
+        names, index = np.unique(np.array(seq1 + seq2, dtype=str), return_inverse=True)
+        index = index.reshape(-1)
+        index1, index2 = index[:num_hits], index[num_hits:]
+        partition_of = np.fromiter((partition_index.get(name, -1) for name in names.tolist()), dtype=np.int64, count=len(names))
+        partition1, partition2 = partition_of[index1], partition_of[index2]
+        self_hit = index1 == index2
+        evalue = np.array(evalue, dtype=np.float64)
+
+        valid = (partition1 >= 0) & (partition2 >= 0) & ~self_hit
+        cross = valid & (partition1 != partition2)
+        cross_idx = np.flatnonzero(cross)
+
+        partition_lo = np.minimum(partition1[cross_idx], partition2[cross_idx])
+        partition_hi = np.maximum(partition1[cross_idx], partition2[cross_idx])
+        pair_counts = np.bincount(partition_lo * self.num_partitions + partition_hi, minlength=self.num_partitions ** 2).reshape(self.num_partitions, self.num_partitions)
+        bin_counts, bins = np.histogram(evalue[cross_idx], bins=np.asarray(bins, dtype=np.float64))
+
+        if len(cross_idx):
+            i = cross_idx[np.argmin(evalue[cross_idx])]
+            closest = (measurement[i][0], measurement[i][1], float(evalue[i]), int(partition1[i]), int(partition2[i]))
+        else:
+            closest = None
+
+        return {'num_hits':int(valid.sum()), 'num_cross':len(cross_idx), 'pair_counts':pair_counts,
+                'bins':bins, 'bin_counts':bin_counts, 'closest':closest}
+
+
+    def excess(self, partitions):
+        """
+        Number of sequences placed beyond the capacity of the partitions
+
+        Parameters
+        ----------
+        partitions : dict
+            Dict of partitions
+
+        Returns
+        -------
+        excess : int
+            Sum of the overflow of every partition. 0: all partitions fit
+        """
+        partitions_alloc_size = self._even_split()
+        return sum(max(0, sum(len(c) for c in par.values()) - partitions_alloc_size[pidx]) for pidx, par in partitions.items())
+
+
+    def to_partitions(self, clusters, cluster_ids, assignment):
+        """
+        Convert one row of partition assignments to partitions
+
+        Parameters
+        ----------
+        clusters : Cluster
+            Cluster object
+        cluster_ids : list
+            Cluster ids, the order of assignment
+        assignment : np.array
+            Partition id of each cluster
+
+        Returns
+        -------
+        partitions : dict
+            Dict of partitions
+        """
+        partitions = {i:dict() for i in range(self.num_partitions)}
+        for c_id, partition_id in zip(cluster_ids, assignment.tolist()):
+            partitions[partition_id][c_id] = clusters.clusters[c_id]
+        return partitions
+
+
+    def _check_clusters(self, clusters):
+        """
+        Check clusters fit into the partitions
+
+        Parameters
+        ----------
+        clusters : Cluster
+            Cluster object
+
+        Returns
+        -------
+        cluster_ids : list
+            Cluster ids
+        sizes : np.array
+            Cluster sizes
+        """
+        cluster_ids = list(clusters.clusters.keys())
+        sizes = np.array([len(c) for c in clusters.clusters.values()], dtype=np.int64)
+        num_sample = int(sizes.sum())
+        if num_sample != self.num_sequences:
+            raise ValueError(f"Number of sequences in clusters {num_sample} is different from the number of sequences {self.num_sequences}")
+
+        max_alloc_size = max(self._even_split().values())
+        if len(sizes) and sizes.max() > max_alloc_size:
+            raise ValueError(f"Cluster size {sizes.max()} is larger than maximum partition size {max_alloc_size}")
+        return cluster_ids, sizes
+
+
+    def _greedy_order(self, sizes, random_seed=None):
+        """
+        Placement order of clusters and tie-breaking priority of partitions
+
+        Parameters
+        ----------
+        sizes : np.array
+            Cluster sizes
+        random_seed : int
+            Random seed. None: clusters of equal size in input order, partitions by index
+
+        Returns
+        -------
+        order : np.array
+            Cluster indices, largest first
+        priority : np.array
+            Priority of each partition among partitions with equal remaining capacity
+        """
+        if random_seed is None:
+            order = np.argsort(-sizes, kind='stable')
+            priority = np.arange(self.num_partitions)
+        else:
+            rng = np.random.default_rng(random_seed)
+            order = np.lexsort((rng.random(len(sizes)), -sizes))
+            priority = rng.permutation(self.num_partitions)
+        return order, priority
+
     
     def random_partitioning(self, clusters, random_seed=0):
         """
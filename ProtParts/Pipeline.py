@@ -0,0 +1,327 @@
+import tempfile
+from .Clustering import Clustering, DistanceMatrix, MergeTree
+from .Measure import Measure
+from .Partitioning import Partitioning
+from .utils import read_seq, read_blastp, remove_duplicate, hobohm1, write_cluster, write_partition, canonical_edges
+from .settings import MAKEBLASTDB_EXEC, BLASTP_EXEC
+
+class Pipeline():
+
+
+    """
+    In-memory clustering and partitioning session
+
+    Sequences or a precomputed measurement go in, Cluster objects and partitions
+    come out. The prepared sequences, the measurement and the merge tree are kept,
+    so clustering and partitioning at new thresholds reuses them. Nothing is
+    written unless one of the write methods is called.
+    """
+
+    def __init__(self, sequences=None, measurement=None, threshold_r=None, remove_duplicates=True,
+                 makeblastdb_exec=None, blastp_exec=None, tmp_dir=None, num_threads=4, edges=None):
+        """
+        Parameters
+        ----------
+        sequences : dict
+            Dict of sequence id and sequence (SeqRecord or str). None: the sequence
+            ids of the measurement
+        measurement : tuple
+            List of measurement (seq1, seq2, evalue, nident, qlen, slen). None: run
+            BLASTP on the sequences when first needed
+        threshold_r : float
+            Threshold for sequence redundancy reduction. None: skip redundancy reduction
+        remove_duplicates : bool
+            Remove identical sequences
+        makeblastdb_exec : str
+            Path to makeblastdb executable
+        blastp_exec : str
+            Path to blastp executable
+        tmp_dir : str
+            Path to temporary directory for BLASTP. None: a new temporary directory,
+            removed after the run
+        num_threads : int
+            Number of BLASTP threads
+        edges : str
+            Keep one canonical edge per sequence pair with this merge rule ('min',
+            'max' or 'mean'), see utils.canonical_edges. None: keep the hits of
+            both directions
+        """
+        if sequences is None and measurement is None:
+            raise ValueError("Either sequences or measurement is required")
+
+        self.makeblastdb_exec = makeblastdb_exec if makeblastdb_exec is not None else MAKEBLASTDB_EXEC
+        self.blastp_exec = blastp_exec if blastp_exec is not None else BLASTP_EXEC
+        self.tmp_dir = tmp_dir
+        self.num_threads = num_threads
+        self.edges = edges
+        if measurement is not None and edges is not None:
+            measurement = canonical_edges(measurement, merge=edges)
+
+        if sequences is None:
+            # sequence ids in order of first appearance
+            sequences = dict.fromkeys(seq_id for row in measurement for seq_id in row[:2])
+        else:
+            sequences = self._as_records(sequences)
+        self.num_seq = len(sequences)
+        if remove_duplicates and all(seq is not None for seq in sequences.values()):
+            sequences = remove_duplicate(sequences)
+        self.num_seq_nodup = len(sequences)
+
+        self._sequences = sequences
+        self._measurement = measurement
+        self._threshold_r = threshold_r
+        self._tree = None
+        self._distances = None
+        self._clusters = {}
+        self._partitions = {}
+        self._silhouettes = {}
+
+
+    @classmethod
+    def from_fasta(cls, seq_file, **kwargs):
+        """
+        Parameters
+        ----------
+        seq_file : str
+            Path to sequence file
+        kwargs : dict
+            Keyword arguments for Pipeline
+
+        Returns
+        -------
+        pipeline : Pipeline
+            Pipeline of the sequences in the file
+        """
+        return cls(read_seq(seq_file), **kwargs)
+
+
+    @classmethod
+    def from_blastp(cls, blastp_file, **kwargs):
+        """
+        Parameters
+        ----------
+        blastp_file : str
+            Path to blastp output (outfmt 6 qseqid sseqid evalue nident qlen slen)
+        kwargs : dict
+            Keyword arguments for Pipeline
+
+        Returns
+        -------
+        pipeline : Pipeline
+            Pipeline of the hits in the file
+        """
+        # canonical edges are merged while the file is read
+        edges = kwargs.pop('edges', None)
+        pipeline = cls(measurement=read_blastp(blastp_file, merge=edges), **kwargs)
+        pipeline.edges = edges
+        return pipeline
+
+
+    @classmethod
+    def from_tree(cls, tree_file):
+        """
+        Parameters
+        ----------
+        tree_file : str
+            Path to merge tree file (*_mergetree.npz)
+
+        Returns
+        -------
+        pipeline : Pipeline
+            Pipeline of the merge tree. Clustering and partitioning only, without
+            the measurement
+        """
+        tree = MergeTree.load(tree_file)
+        pipeline = cls(sequences=dict.fromkeys(tree.ids))
+        pipeline._tree = tree
+        return pipeline
+
+
+    @staticmethod
+    def _as_records(sequences):
+        """
+        Wrap plain sequence strings in SeqRecord objects
+        """
+        if not any(isinstance(seq, str) for seq in sequences.values()):
+            return dict(sequences)
+        from Bio.Seq import Seq
+        from Bio.SeqRecord import SeqRecord
+        return {seq_id:SeqRecord(Seq(seq), id=seq_id, description='') if isinstance(seq, str) else seq for seq_id, seq in sequences.items()}
+
+
+    @property
+    def measurement(self):
+        """
+        Measurement, computed by BLASTP on first use
+        """
+        if self._measurement is None:
+            if any(seq is None for seq in self._sequences.values()):
+                raise ValueError("Measurement is not available without sequences")
+            measure = Measure()
+            if self.tmp_dir is None:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    self._measurement = measure.blastp(self._sequences, self.makeblastdb_exec, self.blastp_exec, tmp_dir, merge=self.edges, evalue=10, num_threads=self.num_threads)
+            else:
+                self._measurement = measure.blastp(self._sequences, self.makeblastdb_exec, self.blastp_exec, self.tmp_dir, merge=self.edges, evalue=10, num_threads=self.num_threads)
+        return self._measurement
+
+
+    @property
+    def sequences(self):
+        """
+        Sequences after duplicate removal and redundancy reduction
+        """
+        if self._threshold_r is not None:
+            self._sequences = hobohm1(self._sequences, self.measurement, self._threshold_r, reduce_redundancy=True, symmetric=self.edges is not None)
+            self._threshold_r = None
+        return self._sequences
+
+
+    @property
+    def tree(self):
+        """
+        Merge tree of the sequences, built on first use
+        """
+        if self._tree is None:
+            self._tree = MergeTree.build(self.sequences, self.measurement, measurement_type='distance')
+        return self._tree
+
+
+    @property
+    def distances(self):
+        """
+        Distance matrix of the sequences, shared by the silhouettes of all thresholds
+        """
+        if self._distances is None:
+            self._distances = DistanceMatrix(list(self.sequences), self.measurement, symmetric=self.edges is not None)
+        return self._distances
+
+
+    def cluster(self, threshold):
+        """
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+
+        Returns
+        -------
+        cluster : Cluster
+            Clusters of the graph method at the threshold
+        """
+        if threshold not in self._clusters:
+            self._clusters[threshold] = self.tree.cluster(threshold)
+        return self._clusters[threshold]
+
+
+    def partition(self, threshold, num_partitions, method='greedy', split=False, random_seed=0):
+        """
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+        num_partitions : int
+            Number of partitions
+        method : str
+            Partitioning method ('greedy' or 'random')
+        split : bool
+            Split clusters larger than the partition capacity
+        random_seed : int
+            Random seed
+
+        Returns
+        -------
+        partitions : dict
+            Dict of partitions
+        """
+        key = (threshold, num_partitions, method, split, random_seed)
+        if key not in self._partitions:
+            cluster = self.cluster(threshold)
+            partitioner = Partitioning(num_partitions=num_partitions, num_sequences=len(self.sequences), method=method)
+            if split:
+                partition_size = partitioner.partition_size()
+                max_partition_size = partition_size[max(partition_size, key=partition_size.get)]
+                if cluster.num_data(by='max') > max_partition_size:
+                    clust = Clustering(threshold=threshold, method='graph', measurement_type='distance')
+                    cluster, _ = clust.split(cluster, self.measurement, max_partition_size)
+            self._partitions[key] = partitioner.partition(cluster, random_seed=random_seed)
+        return self._partitions[key]
+
+
+    def silhouette(self, threshold):
+        """
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+
+        Returns
+        -------
+        silhouette : float
+            Mean silhouette score. None: fewer than 2 clusters or only singletons
+        silhouette_per_sample : tuple
+            Silhouette per sample (data_list, data_label, values)
+        """
+        if threshold not in self._silhouettes:
+            self._silhouettes[threshold] = self.cluster(threshold).silhouette(self.measurement, distances=self.distances)
+        return self._silhouettes[threshold]
+
+
+    def leakage(self, partitions):
+        """
+        Parameters
+        ----------
+        partitions : dict
+            Dict of partitions from partition
+
+        Returns
+        -------
+        leakage : dict
+            Cross-partition hits, see Partitioning.leakage
+        """
+        partitioner = Partitioning(num_partitions=len(partitions), num_sequences=len(self.sequences))
+        return partitioner.leakage(partitions, self.measurement)
+
+
+    def write_clusters(self, threshold, out_file, fmt='json', **kwargs):
+        """
+        Parameters
+        ----------
+        threshold : float
+            Threshold for clustering
+        out_file : str/file
+            Path to output file, or an open file object
+        fmt : str
+            Output format
+        kwargs : dict
+            Keyword arguments for write_cluster
+        """
+        write_cluster(self.cluster(threshold), out_file, fmt, sequences=self.sequences, method='graph', threshold=threshold, **kwargs)
+
+
+    def write_partitions(self, partitions, out_file, fmt='json', threshold=None, **kwargs):
+        """
+        Parameters
+        ----------
+        partitions : dict
+            Dict of partitions from partition
+        out_file : str/file
+            Path to output file, or an open file object
+        fmt : str
+            Output format
+        threshold : float
+            Threshold for clustering, recorded in the output
+        kwargs : dict
+            Keyword arguments for write_partition
+        """
+        write_partition(partitions, out_file, fmt, sequences=self.sequences, method='graph', threshold=threshold, **kwargs)
+
+
+    def save_tree(self, out_file):
+        """
+        Parameters
+        ----------
+        out_file : str
+            Path to output file (.npz)
+        """
+        self.tree.save(out_file)
@@ -0,0 +1,132 @@
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+
+def max_rss():
+    """
+    Returns
+    -------
+    max_rss : int
+        Maximum resident set size of the process in bytes. None: not
+        available on the platform (no resource module on Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+class Profiler():
+
+
+    """
+    Per-stage instrumentation of a run
+
+    Each stage records its wall time, CPU time, the maximum resident set size of
+    the process and an item count. Optionally, the peak memory allocated in the
+    stage is traced with tracemalloc and the stage is profiled with cProfile,
+    dumped to {profile_dir}/{stage}.prof. Stages must not be nested.
+    """
+
+    def __init__(self, trace_memory=False, profile_dir=None):
+        """
+        Parameters
+        ----------
+        trace_memory : bool
+            Record the peak memory allocated in each stage (slows the run down)
+        profile_dir : str
+            Path to directory of cProfile dumps. None: no profiling
+        """
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+        self.records = []
+        self.start = time.perf_counter()
+        self.logger = logging.getLogger('protparts')
+
+
+    @contextlib.contextmanager
+    def stage(self, name, threshold=None, items=None):
+        """
+        Instrument the stage in the with block
+
+        Parameters
+        ----------
+        name : str
+            Stage name
+        threshold : float/str
+            Threshold of the stage. None: not a per-threshold stage
+        items : int
+            Number of items processed by the stage. Can also be set on the yielded record
+
+        Yields
+        ------
+        record : dict
+            Record of the stage, completed when the block exits
+        """
+        record = {'stage':name, 'threshold':threshold, 'items':items}
+        if self.trace_memory:
+            tracemalloc.start()
+        profile = cProfile.Profile() if self.profile_dir is not None else None
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record['wall_time'] = time.perf_counter() - wall_start
+            record['cpu_time'] = time.process_time() - cpu_start
+            record['max_rss'] = max_rss()
+            record['peak_memory'] = None
+            if self.trace_memory:
+                record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if profile is not None:
+                profile_name = name if threshold is None else f"{name}_{threshold}"
+                record['profile'] = os.path.join(self.profile_dir, profile_name + '.prof')
+                profile.dump_stats(record['profile'])
+            self.records.append(record)
+            self.logger.debug(f"Stage {name}{'' if threshold is None else f' ({threshold})'}: {record['wall_time']:.3f} s wall, {record['cpu_time']:.3f} s CPU" + ('' if record['max_rss'] is None else f", {record['max_rss'] / 2**20:.1f} MiB max RSS"))
+
+
+    def rows(self):
+        """
+        Returns
+        -------
+        rows : list
+            Timing table, header first
+        """
+        rows = [['Stage', 'Threshold', '# items', 'Wall time (s)', 'CPU time (s)', 'Max RSS (MiB)', 'Peak traced memory (MiB)']]
+        for record in self.records:
+            rows.append([record['stage'],
+                         '' if record['threshold'] is None else record['threshold'],
+                         '' if record['items'] is None else record['items'],
+                         f"{record['wall_time']:.3f}",
+                         f"{record['cpu_time']:.3f}",
+                         '' if record['max_rss'] is None else f"{record['max_rss'] / 2**20:.1f}",
+                         '' if record['peak_memory'] is None else f"{record['peak_memory'] / 2**20:.1f}"])
+        return rows
+
+
+    def save(self, out_file):
+        """
+        Parameters
+        ----------
+        out_file : str
+            Path to output JSON file
+        """
+        with open(out_file, 'w') as f:
+            json.dump({'total_wall_time':time.perf_counter() - self.start,
+                       'trace_memory':self.trace_memory,
+                       'stages':self.records}, f, indent=4)
@@ -1,5 +1,6 @@
 
 from string import Template
+import json
 import os
 
 HTML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'template')
@@ -72,42 +73,91 @@ class Report():
         results : list
             List of clustering results
         zip_file : str
-            Path to the zip file
+            Path to the zip file. None: results are not zipped
         """
 
-        html_table = '<table>\n'
-        have_na = False
-        
-        # Add a row to the HTML table for each row in the CSV file
-        for i, row in enumerate(results):
-            if i == 0:  # Assuming the first row is the header
-                html_table += '  <thead>\n    <tr>' + ''.join([f'<th>{cell}</th>' for cell in row]) + '</tr>\n  </thead>\n  <tbody>\n'
-            elif row[-1] == 'NA':
-                html_table += '    <tr>' + ''.join([f'<td>{cell}</td>' for cell in row]) + f'</tr>\n'
-                have_na = True
-            else:
-                html_table += '    <tr>' + ''.join([f'<td>{cell}</td>' for cell in row[:-1]]) + f'<td><a href="{row[-1]}" download>Link</a></td></tr>\n'
-        html_table += '  </tbody>\n</table>\n'
+        # the last column is a download link, or NA
+        have_na = any(row[-1] == 'NA' for row in results[1:])
+        html_table = self._html_table(results[:1] + [row if row[-1] == 'NA' else list(row[:-1]) + [f'<a href="{row[-1]}" download>Link</a>'] for row in results[1:]])
 
         if have_na:
-            html_table += "<br>\n* NA indicates the size of maximum cluster exceeds the maximum partition capacity.\n<br>\n"
+            html_table += "<br>\n* NA indicates the size of maximum cluster exceeds the maximum partition capacity, or the clusters do not fit into the partitions together.\n<br>\n"
 
         with open(os.path.join(HTML_DIR, 'results.html'), 'r') as f:
             template = Template(f.read())
         
+        zip_link = f'<a href="{zip_file}" download>Download zip results</a>' if zip_file else ''
         params_report = template.substitute(results_table=html_table,
-                                            zip_file=zip_file)
+                                            zip_link=zip_link)
         
         self.report += params_report
 
 
 
-    def write_figures(self, figures):
+    def write_leakage(self, leakage_results):
+        """
+        Parameters
+        ----------
+        leakage_results : list
+            List of (threshold, leakage) from Partitioning.leakage, with the
+            number of cut edges ('num_cut') and of those across partitions
+            ('num_cut_cross') if clusters were split
+        """
+
+        self.report += "<h2>Partition leakage</h2>\n<hr>\n"
+
+        with open(os.path.join(HTML_DIR, 'leakage.html'), 'r') as f:
+            template = Template(f.read())
+
+        for threshold, leakage in leakage_results:
+            closest = leakage['closest']
+            fraction = leakage['num_cross'] / leakage['num_hits'] if leakage['num_hits'] else 0
+            summary_rows = [['# hits', leakage['num_hits']],
+                            ['# cross-partition hits', f"{leakage['num_cross']} ({fraction:.2%})"],
+                            ['Closest cross-partition pair', 'NA' if closest is None else f"{closest[0]} (Partition {closest[3]}) - {closest[1]} (Partition {closest[4]})"],
+                            ['E-value of closest pair', 'NA' if closest is None else closest[2]]]
+            if 'num_cut' in leakage:
+                summary_rows += [['# cut edges', leakage['num_cut']],
+                                 ['# cut edges across partitions', leakage['num_cut_cross']]]
+            summary_table = self._html_table(summary_rows, header=False)
+
+            bins = leakage['bins']
+            bin_table = self._html_table([['E-value', '# cross-partition hits']] + [[f'[{lo:g}, {hi:g})', count] for lo, hi, count in zip(bins[:-1], bins[1:], leakage['bin_counts'])])
+
+            pair_counts = leakage['pair_counts']
+            pair_table = self._html_table([['Partition'] + list(range(len(pair_counts)))] + [[i] + [count if j > i else '' for j, count in enumerate(row)] for i, row in enumerate(pair_counts)])
+
+            self.report += template.substitute(threshold=threshold,
+                                               summary_table=summary_table,
+                                               bin_table=bin_table,
+                                               pair_table=pair_table)
+
+
+    def write_recall(self, recall_results):
+        """
+        Parameters
+        ----------
+        recall_results : list
+            List of recall of the representative search against the full search
+            per threshold, header first
+        """
+
+        with open(os.path.join(HTML_DIR, 'recall.html'), 'r') as f:
+            template = Template(f.read())
+
+        self.report += template.substitute(recall_table=self._html_table(recall_results))
+
+
+    def write_figures(self, figures, scatter_file=None, sizebar_file=None):
         """
         Parameters
         ----------
         figures : list
-            List of figure paths: [(threshold, fig_path_1, fig_path_2, output_file*, sizebar_file*), ...]
+            List of figure paths: [(threshold, fig_path_1, fig_path_2), ...]
+        scatter_file : str
+            Path to scatterplot and histogram of nlogE and NPID. None: not drawn
+        sizebar_file : str
+            Path to barplot of max cluster size. None: not drawn
         """
 
         self.report += "<h2>Analysis</h2>\n<hr>\n"
@@ -118,11 +168,8 @@ class Report():
 
         html_figure = f"""
         <div class="grid">
-            <figure>
-                <h3>Correlation of negative log E-value (nlogE) and normalized percentage of identity (NPID)</h3>
-                <img src="{figures[-1][4]}" alt="Scatterplot and histogram of nlogE and NPID">
-            </figure>
-            {'<figure><h3>Maximum cluster size at different thresholds</h3><img src="' + figures[-1][5] + '" alt="Barplot of max cluster size"></figure>' if len(figures[-1]) == 6 else ''}
+            {'<figure><h3>Correlation of negative log E-value (nlogE) and normalized percentage of identity (NPID)</h3><img src="' + scatter_file + '" alt="Scatterplot and histogram of nlogE and NPID"></figure>' if scatter_file else ''}
+            {'<figure><h3>Maximum cluster size at different thresholds</h3><img src="' + sizebar_file + '" alt="Barplot of max cluster size"></figure>' if sizebar_file else ''}
         </div>\n
         """
         self.report += html_figure
@@ -138,6 +185,63 @@ class Report():
             self.report += fig_report
 
 
+    def write_interactive(self, figures, density=None, sizebar=None):
+        """
+        Parameters
+        ----------
+        figures : list
+            List of figure data from utils.figure_summary, one per threshold
+        density : dict
+            Hit density from utils.density_summary. None: not drawn
+        sizebar : dict
+            Max cluster sizes from utils.sizebar_summary. None: not drawn
+        """
+
+        with open(os.path.join(HTML_DIR, 'interactive.html'), 'r') as f:
+            template = Template(f.read())
+
+        data = json.dumps({'figures':figures, 'density':density, 'sizebar':sizebar}, separators=(',', ':'))
+        # the data must not close its script element
+        self.report += template.substitute(data=data.replace('</', '<\\/'))
+
+
+    def write_timing(self, timing):
+        """
+        Parameters
+        ----------
+        timing : list
+            Timing table from Profiler.rows, header first
+        """
+
+        with open(os.path.join(HTML_DIR, 'timing.html'), 'r') as f:
+            template = Template(f.read())
+
+        self.report += template.substitute(timing_table=self._html_table(timing))
+
+
+    @staticmethod
+    def _html_table(rows, header=True):
+        """
+        Parameters
+        ----------
+        rows : list
+            Table rows of cells in html
+        header : bool
+            The first row is the header
+
+        Returns
+        -------
+        html_table : str
+            Table in html
+        """
+        html_table = '<table>\n'
+        if header:
+            html_table += '  <thead>\n    <tr>' + ''.join([f'<th>{cell}</th>' for cell in rows[0]]) + '</tr>\n  </thead>\n'
+            rows = rows[1:]
+        html_table += '  <tbody>\n' + ''.join(['    <tr>' + ''.join([f'<td>{cell}</td>' for cell in row]) + '</tr>\n' for row in rows]) + '  </tbody>\n</table>\n'
+        return html_table
+
+
     def save_html(self, output_file):
         """
         Parameters
@@ -0,0 +1,265 @@
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import TCPServer, ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+from .Pipeline import Pipeline
+
+logger = logging.getLogger('protparts')
+
+class DatasetCache():
+
+
+    """
+    Least recently used cache of loaded datasets
+
+    A dataset is a Pipeline of a FASTA file, a blastp output file or a merge tree
+    file, keyed by its path and modification time, so a changed file is loaded
+    again. Only files under the data root are served.
+    """
+
+    def __init__(self, data_root='.', max_datasets=4, **kwargs):
+        """
+        Parameters
+        ----------
+        data_root : str
+            Path to the directory of the datasets. Relative dataset paths are
+            resolved against it
+        max_datasets : int
+            Maximum number of datasets kept in memory
+        kwargs : dict
+            Keyword arguments for Pipeline of FASTA files
+        """
+        self.data_root = os.path.realpath(data_root)
+        self.max_datasets = max_datasets
+        self.kwargs = kwargs
+        self.datasets = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, path, kind=None):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the dataset file, under the data root
+        kind : str
+            'fasta', 'blastp' or 'tree'. None: 'tree' for .npz files, 'blastp' for
+            .tab/.tsv/.txt files and 'fasta' otherwise
+
+        Returns
+        -------
+        pipeline : Pipeline
+            Pipeline of the dataset
+        lock : threading.Lock
+            Lock of the pipeline, held while it is used
+
+        Raises
+        ------
+        ValueError
+            If the dataset is outside the data root or not found
+        """
+        # symbolic links are resolved, so they cannot lead out of the data root
+        path = os.path.realpath(os.path.join(self.data_root, path))
+        if os.path.commonpath([path, self.data_root]) != self.data_root:
+            raise ValueError(f"Dataset outside the data root: {path}")
+        if not os.path.isfile(path):
+            raise ValueError(f"Dataset not found: {path}")
+        if kind is None:
+            ext = os.path.splitext(path)[1].lower()
+            kind = 'tree' if ext == '.npz' else 'blastp' if ext in ['.tab', '.tsv', '.txt'] else 'fasta'
+        if kind not in ['fasta', 'blastp', 'tree']:
+            raise ValueError(f"Invalid dataset kind: {kind}")
+        key = (path, kind, os.path.getmtime(path))
+
+        with self.lock:
+            if key in self.datasets:
+                self.datasets.move_to_end(key)
+                return self.datasets[key]
+
+        # load outside the cache lock, so other datasets stay available
+        if kind == 'tree':
+            pipeline = Pipeline.from_tree(path)
+        elif kind == 'blastp':
+            pipeline = Pipeline.from_blastp(path)
+        else:
+            pipeline = Pipeline.from_fasta(path, **self.kwargs)
+        logger.info(f"Loaded dataset: {path}")
+
+        with self.lock:
+            if key not in self.datasets:
+                self.datasets[key] = (pipeline, threading.Lock())
+            self.datasets.move_to_end(key)
+            while len(self.datasets) > self.max_datasets:
+                evicted, _ = self.datasets.popitem(last=False)
+                logger.info(f"Evicted dataset: {evicted[0]}")
+            return self.datasets[key]
+
+
+    def list(self):
+        """
+        Returns
+        -------
+        datasets : list
+            Loaded datasets, least recently used first
+        """
+        with self.lock:
+            return [{'path':path, 'kind':kind} for path, kind, _ in self.datasets]
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+
+    """
+    JSON endpoints on the dataset cache
+
+    GET /datasets
+    GET /stats?dataset=PATH[&kind=KIND][&threshold=T1,T2,...]
+    GET /cluster?dataset=PATH&threshold=T
+    GET /partition?dataset=PATH&threshold=T&partitions=N[&method=greedy][&split=1][&seed=0][&leakage=1]
+    """
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k:v[-1] for k, v in parse_qs(url.query).items()}
+        routes = {'/datasets':self._datasets, '/stats':self._stats, '/cluster':self._cluster, '/partition':self._partition}
+        if url.path not in routes:
+            self._send(404, {'error':f"Unknown endpoint: {url.path}"})
+            return
+        try:
+            self._send(200, routes[url.path](params))
+        except (KeyError, ValueError) as e:
+            message = f"Missing parameter: {e.args[0]}" if isinstance(e, KeyError) else str(e)
+            self._send(400, {'error':message})
+
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def _datasets(self, params):
+        return {'datasets':self.server.cache.list()}
+
+
+    def _stats(self, params):
+        pipeline, lock = self.server.cache.get(params['dataset'], params.get('kind'))
+        with lock:
+            try:
+                num_hits = len(pipeline.measurement)
+            except ValueError:
+                # merge trees are saved without the measurement
+                num_hits = None
+            result = {'num_sequences':len(pipeline.sequences), 'num_hits':num_hits, 'thresholds':{}}
+            if 'threshold' in params:
+                for t_c in [float(t) for t in params['threshold'].split(',')]:
+                    result['thresholds'][str(t_c)] = {'num_clusters':pipeline.tree.num_clusters(t_c),
+                                                      'max_cluster_size':pipeline.tree.max_cluster_size(t_c)}
+        return result
+
+
+    def _cluster(self, params):
+        pipeline, lock = self.server.cache.get(params['dataset'], params.get('kind'))
+        t_c = float(params['threshold'])
+        with lock:
+            cluster = pipeline.cluster(t_c)
+        return {'threshold':t_c, 'clusters':{str(cidx):c for cidx, c in cluster.items()}}
+
+
+    def _partition(self, params):
+        pipeline, lock = self.server.cache.get(params['dataset'], params.get('kind'))
+        t_c = float(params['threshold'])
+        with lock:
+            partitions = pipeline.partition(t_c, int(params['partitions']), method=params.get('method', 'greedy'),
+                                            split=params.get('split', '0') == '1', random_seed=int(params.get('seed', 0)))
+            result = {'threshold':t_c, 'partitions':{str(pidx):{str(cidx):c for cidx, c in par.items()} for pidx, par in partitions.items()}}
+            if params.get('leakage', '0') == '1':
+                leakage = pipeline.leakage(partitions)
+                result['leakage'] = {'num_hits':leakage['num_hits'], 'num_cross':leakage['num_cross']}
+        return result
+
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.command} {self.path}")
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+
+    """
+    Threaded HTTP server on a localhost port
+    """
+
+    daemon_threads = True
+
+
+class ThreadingUnixServer(ThreadingServer):
+
+    """
+    Threaded HTTP server on a Unix socket
+    """
+
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind expects a (host, port) address
+        TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ('localhost', 0)
+
+
+def make_server(host='127.0.0.1', port=8000, unix_socket=None, data_root='.', max_datasets=4, **kwargs):
+    """
+    Parameters
+    ----------
+    host : str
+        Host of the HTTP server, a loopback address: the server has no
+        authentication
+    port : int
+        Port of the HTTP server. 0: any free port
+    unix_socket : str
+        Path to a Unix socket, used instead of host and port
+    data_root : str
+        Path to the directory of the datasets
+    max_datasets : int
+        Maximum number of datasets kept in memory
+    kwargs : dict
+        Keyword arguments for Pipeline of FASTA files
+
+    Returns
+    -------
+    server : ThreadingServer
+        Server, started with serve_forever
+
+    Raises
+    ------
+    ValueError
+        If host is not a loopback address
+    """
+    if unix_socket is None:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+        if not all(ipaddress.ip_address(address.split('%')[0]).is_loopback for address in addresses):
+            raise ValueError(f"Host is not a loopback address: {host}. Use a Unix socket or a reverse proxy to serve other hosts")
+
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixServer(unix_socket, RequestHandler)
+    else:
+        server = ThreadingServer((host, port), RequestHandler)
+    server.cache = DatasetCache(data_root=data_root, max_datasets=max_datasets, **kwargs)
+    return server
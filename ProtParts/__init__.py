@@ -2,6 +2,7 @@
 __version__ = '0.1.0'
 
 # import modules
-from .Clustering import Clustering, Cluster
+from .Clustering import Clustering, Cluster, DistanceMatrix, MergeTree
 from .Partitioning import Partitioning
-from .Measure import Measure
\ No newline at end of file
+from .Measure import Measure
+from .Pipeline import Pipeline
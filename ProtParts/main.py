@@ -1,10 +1,18 @@
-from .Clustering import Clustering
+from .Clustering import Clustering, Cluster, DistanceMatrix, MergeTree
 from .Measure import Measure
 from .Partitioning import Partitioning
 from .Report import Report
-from .utils import read_seq, write_partition, write_cluster, hobohm1, init_logging, remove_duplicate, draw_figures, plot_sizebar, draw_scatter_histogram
+from .Archive import Archive
+from .Checkpoint import Checkpoint
+from .Profiler import Profiler
+from .Server import make_server
+from .utils import read_seq, group_labels, write_label_matrix, write_partition, write_partition_batch, write_partition_split, write_cluster, hobohm1, canonical_edges, representative_groups, representative_edges, edge_recall, pair_agreement, init_logging, remove_duplicate, draw_figures, plot_sizebar, draw_scatter_histogram, figure_summary, sizebar_summary, density_summary, write_measurement, output_extension
 from .settings import MAKEBLASTDB_EXEC, BLASTP_EXEC, TMP_DIR
-import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+import functools
+import logging
+import multiprocessing
+import numpy as np
 import os
 
 #def clust_partition(sequence_file, threshold_c, threshold_r, num_partitions, output_file, output_format, makeblastdb_exec=None, blastp_exec=None, tmp_dir=None):
@@ -41,6 +49,10 @@ def clust_partition(args):
         args.blastp_exec = BLASTP_EXEC
     if args.tmp_dir is None:
         args.tmp_dir = TMP_DIR
+    os.makedirs(args.tmp_dir, exist_ok=True)
+    # the shards search all sequences, not the representatives
+    if args.shards is not None and args.representatives:
+        raise ValueError("--shards cannot be used with --representatives.")
     
     # set logging
     logger = init_logging(args.tmp_dir)
@@ -48,37 +60,116 @@ def clust_partition(args):
     # get the absolute path of the input file
     input_file = os.path.abspath(args.input_file)
     input_name = os.path.basename(input_file).split('.')[0]
-    
-    # read sequences
-    sequences = read_seq(input_file)
-    num_seq = len(sequences)
-    logger.info(f"Number of sequences: {num_seq}")
 
-    # remove duplicate sequences
-    logger.debug("Removing duplicate sequences...")
-    sequences = remove_duplicate(sequences)
+    # get the absolute path of the output file
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # with --checkpoint, stage results are saved, and reused with --resume if their inputs are unchanged
+    checkpoint_dir = os.path.join(output_dir, input_name + '_checkpoint') if args.checkpoint or args.resume else None
+    checkpoint = Checkpoint(checkpoint_dir, resume=args.resume)
+
+    # every stage is timed, and optionally memory traced and profiled
+    profiler = Profiler(trace_memory=args.trace_memory, profile_dir=os.path.join(output_dir, input_name + '_profile') if args.profile else None)
+
+    # read sequences and remove duplicate sequences
+    logger.debug("Reading sequences...")
+    key = checkpoint.key('sequences', checkpoint.file_key(input_file))
+    with profiler.stage('sequences') as record:
+        num_seq, sequences = checkpoint.run('sequences', key, _read_sequences, input_file)
+        record['items'] = num_seq
     num_seq_nodup = len(sequences)
+    logger.info(f"Number of sequences: {num_seq}")
     logger.info(f"Number of unique sequences: {num_seq_nodup}")
 
 
+    # search only the representatives of contained and nearly identical sequences
+    seq_key = key
+    search_sequences = sequences
+    if args.representatives:
+        logger.debug("Picking representatives...")
+        key = checkpoint.key(key, 'representatives', args.rep_similarity)
+        with profiler.stage('representatives', items=len(sequences)):
+            representatives = checkpoint.run('representatives', key, representative_groups, sequences, min_similarity=args.rep_similarity)
+        search_sequences = {k:v for k, v in sequences.items() if k not in representatives}
+        logger.info(f"Number of representatives: {len(search_sequences)}")
+
     # sequence similarity measurement
+    # with canonical edges, one record per sequence pair is kept while the hits are read
     logger.debug("Runing BLASTP...")
     measure = Measure()
-    measurement = measure.blastp(sequences, args.makeblastdb_exec, args.blastp_exec, args.tmp_dir, evalue=10, num_threads=4)
+    merge = None if args.edges == 'directed' else args.edges
+    symmetric = merge is not None
+    if args.shards is not None:
+        # hits of a sharded search run elsewhere (protparts.py shard)
+        key = checkpoint.key(key, 'measurement', checkpoint.file_key(args.shards), merge)
+        with profiler.stage('blastp', items=len(sequences)):
+            measurement = checkpoint.run('measurement', key, measure.merge_shards, args.shards, merge=merge, input_file=input_file, num_sequences=len(sequences))
+    else:
+        key = checkpoint.key(key, 'measurement', args.makeblastdb_exec, args.blastp_exec, merge)
+        with profiler.stage('blastp', items=len(sequences)):
+            measurement = checkpoint.run('measurement', key, measure.blastp, search_sequences, args.makeblastdb_exec, args.blastp_exec, args.tmp_dir, merge=merge, evalue=10, num_threads=4)
+    if symmetric:
+        logger.info(f"Number of edges: {len(measurement)}")
+
+    # members inherit the edges of their representatives through an edge to it
+    if args.representatives:
+        member_edges = representative_edges(sequences, representatives)
+        measurement = measurement + (member_edges if merge is None else canonical_edges(member_edges, merge=merge))
+
+    # the full search, only to measure the recall of the representative search
+    if args.representatives and args.recall:
+        logger.debug("Runing full BLASTP for recall...")
+        full_key = checkpoint.key(seq_key, 'measurement', args.makeblastdb_exec, args.blastp_exec, merge)
+        with profiler.stage('blastp_full', items=len(sequences)):
+            full_measurement = checkpoint.run('measurement_full', full_key, measure.blastp, sequences, args.makeblastdb_exec, args.blastp_exec, args.tmp_dir, merge=merge, evalue=10, num_threads=4)
+    recall_results = [['Threshold', '# clusters (full)', '# clusters (representatives)', '# hits (full)', 'Recall', 'Pair precision', 'ARI']]
 
     # redundancy reduction
     if args.threshold_r is not None:
         logger.debug("Reducing redundancy...")
         logger.info(f"Threshold for redundancy reduction: {args.threshold_r}")
-        sequences = hobohm1(sequences, measurement, args.threshold_r, reduce_redundancy=True)
+        key = checkpoint.key(key, 'redundancy', args.threshold_r)
+        with profiler.stage('redundancy', items=len(measurement)):
+            sequences = checkpoint.run('redundancy', key, hobohm1, sequences, measurement, args.threshold_r, reduce_redundancy=True, symmetric=symmetric)
         logger.info(f"Number of sequences after redundancy reduction: {len(sequences)}")
+
+    # save the merge tree for threshold queries without rerunning BLAST
+    logger.debug("Building merge tree...")
+    with profiler.stage('merge_tree', items=len(measurement)):
+        tree = MergeTree.build(sequences, measurement, measurement_type='distance')
+        tree_file = os.path.join(output_dir, input_name + '_mergetree.npz')
+        tree.save(tree_file)
+    logger.info(f"Merge tree: {tree_file}")
     
-    # get the absolute path of the output file
-    output_dir = os.path.abspath(args.output_dir)
-    
+    # the distances of the silhouettes do not depend on the threshold
+    distances = DistanceMatrix(list(sequences), measurement, symmetric=symmetric)
+
+    # results are streamed into the archive as they are written
+    out_zip_file = os.path.join(output_dir, input_name + '_protparts.zip')
+    archive = Archive(output_dir, out_zip_file, compress=args.compress, num_workers=args.jobs)
+    binary = args.fmt.lower() == 'columnar'
+
+    # figures are rendered in background processes while the pipeline continues
+    # the interactive report is drawn by the browser from summaries of the results
+    fast = args.figures == 'fast'
+    interactive = args.report == 'interactive'
+    if args.figures != 'none' and not interactive and args.jobs > 1:
+        figure_executor = ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('spawn'))
+    else:
+        figure_executor = None
+
+    # one label table for all thresholds instead of one result file per threshold
+    if args.matrix:
+        matrix_fmt = 'columnar' if binary else 'csv'
+        matrix_name = input_name + f"_labels.{output_extension(matrix_fmt)}"
+        matrix_index = dict(zip(sequences, range(len(sequences))))
+        matrix_labels = {}
+
     # clustering and partitioning
     logger.debug("Clustering with graph...")
     file_results = []
+    leakage_results = []
     clustering_results = [['Threshold', '# sequences', '# unique sequences', '# remaining sequences', '# clusters', 'Silhouette score', 'Download']]
     only_partition = False
     have_partition = False
@@ -107,26 +198,51 @@ def clust_partition(args):
             logger.debug("Pruning clusters...")
             t_best = float(max(clustering_results[1:], key=lambda x: x[5])[0])
             t_c = f'{t_best}_prune' 
-            clust = Clustering(threshold=t_best, method='graph', measurement_type='distance')
-            cluster = clust.optimize(sequences, measurement, method='ratio')
+            clust = Clustering(threshold=t_best, method='graph', measurement_type='distance', symmetric=symmetric)
+            cluster_key = checkpoint.key(key, 'cluster', t_c)
+            pruned, cluster_sequences = True, sequences
+            with profiler.stage('prune', threshold=t_c, items=len(sequences)):
+                cluster = checkpoint.run(f"cluster_{t_c}", cluster_key, clust.optimize, sequences, measurement, method='ratio')
             logger.info(f"Number of clusters: {len(cluster)}")
             sequences = {k:v for k, v in sequences.items() if k in cluster.index()}
         else:
             logger.info(f"Threshold for clustering: {t_c}")
-            clust = Clustering(threshold=t_c, method='graph', measurement_type='distance')
-            cluster = clust.clustering(sequences, measurement)
+            clust = Clustering(threshold=t_c, method='graph', measurement_type='distance', symmetric=symmetric)
+            cluster_key = checkpoint.key(key, 'cluster', t_c)
+            pruned, cluster_sequences = False, sequences
+            with profiler.stage('cluster', threshold=t_c, items=len(sequences)):
+                cluster = checkpoint.run(f"cluster_{t_c}", cluster_key, clust.clustering, sequences, measurement)
             logger.info(f"Number of clusters: {len(cluster)}")
+
+        # the full search is clustered the same way, pruned or not
+        if args.representatives and args.recall:
+            logger.debug("Comparing with the full search...")
+            with profiler.stage('recall', threshold=t_c, items=len(full_measurement)):
+                if pruned:
+                    full_cluster = clust.optimize(cluster_sequences, full_measurement, method='ratio')
+                else:
+                    full_cluster = clust.clustering(cluster_sequences, full_measurement)
+                num_hits, recall = edge_recall(full_measurement, cluster, clust.threshold)
+                precision, ari = pair_agreement(cluster, full_cluster)
+            recall_results.append([t_c, len(full_cluster), len(cluster), num_hits] + ['NA' if x is None else round(x, 4) for x in [recall, precision, ari]])
+            logger.info(f"Recall of full search hits: {recall}, pair precision: {precision}, ARI: {ari}")
         
-        output_file = os.path.join(output_dir, input_name + f"_{t_c}.{args.fmt.lower()}")
+        output_name = input_name + f"_{t_c}.{output_extension(args.fmt)}"
 
-        if args.num_partitions is None:
+        if args.matrix:
+            matrix_labels[f"Cluster_{t_c}"] = group_labels(cluster.clusters, matrix_index)
+
+        if args.num_partitions is None and args.matrix:
+            output_file = archive.link(matrix_name, binary)
+        elif args.num_partitions is None:
             logger.debug("Writing clusters...")
-            write_cluster(cluster, output_file, args.fmt, sequences=sequences, method='graph', threshold=t_c)
+            with profiler.stage('write', threshold=t_c, items=len(sequences)):
+                output_file = archive.write(output_name, functools.partial(write_cluster, cluster, fmt=args.fmt, sequences=sequences, method='graph', threshold=t_c, pretty=args.pretty), binary=binary)
         else:
             logger.debug("Partitioning...")
             logger.info(f"Number of Partitions: {args.num_partitions}")
             
-            partitioner = Partitioning(num_partitions=args.num_partitions, num_sequences=len(sequences), method='random')
+            partitioner = Partitioning(num_partitions=args.num_partitions, num_sequences=len(sequences), method=args.partition_method)
             partition_size = partitioner.partition_size()
             #logger.debug(f"Partition size: {partition_size}")
             max_partition_size = partition_size[max(partition_size, key=partition_size.get)]
@@ -136,17 +252,71 @@ def clust_partition(args):
             
             size_thres_dict[t_c] = max_cluster_size
 
-            if max_cluster_size > max_partition_size:
+            if max_cluster_size > max_partition_size and args.split:
+                logger.debug("Splitting oversized clusters...")
+                cluster_key = checkpoint.key(cluster_key, 'split', max_partition_size)
+                with profiler.stage('split', threshold=t_c, items=len(cluster)):
+                    cluster, cut_edges = checkpoint.run(f"split_{t_c}", cluster_key, clust.split, cluster, measurement, max_partition_size)
+                logger.info(f"Number of clusters after splitting: {len(cluster)}")
+                logger.info(f"Number of cut edges: {len(cut_edges)}")
+                max_cluster_size = cluster.num_data(by='max')
+            else:
+                cut_edges = []
+
+            partitions = None
+            if max_cluster_size <= max_partition_size:
+                with profiler.stage('partition', threshold=t_c, items=len(cluster)):
+                    partitions = checkpoint.run(f"partition_{t_c}", checkpoint.key(cluster_key, 'partition', args.num_partitions, args.partition_method), partitioner.partition, cluster)
+                # the clusters fit one by one, but not always all together
+                excess = partitioner.excess(partitions)
+                if excess:
+                    logger.info(f"Partitions exceed their capacity by {excess} sequences")
+                    partitions = None
+
+            if partitions is None:
                 output_file = "NA"
+                if args.matrix:
+                    matrix_labels[f"Partition_{t_c}"] = np.full(len(matrix_index), -1, dtype=np.int64)
             else:
-                partitions = partitioner.random_partitioning(cluster)
-                logger.debug("Writing partitions...")
-                write_partition(partitions, output_file, args.fmt, sequences=sequences, method='graph', threshold=t_c)
+                if args.matrix:
+                    matrix_labels[f"Partition_{t_c}"] = group_labels({pidx:[name for c in par.values() for name in c] for pidx, par in partitions.items()}, matrix_index)
+                    output_file = archive.link(matrix_name, binary)
+                else:
+                    logger.debug("Writing partitions...")
+                    with profiler.stage('write', threshold=t_c, items=len(sequences)):
+                        output_file = archive.write(output_name, functools.partial(write_partition, partitions, fmt=args.fmt, sequences=sequences, method='graph', threshold=t_c, pretty=args.pretty), binary=binary)
                 have_partition = True
+
+                if args.split_fasta is not None:
+                    logger.debug("Writing partition FASTA files...")
+                    split_dir = os.path.join(output_dir, input_name + f"_{t_c}_split")
+                    os.makedirs(split_dir, exist_ok=True)
+                    with profiler.stage('split_fasta', threshold=t_c, items=len(sequences)):
+                        write_partition_split(partitions, os.path.join(split_dir, input_name), sequences, folds=args.split_fasta == 'fold', compress=args.compress == 'gzip')
+
+                logger.debug("Auditing partition leakage...")
+                with profiler.stage('leakage', threshold=t_c, items=len(measurement)):
+                    leakage = partitioner.leakage(partitions, measurement)
+                logger.info(f"Number of cross-partition hits: {leakage['num_cross']}")
+
+                # the edges cut by --split, and those left across partitions, go into the leakage table
+                if args.split:
+                    partition_index = {name:pidx for pidx, par in partitions.items() for c in par.values() for name in c}
+                    leakage['num_cut'] = len(cut_edges)
+                    leakage['num_cut_cross'] = sum(partition_index[seq1] != partition_index[seq2] for seq1, seq2, _ in cut_edges)
+                    logger.info(f"Number of cut edges across partitions: {leakage['num_cut_cross']}")
+                leakage_results.append([t_c, leakage])
+
+                if args.replicates > 1:
+                    logger.debug("Writing replicate partitions...")
+                    with profiler.stage('replicates', threshold=t_c, items=args.replicates):
+                        cluster_ids, assignments = partitioner.batch_partitioning(cluster, list(range(args.replicates)))
+                        archive.write(input_name + f"_{t_c}_replicates.csv", functools.partial(write_partition_batch, cluster, cluster_ids, assignments, fmt='csv'))
     
         # evaluate silhouette score
         logger.debug("Evaluating silhouette score...")
-        silhouette, silhouette_per_sample = cluster.silhouette(measurement)
+        with profiler.stage('silhouette', threshold=t_c, items=cluster.num_data(by='sum')):
+            silhouette, silhouette_per_sample = checkpoint.run(f"silhouette_{t_c}", checkpoint.key(cluster_key, 'silhouette'), cluster.silhouette, measurement, distances=distances)
         if silhouette is None:
             silhouette = "NA"
         else:
@@ -157,35 +327,92 @@ def clust_partition(args):
         clustering_results.append(row)
 
         # draw figures
-        logger.debug("Drawing figures...")
-        hist_file, silhouette_file = draw_figures(cluster, silhouette_per_sample, output_dir, threshold=t_c)
-        file_results.append([t_c, hist_file, silhouette_file, output_file])
+        if args.figures != 'none' and interactive:
+            logger.debug("Summarizing figures...")
+            with profiler.stage('figures', threshold=t_c, items=len(cluster)):
+                file_results.append(figure_summary(cluster, silhouette_per_sample, t_c))
+        elif args.figures != 'none':
+            figure_key = checkpoint.key(cluster_key, 'figures', args.dpi, fast)
+            found, figure_files = checkpoint.get(f"figures_{t_c}", figure_key)
+            if found and all(map(os.path.exists, figure_files)):
+                future = Future()
+                future.set_result(figure_files)
+            else:
+                logger.debug("Drawing figures...")
+                # with background workers, only the submission is timed here
+                with profiler.stage('figures', threshold=t_c, items=len(cluster)):
+                    future = _render(figure_executor, draw_figures, cluster, silhouette_per_sample, output_dir, threshold=t_c, dpi=args.dpi, fast=fast)
+                future.add_done_callback(functools.partial(_save_figures, checkpoint, f"figures_{t_c}", figure_key))
+            file_results.append([t_c, future])
     
     # draw the scatter plot and histogram
-    scatter_file = draw_scatter_histogram(measurement, measurement, output_dir)
-    file_results[-1].append(scatter_file)
-
-    if only_partition and have_partition:
+    if args.export_measurement is not None:
+        logger.debug("Exporting measurement...")
+        with profiler.stage('export_measurement', items=len(measurement)):
+            write_measurement(measurement, output_dir, fmt=args.export_measurement)
+    scatter_file = None
+    density = None
+    if args.figures == 'full' and interactive:
+        logger.debug("Summarizing hit density...")
+        with profiler.stage('scatter', items=len(measurement)):
+            density = density_summary(measurement)
+    elif args.figures == 'full':
+        scatter_key = checkpoint.key(key, 'scatter', args.dpi)
+        found, scatter_file = checkpoint.get('scatter', scatter_key)
+        if not found or not os.path.exists(scatter_file):
+            logger.debug("Drawing scatter plot...")
+            with profiler.stage('scatter', items=len(measurement)):
+                scatter_file = checkpoint.run('scatter', scatter_key, draw_scatter_histogram, measurement, measurement, output_dir, dpi=args.dpi)
+
+    sizebar_file = None
+    sizebar = None
+    if only_partition and have_partition and args.figures == 'full' and interactive:
+        sizebar = sizebar_summary(size_thres_dict, max_partition_size)
+    elif only_partition and have_partition and args.figures == 'full':
         logger.debug("Drawing size bar...")
-        sizebar_file = plot_sizebar(size_thres_dict, max_partition_size, output_dir)
-        file_results[-1].append(sizebar_file)
+        with profiler.stage('sizebar', items=len(size_thres_dict)):
+            sizebar_file = _render(figure_executor, plot_sizebar, size_thres_dict, max_partition_size, output_dir, dpi=args.dpi)
         #break
 
-    # create a zip file
-    logger.debug("Creating a zip output file...")
-    out_zip_file = os.path.join(output_dir, input_name + '_protparts.zip')
-    with zipfile.ZipFile(out_zip_file, 'w') as zipout:        
-        for files in file_results:
-            if files[3] != "NA":
-                zipout.write(files[3], arcname=os.path.basename(files[3]), compress_type=zipfile.ZIP_DEFLATED)
+    if args.matrix:
+        logger.debug("Writing label matrix...")
+        with profiler.stage('label_matrix', items=len(matrix_index)):
+            archive.write(matrix_name, functools.partial(write_label_matrix, list(matrix_index), matrix_labels, fmt=matrix_fmt), binary=binary)
+
+    # finish the background writes
+    logger.debug("Closing output archive...")
+    with profiler.stage('close_archive'):
+        archive.close()
+
+    if not interactive:
+        logger.debug("Waiting for figures...")
+        with profiler.stage('wait_figures', items=len(file_results)):
+            file_results = [[t_c, *future.result()] for t_c, future in file_results]
+            if sizebar_file is not None:
+                sizebar_file = sizebar_file.result()
+    if figure_executor is not None:
+        figure_executor.shutdown(wait=True)
 
     
     # write clustering report
+    logger.debug("Saving stage timings...")
+    timing_file = os.path.join(output_dir, input_name + '_timing.json')
+    profiler.save(timing_file)
+    logger.info(f"Stage timings: {timing_file}")
+
     logger.debug("Creating clustering report...")
     report = Report()
     report.write_params(args)
-    report.write_results(clustering_results, out_zip_file)
-    report.write_figures(file_results)
+    report.write_results(clustering_results, out_zip_file if args.compress == 'zip' else None)
+    if leakage_results:
+        report.write_leakage(leakage_results)
+    if len(recall_results) > 1:
+        report.write_recall(recall_results)
+    if args.figures != 'none' and interactive:
+        report.write_interactive(file_results, density, sizebar)
+    elif args.figures != 'none':
+        report.write_figures(file_results, scatter_file, sizebar_file)
+    report.write_timing(profiler.rows())
     report.save_html(os.path.join(output_dir, input_name + '_protparts_report.html'))
 
 
@@ -195,6 +422,208 @@ def clust_partition(args):
     
     logger.debug("Done.")
 
+
+def _read_sequences(input_file):
+    """
+    Read sequences and remove duplicate sequences
+
+    Parameters
+    ----------
+    input_file : str
+        Path to input sequence file
+
+    Returns
+    -------
+    num_seq : int
+        Number of sequences in the file
+    sequences : dict
+        Dict of unique sequences
+    """
+    sequences = read_seq(input_file)
+    return len(sequences), remove_duplicate(sequences)
+
+
+def _save_figures(checkpoint, stage, key, future):
+    """
+    Checkpoint the figure files once they are drawn
+    """
+    if future.exception() is None:
+        checkpoint.save(stage, key, future.result())
+
+
+def _render(executor, fn, *args, **kwargs):
+    """
+    Render a figure in the executor, or right away without one
+
+    Parameters
+    ----------
+    executor : ProcessPoolExecutor
+        Executor. None: render in this process
+    fn : callable
+        Drawing function
+
+    Returns
+    -------
+    future : Future
+        Future of the drawing function result
+    """
+    if executor is not None:
+        return executor.submit(fn, *args, **kwargs)
+    future = Future()
+    future.set_result(fn(*args, **kwargs))
+    return future
+
+
+def query_tree(args):
+    """
+    Query a saved merge tree
+
+    Parameters
+    ----------
+    tree_file : str
+        Path to merge tree file
+    threshold_c : str
+        Thresholds for clustering (comma separated)
+    stat : str
+        'count': number of clusters, 'max': maximum cluster size, 'cluster': clusters
+    output_file : str
+        Path to output file for clusters. None: print to stdout
+    fmt : str
+        Output format of clusters
+
+    Returns
+    -------
+    results : dict
+        Dict of threshold and query result
+    """
+    tree = MergeTree.load(args.tree_file)
+    threshold_c = [float(i) for i in args.threshold_c.split(',')]
+
+    results = {}
+    for t_c in threshold_c:
+        if args.stat == 'count':
+            results[t_c] = tree.num_clusters(t_c)
+        elif args.stat == 'max':
+            results[t_c] = tree.max_cluster_size(t_c)
+        elif args.stat == 'cluster':
+            results[t_c] = tree.cluster(t_c)
+        else:
+            raise ValueError(f"Unknown query: {args.stat}")
+
+    for t_c, result in results.items():
+        if not isinstance(result, Cluster):
+            print(f"{t_c}\t{result}")
+        elif args.output_file is None:
+            for cidx, c in result.items():
+                for name in c:
+                    print(f"{t_c}\t{cidx}\t{name}")
+        else:
+            root, ext = os.path.splitext(args.output_file)
+            output_file = args.output_file if len(results) == 1 else f"{root}_{t_c}{ext}"
+            write_cluster(result, output_file, args.fmt, method='graph', threshold=t_c, pretty=args.pretty)
+
+    return results
+
+
+def write_shards(args):
+    """
+    Prepare a sharded BLASTP search
+
+    Parameters
+    ----------
+    input_file : str
+        Path to input sequence file
+    shard_dir : str
+        Path to shared shard directory
+    num_shards : int
+        Number of query shards
+    num_threads : int
+        Number of BLASTP threads per shard
+    makeblastdb_exec : str
+        Path to makeblastdb executable
+    blastp_exec : str
+        Path to blastp executable on the nodes
+
+    Returns
+    -------
+    manifest_file : str
+        Path to the shard manifest
+    """
+    makeblastdb_exec = args.makeblastdb_exec if args.makeblastdb_exec is not None else MAKEBLASTDB_EXEC
+    blastp_exec = args.blastp_exec if args.blastp_exec is not None else BLASTP_EXEC
+    _, sequences = _read_sequences(os.path.abspath(args.input_file))
+    manifest_file = Measure().blastp_shards(sequences, makeblastdb_exec, blastp_exec, args.shard_dir, args.num_shards, input_file=args.input_file, evalue=10, num_threads=args.num_threads)
+    print(manifest_file)
+    return manifest_file
+
+
+def merge_shards(args):
+    """
+    Check a sharded BLASTP search and merge its outputs
+
+    Parameters
+    ----------
+    manifest_file : str
+        Path to the shard manifest
+    output_file : str
+        Path to merged blastp output. None: only check the shards
+
+    Returns
+    -------
+    complete : bool
+        All shards are done
+    """
+    measure = Measure()
+    status = measure.shard_status(args.manifest_file)
+    for state, shards in status.items():
+        print(f"{state}\t{len(shards)}\t{','.join(map(str, shards))}")
+    complete = not status['missing'] and not status['partial']
+    if complete and args.output_file is not None:
+        with open(args.output_file, 'w') as f:
+            f.writelines(f"{seq1}\t{seq2}\t{evalue:g}\t{nident:.0f}\t{qlen:.0f}\t{slen:.0f}\n" for seq1, seq2, evalue, nident, qlen, slen in measure.merge_shards(args.manifest_file))
+    return complete
+
+
+def serve(args):
+    """
+    Serve clustering and partitioning requests with warm datasets
+
+    Parameters
+    ----------
+    host : str
+        Host of the HTTP server, a loopback address
+    port : int
+        Port of the HTTP server
+    unix_socket : str
+        Path to a Unix socket, used instead of host and port
+    data_root : str
+        Path to the directory of the datasets
+    max_datasets : int
+        Maximum number of datasets kept in memory
+    makeblastdb_exec : str
+        Path to makeblastdb executable
+    blastp_exec : str
+        Path to blastp executable
+    tmp_dir : str
+        Path to temporary directory
+    """
+    logger = logging.getLogger('protparts')
+    logger.setLevel(logging.INFO)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(stream_handler)
+
+    server = make_server(args.host, args.port, args.unix_socket, args.data_root, args.max_datasets, makeblastdb_exec=args.makeblastdb_exec, blastp_exec=args.blastp_exec, tmp_dir=args.tmp_dir)
+    logger.info(f"Serving {server.cache.data_root} on {args.unix_socket if args.unix_socket else f'http://{args.host}:{server.server_port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
     
 """
     # clustering based on the number of partitions
@@ -1,13 +1,13 @@
-from Bio import SeqIO
 import json
+import contextlib
+import collections
+import collections.abc
+import gzip
+import io
 import warnings
 import operator
 import logging
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-import seaborn as sns
 import os
-import pandas as pd
 import numpy as np
 from string import Template
 
@@ -25,6 +25,7 @@ def read_seq(seq_file):
     sequences : list
         List of sequences
     """
+    from Bio import SeqIO
     sequences = dict()
     with open(seq_file, 'r') as f:
         for record in SeqIO.parse(f, 'fasta'):
@@ -35,33 +36,97 @@ def read_seq(seq_file):
     return sequences
 
 
-def read_blastp(blastp_file):
+def read_blastp(blastp_file, merge=None):
     """
     Read blastp output with outfmt 6
 
     Parameters
     ----------
-    blastp_file : str
-        Path to blastp output file
+    blastp_file : str/list
+        Path to blastp output file, or list of paths read as one output
+    merge : str
+        Keep one canonical edge per sequence pair, see canonical_edges ('min',
+        'max' or 'mean'). Hits are merged while the file is read, so the hits of
+        both directions are never held together. None: keep the first hit per
+        (qseqid, sseqid)
 
     Returns
     -------
     measurement : tuple
         List of measurement (seq1, seq2, evalue, nident, qlen, slen)
     """
+    blastp_files = [blastp_file] if isinstance(blastp_file, str) else blastp_file
+
+    def hits():
+        for path in blastp_files:
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip().split('\t')
+                    yield (line[0], line[1], float(line[2]), float(line[3]), float(line[4]), float(line[5]))
+
+    if merge is not None:
+        return canonical_edges(hits(), merge=merge)
+
     measurement = []
     first_hit = set()
-    with open(blastp_file, 'r') as f:
-        for line in f:
-            line = line.strip().split('\t')
-            if (line[0], line[1]) in first_hit:
-                continue
-            else:
-                first_hit.add((line[0], line[1]))
-                measurement.append((line[0], line[1], float(line[2]), float(line[3]), float(line[4]), float(line[5])))
+    for hit in hits():
+        if (hit[0], hit[1]) in first_hit:
+            continue
+        else:
+            first_hit.add((hit[0], hit[1]))
+            measurement.append(hit)
     return measurement
 
 
+def canonical_edges(measurement, merge='min'):
+    """
+    Undirected edge table of the measurement
+
+    All-vs-all BLASTP reports most pairs in both directions with slightly
+    different E-values. The canonical table keeps one record per sequence pair,
+    oriented so that seq1 <= seq2 (qlen and slen swapped along), with the E-value
+    of the pair chosen by the merge rule among the first hit of each direction.
+    Self hits are kept.
+
+    Parameters
+    ----------
+    measurement : iterable
+        Measurement (seq1, seq2, evalue, nident, qlen, slen), read only once
+    merge : str
+        'min': the hit with the smallest E-value, 'max': the hit with the largest
+        E-value, 'mean': mean E-value and identity of the hits
+
+    Returns
+    -------
+    measurement : tuple
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen), one per pair
+    """
+    if merge not in ['min', 'max', 'mean']:
+        raise ValueError(f"Unknown merge rule: {merge}")
+
+    # (edge, directions seen) per pair, 1: seq1 -> seq2, 2: seq2 -> seq1
+    edges = dict()
+    for seq1, seq2, evalue, nident, qlen, slen in measurement:
+        direction = 1
+        if seq2 < seq1:
+            seq1, seq2, qlen, slen, direction = seq2, seq1, slen, qlen, 2
+        pair = (seq1, seq2)
+        entry = edges.get(pair)
+        if entry is None:
+            edges[pair] = ((seq1, seq2, evalue, nident, qlen, slen), direction)
+            continue
+        edge, seen = entry
+        if seen & direction:
+            # a later hit of a direction already seen
+            continue
+        if merge == 'min' and evalue < edge[2] or merge == 'max' and evalue > edge[2]:
+            edge = (seq1, seq2, evalue, nident, qlen, slen)
+        elif merge == 'mean':
+            edge = (seq1, seq2, (edge[2] + evalue) / 2, (edge[3] + nident) / 2, qlen, slen)
+        edges[pair] = (edge, seen | direction)
+    return [edge for edge, _ in edges.values()]
+
+
 def remove_duplicate(sequences):
     """
     Remove duplicate sequences
@@ -85,6 +150,220 @@ def remove_duplicate(sequences):
     return sequences_nodup
 
 
+def representative_groups(sequences, k=5, min_similarity=0.9, max_candidates=16):
+    """
+    Pick representatives by containment and k-mer similarity
+
+    Sequences are visited from the longest to the shortest, as in hobohm1. A
+    sequence becomes a member of the first candidate representative containing
+    it, or else of the candidate sharing the largest fraction of its k-mers, if
+    that fraction reaches min_similarity. Otherwise it becomes a representative.
+    Candidates are the representatives sharing a k-mer with the sequence, and
+    each k-mer lists at most max_candidates representatives, so the cost per
+    sequence is bounded by its length times max_candidates. Sequences shorter
+    than k are always representatives.
+
+    Parameters
+    ----------
+    sequences : dict
+        Dict of sequences
+    k : int
+        Length of the k-mers
+    min_similarity : float
+        Minimum fraction of the k-mers of a sequence found in its representative.
+        None: containment only
+    max_candidates : int
+        Maximum number of representatives listed per k-mer, and of candidates
+        checked for containment
+
+    Returns
+    -------
+    representatives : dict
+        Dict of member id and the id of its representative
+    """
+    seq_ids = sorted(sequences, key=lambda x:len(sequences[x].seq), reverse=True)
+    representatives = dict()
+    rep_seqs = []
+    kmer_index = dict()
+    for seq_id in seq_ids:
+        seq = str(sequences[seq_id].seq)
+        kmers = {seq[i:i + k] for i in range(len(seq) - k + 1)}
+
+        # number of shared k-mers per candidate representative
+        shared = collections.Counter()
+        for kmer in kmers:
+            shared.update(kmer_index.get(kmer, ()))
+        candidates = shared.most_common(max_candidates)
+
+        rep_id = None
+        for r, _ in candidates:
+            if seq in rep_seqs[r][1]:
+                rep_id = rep_seqs[r][0]
+                break
+        if rep_id is None and candidates and min_similarity is not None and candidates[0][1] >= min_similarity * len(kmers):
+            rep_id = rep_seqs[candidates[0][0]][0]
+
+        if rep_id is None:
+            for kmer in kmers:
+                reps = kmer_index.setdefault(kmer, [])
+                if len(reps) < max_candidates:
+                    reps.append(len(rep_seqs))
+            rep_seqs.append((seq_id, seq))
+        else:
+            representatives[seq_id] = rep_id
+    return representatives
+
+
+def representative_edges(sequences, representatives):
+    """
+    Edges of members to their representatives
+
+    A member is contained in or nearly identical to its representative, so it
+    gets an edge with E-value 0 to it and, through it, the representative's
+    edges in the graph of any threshold.
+
+    Parameters
+    ----------
+    sequences : dict
+        Dict of sequences
+    representatives : dict
+        Dict of member id and the id of its representative, from representative_groups
+
+    Returns
+    -------
+    measurement : tuple
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen)
+    """
+    measurement = []
+    for member, rep in representatives.items():
+        member_len = float(len(sequences[member].seq))
+        measurement.append((member, rep, 0.0, member_len, member_len, float(len(sequences[rep].seq))))
+    return measurement
+
+
+def edge_recall(measurement, cluster, threshold, op=operator.le):
+    """
+    Fraction of the hits passing the threshold whose sequences share a cluster
+
+    Parameters
+    ----------
+    measurement : tuple
+        List of measurement (seq1, seq2, measurement), usually of the full search
+    cluster : Cluster
+        Cluster object
+    threshold : float
+        Threshold for clustering
+    op : callable
+        Comparison of a measurement with the threshold
+
+    Returns
+    -------
+    num_hits : int
+        Number of hits passing the threshold, without self hits
+    recall : float
+        Fraction of those hits within one cluster. None: no hits
+    """
+    cluster_index = cluster.index()
+    same = [cluster_index[x[0]] == cluster_index[x[1]] for x in measurement if (x[0] != x[1]) and (x[0] in cluster_index) and (x[1] in cluster_index) and op(x[2], threshold)]
+    return len(same), (sum(same) / len(same) if same else None)
+
+
+def pair_agreement(cluster, reference):
+    """
+    Agreement of the sequence pairs grouped by two clusterings
+
+    Only the sequences found in both clusterings are compared.
+
+    Parameters
+    ----------
+    cluster : Cluster
+        Cluster object, usually of the representative search
+    reference : Cluster
+        Cluster object, usually of the full search
+
+    Returns
+    -------
+    precision : float
+        Fraction of the pairs within one cluster of cluster also within one
+        cluster of reference. None: no such pairs
+    ari : float
+        Adjusted Rand index of the two clusterings. None: fewer than two sequences
+    """
+    cluster_index = cluster.index()
+    reference_index = reference.index()
+    common = [x for x in cluster_index if x in reference_index]
+    if len(common) < 2:
+        return None, None
+    pairs = lambda counts: sum(n * (n - 1) // 2 for n in counts)
+    both = pairs(collections.Counter((cluster_index[x], reference_index[x]) for x in common).values())
+    rows = pairs(collections.Counter(cluster_index[x] for x in common).values())
+    columns = pairs(collections.Counter(reference_index[x] for x in common).values())
+    precision = both / rows if rows else None
+    expected = rows * columns / pairs([len(common)])
+    maximum = (rows + columns) / 2
+    ari = 1.0 if maximum == expected else (both - expected) / (maximum - expected)
+    return precision, ari
+
+
+@contextlib.contextmanager
+def open_output(out_file, mode='w'):
+    """
+    Open an output file, or pass through an open file object
+
+    Parameters
+    ----------
+    out_file : str/file
+        Path to output file, or an open file object which is left open
+    mode : str
+        File mode
+
+    Returns
+    -------
+    f : file
+        File object
+    """
+    if isinstance(out_file, (str, os.PathLike)):
+        with open(out_file, mode) as f:
+            yield f
+    else:
+        yield out_file
+
+
+def dump_json_items(items, f, indent=None, level=0):
+    """
+    Write a JSON object incrementally from its (key, value) pairs
+
+    Parameters
+    ----------
+    items : iterable
+        Iterable of (key, value). A value which is an iterator of (key, value) is
+        written as a nested object, any other value with json
+    f : file
+        File object
+    indent : int
+        Indentation as json.dump. None: compact
+    level : int
+        Nesting level of the object
+    """
+    if indent is None:
+        newline, key_sep, value_kwargs = '', ':', {'separators':(',', ':')}
+    else:
+        newline, key_sep, value_kwargs = '\n' + ' ' * indent * (level + 1), ': ', {'indent':indent}
+
+    f.write('{')
+    empty = True
+    for key, value in items:
+        f.write(('' if empty else ',') + newline + json.dumps(key) + key_sep)
+        empty = False
+        if isinstance(value, collections.abc.Iterator):
+            dump_json_items(value, f, indent, level + 1)
+        else:
+            f.write(json.dumps(value, **value_kwargs).replace('\n', newline))
+    if not empty and indent is not None:
+        f.write('\n' + ' ' * indent * level)
+    f.write('}')
+
+
 def write_partition(partition, out_file, fmt='json', **kwargs):
     """
     Write partition to file
@@ -93,16 +372,16 @@ def write_partition(partition, out_file, fmt='json', **kwargs):
     ----------
     partition : dict
         Partitioned sequences
-    out_file : str
-        Path to output file
+    out_file : str/file
+        Path to output file, or an open file object
     fmt : str
         Output format
     kwargs : dict
-        Keyword arguments for output format
+        Keyword arguments for output format (pretty: indented JSON)
     """
     
     if fmt.lower() == 'txt':
-        with open(out_file, 'w') as f:
+        with open_output(out_file) as f:
             f.write(f"# Clustering method: {kwargs['method']}\n")
             f.write(f"# Threshold: {kwargs['threshold']}\n")
             f.write(f"# Number of partitions: {len(partition)}\n")
@@ -111,27 +390,83 @@ def write_partition(partition, out_file, fmt='json', **kwargs):
                     for name in c:
                         f.write(f"ClustID {cidx} PartID {pidx} {name}\n")    
     elif fmt.lower() == 'json':
-        with open(out_file, 'w') as f:
-            partition_named = {f"Partition_{pidx}":{f"Cluster_{cidx}":c for cidx, c in par.items()} for pidx, par in partition.items()}
-            json.dump(partition_named, f, indent=4)
+        with open_output(out_file) as f:
+            partition_named = ((f"Partition_{pidx}", ((f"Cluster_{cidx}", c) for cidx, c in par.items())) for pidx, par in partition.items())
+            dump_json_items(partition_named, f, indent=4 if kwargs.get('pretty') else None)
     elif fmt.lower() == 'csv':
-        with open(out_file, 'w') as f:
+        with open_output(out_file) as f:
             f.write('SequenceID,PartitionID,ClusterID\n')
             for pidx, par in partition.items():
                 for cidx, c in par.items():
                     for name in c:
                         f.write(f"{name},{pidx},{cidx}\n")
     elif fmt.lower() in ('fasta', 'fa'):
-        with open(out_file, 'w') as f:
+        with open_output(out_file) as f:
             for pidx, par in partition.items():
                 for cidx, c in par.items():
                     for name in c:
                         f.write(f">{name} Cluster_{cidx} Partition_{pidx}\n")
                         f.write(f"{kwargs['sequences'][name].seq}\n")
+    elif fmt.lower() == 'columnar':
+        clusters = [(pidx, cidx, c) for pidx, par in partition.items() for cidx, c in par.items()]
+        sizes = [len(c) for _, _, c in clusters]
+        columns = {'sequence_id':[name for _, _, c in clusters for name in c],
+                   'cluster_id':np.repeat(np.asarray([cidx for _, cidx, _ in clusters]), sizes),
+                   'partition_id':np.repeat(np.asarray([pidx for pidx, _, _ in clusters], dtype=np.int32), sizes)}
+        write_columnar(columns, out_file)
     else:
         raise ValueError(f"Unknown output format: {fmt}")
 
 
+def write_partition_split(partition, out_prefix, sequences, folds=False, compress=False, buffer_size=1<<20):
+    """
+    Write one FASTA file per partition in one pass
+
+    Parameters
+    ----------
+    partition : dict
+        Partitioned sequences
+    out_prefix : str
+        Prefix of output files: {out_prefix}_partition_{i}.fasta, and
+        {out_prefix}_fold_{i}_train.fasta with folds
+    sequences : dict
+        Dict of sequences
+    folds : bool
+        Also write, for each partition, a training file of all other partitions
+    compress : bool
+        Write gzip files (.fasta.gz)
+    buffer_size : int
+        Buffer size of each file handle
+
+    Returns
+    -------
+    out_files : dict
+        Dict of partition id and output files (partition file, training file*)
+    """
+    ext = '.fasta.gz' if compress else '.fasta'
+    out_files = {pidx:[f"{out_prefix}_partition_{pidx}{ext}"] + ([f"{out_prefix}_fold_{pidx}_train{ext}"] if folds else []) for pidx in partition}
+
+    with contextlib.ExitStack() as stack:
+        handles = {}
+        for pidx, files in out_files.items():
+            if compress:
+                handles[pidx] = [stack.enter_context(io.TextIOWrapper(io.BufferedWriter(gzip.open(out_file, 'wb'), buffer_size))) for out_file in files]
+            else:
+                handles[pidx] = [stack.enter_context(open(out_file, 'w', buffering=buffer_size)) for out_file in files]
+
+        for pidx, par in partition.items():
+            valid = handles[pidx][0]
+            train = [handles[other][1] for other in partition if folds and other != pidx]
+            for cidx, c in par.items():
+                for name in c:
+                    record = f">{name} Cluster_{cidx} Partition_{pidx}\n{sequences[name].seq}\n"
+                    valid.write(record)
+                    for f in train:
+                        f.write(record)
+
+    return out_files
+
+
 def write_cluster(cluster, out_file, fmt='json', **kwargs):
     """
     Write cluster to file
@@ -140,16 +475,16 @@ def write_cluster(cluster, out_file, fmt='json', **kwargs):
     ----------
     cluster : Cluster
         Cluster object
-    out_file : str
-        Path to output file
+    out_file : str/file
+        Path to output file, or an open file object
     fmt : str
         Output format
     kwargs : dict
-        Keyword arguments for output format
+        Keyword arguments for output format (pretty: indented JSON)
     """
 
     if fmt.lower() == 'txt':
-        with open(out_file, 'w') as f:
+        with open_output(out_file) as f:
             f.write(f"# Clustering method: {kwargs['method']}\n")
             f.write(f"# Threshold: {kwargs['threshold']}\n")
             f.write(f"# Number of clusters: {cluster.num_data(by='sum')}\n")
@@ -157,26 +492,176 @@ def write_cluster(cluster, out_file, fmt='json', **kwargs):
                 for name in c:
                     f.write(f"ClustID {cidx} {name}\n")
     elif fmt.lower() == 'json':
-        with open(out_file, 'w') as f:
-            cluster_named = {f"Cluster_{cidx}":c for cidx, c in cluster.items()}
-            json.dump(cluster_named, f, indent=4)
+        with open_output(out_file) as f:
+            cluster_named = ((f"Cluster_{cidx}", c) for cidx, c in cluster.items())
+            dump_json_items(cluster_named, f, indent=4 if kwargs.get('pretty') else None)
     elif fmt.lower() == 'csv':
-        with open(out_file, 'w') as f:
+        with open_output(out_file) as f:
             f.write('SequenceID,ClusterID\n')
             for cidx, c in cluster.items():
                 for name in c:
                     f.write(f"{name},{cidx}\n")
     elif fmt.lower() in ('fasta', 'fa'):
-        with open(out_file, 'w') as f:
+        with open_output(out_file) as f:
             for cidx, c in cluster.items():
                 for name in c:
                     f.write(f">{name} Cluster_{cidx}\n")
                     f.write(f"{kwargs['sequences'][name].seq}\n")
+    elif fmt.lower() == 'columnar':
+        sizes = [len(c) for c in cluster.clusters.values()]
+        columns = {'sequence_id':[name for c in cluster.clusters.values() for name in c],
+                   'cluster_id':np.repeat(np.asarray(list(cluster.clusters.keys())), sizes)}
+        write_columnar(columns, out_file)
+    else:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+
+def group_labels(groups, seq_index):
+    """
+    Label of each sequence from groups of sequences
+
+    Parameters
+    ----------
+    groups : dict
+        Dict of label and list of sequence ids
+    seq_index : dict
+        Dict of sequence id and row index
+
+    Returns
+    -------
+    labels : np.array
+        Label of each row, -1 for sequences not in any group
+    """
+    labels = np.full(len(seq_index), -1, dtype=np.int64)
+    sizes = [len(g) for g in groups.values()]
+    rows = np.fromiter((seq_index[name] for g in groups.values() for name in g), dtype=np.int64, count=sum(sizes))
+    labels[rows] = np.repeat(np.asarray(list(groups.keys()), dtype=np.int64), sizes)
+    return labels
+
+
+def write_label_matrix(seq_ids, labels, out_file, fmt='csv'):
+    """
+    Write a sequence by threshold label table
+
+    Parameters
+    ----------
+    seq_ids : list
+        Sequence ids, one row each
+    labels : dict
+        Dict of column name and labels of each row
+    out_file : str/file
+        Path to output file, or an open file object (binary for 'columnar')
+    fmt : str
+        Output format ('csv' or 'columnar')
+    """
+    import pandas as pd
+    if fmt.lower() == 'csv':
+        df = pd.DataFrame(labels)
+        df.insert(0, 'SequenceID', seq_ids)
+        df.to_csv(out_file, index=False)
+    elif fmt.lower() == 'columnar':
+        write_columnar({'sequence_id':seq_ids, **labels}, out_file)
+    else:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+
+def has_pyarrow():
+    """
+    Check if pyarrow is installed
+
+    Returns
+    -------
+    result : bool
+        True if pyarrow can be imported, False otherwise
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def output_extension(fmt):
+    """
+    File extension of output format
+
+    Parameters
+    ----------
+    fmt : str
+        Output format
+
+    Returns
+    -------
+    ext : str
+        File extension without dot
+    """
+    if fmt.lower() == 'columnar':
+        return 'parquet' if has_pyarrow() else 'npz'
+    return fmt.lower()
+
+
+def write_columnar(columns, out_file):
+    """
+    Write columns to a typed columnar file in one call
+
+    Parameters
+    ----------
+    columns : dict
+        Dict of column name and values
+    out_file : str/file
+        Path to output file, Parquet if it ends with .parquet (requires pyarrow), NPZ otherwise.
+        Or an open binary file object, Parquet if pyarrow is installed, NPZ otherwise
+    """
+    if (out_file.endswith('.parquet') if isinstance(out_file, str) else has_pyarrow()):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({name:pa.array(values) for name, values in columns.items()})
+        pq.write_table(table, out_file)
+    else:
+        np.savez_compressed(out_file, **{name:np.asarray(values) for name, values in columns.items()})
+
+
+def write_partition_batch(cluster, cluster_ids, assignments, out_file, fmt='csv', random_seeds=None):
+    """
+    Write replicate partitionings to one file
+
+    Parameters
+    ----------
+    cluster : Cluster
+        Cluster object
+    cluster_ids : list
+        Cluster ids, the column order of assignments
+    assignments : np.array
+        Partition id of each cluster in each replicate, shape (replicates, clusters)
+    out_file : str/file
+        Path to output file, or an open file object (binary for 'npz')
+    fmt : str
+        Output format ('csv' or 'npz')
+    random_seeds : list
+        Random seed of each replicate, used as column names. None: replicate index
+    """
+    import pandas as pd
+    if random_seeds is None:
+        random_seeds = list(range(assignments.shape[0]))
+
+    # expand clusters to sequences once for all replicates
+    sizes = np.array([len(cluster.clusters[c_id]) for c_id in cluster_ids], dtype=np.int64)
+    seq_ids = [name for c_id in cluster_ids for name in cluster.clusters[c_id]]
+    seq_cluster = np.repeat(np.arange(len(cluster_ids)), sizes)
+
+    if fmt.lower() == 'csv':
+        df = pd.DataFrame(assignments[:, seq_cluster].T, columns=[f"Seed_{seed}" for seed in random_seeds])
+        df.insert(0, 'ClusterID', np.asarray(cluster_ids)[seq_cluster])
+        df.insert(0, 'SequenceID', seq_ids)
+        df.to_csv(out_file, index=False)
+    elif fmt.lower() == 'npz':
+        np.savez_compressed(out_file, sequence_id=np.array(seq_ids, dtype=str), cluster_id=np.asarray(cluster_ids)[seq_cluster],
+                            random_seed=np.asarray(random_seeds), partition_id=assignments[:, seq_cluster])
     else:
         raise ValueError(f"Unknown output format: {fmt}")
 
 
-def hobohm1(sequences, measurement, threshold, op=operator.le, reduce_redundancy=True):
+def hobohm1(sequences, measurement, threshold, op=operator.le, reduce_redundancy=True, symmetric=False):
     """
     Redundancy reduction
 
@@ -185,9 +670,12 @@ def hobohm1(sequences, measurement, threshold, op=operator.le, reduce_redundancy
     sequences : dict
         Dict of sequences
     measurement : tuple
-        List of measurement (seq1, seq2, measurement)
+        List of measurement (seq1, seq2, measurement, ...), further columns are ignored
     threshold : float
         Threshold for redundancy reduction
+    symmetric : bool
+        The measurement is a canonical edge table, whose edges hold for both
+        directions. False: only hits of the shorter sequence to a kept one count
 
     Returns
     -------
@@ -196,7 +684,7 @@ def hobohm1(sequences, measurement, threshold, op=operator.le, reduce_redundancy
     """
     # hobohm1
     sequences_id_s = sorted(sequences, key=lambda x:len(sequences[x].seq), reverse=True)
-    measurement_dict = {(seq1, seq2):measure for seq1, seq2, measure in measurement}
+    measurement_dict = {(row[0], row[1]):row[2] for row in measurement}
 
     unique_seq = dict()
     for qseq_id in sequences_id_s:
@@ -207,8 +695,8 @@ def hobohm1(sequences, measurement, threshold, op=operator.le, reduce_redundancy
         for useq_id in unique_seq:
             if (qseq_id, useq_id) in measurement_dict:
                 measure = measurement_dict[(qseq_id, useq_id)]
-            # elif (useq_id, qseq_id) in measurement_dict:
-            #     measure = measurement_dict[(useq_id, qseq_id)]
+            elif symmetric and (useq_id, qseq_id) in measurement_dict:
+                measure = measurement_dict[(useq_id, qseq_id)]
             else:
                 measure = 11
             
@@ -261,7 +749,44 @@ def init_logging(tmp_dir):
     return logger
 
 
-def plot_silhouette(clusters, sample_silhouette_values, mean_silhouettes, threshold):
+def _silhouette_groups(clusters, sample_silhouette_values, num_clusters=10):
+    """
+    Sorted silhouettes of the first clusters
+
+    Parameters
+    ----------
+    clusters : Cluster
+        Cluster object
+    sample_silhouette_values : np.array
+        Silhouette samples, in the order of clusters.index()
+    num_clusters : int
+        Number of clusters, labelled 0 to num_clusters - 1
+
+    Returns
+    -------
+    groups : list
+        Sorted silhouettes of each cluster label, empty for missing labels
+    """
+    # one sort groups the samples by cluster, with sorted silhouettes in each group
+    labels = np.fromiter(clusters.index().values(), dtype=np.int64, count=len(sample_silhouette_values))
+    order = np.lexsort((sample_silhouette_values, labels))
+    values = sample_silhouette_values[order]
+    cluster_ids, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+    groups = [values[:0]] * num_clusters
+    for cluster_id, start, size in zip(cluster_ids, starts, sizes):
+        if 0 <= cluster_id < num_clusters:
+            groups[cluster_id] = values[start:start + size]
+    return groups
+
+
+def _quantile_rows(values, num_rows):
+    """
+    Evenly spaced rows of sorted values, including the first and the last
+    """
+    return values[np.linspace(0, len(values) - 1, num_rows).astype(np.int64)]
+
+
+def plot_silhouette(clusters, sample_silhouette_values, mean_silhouettes, threshold, max_rows=None):
     """
     Plot silhouettes
 
@@ -270,47 +795,43 @@ def plot_silhouette(clusters, sample_silhouette_values, mean_silhouettes, thresh
     clusters : Cluster
         Cluster object
     sample_silhouette_values : np.array
-        Silhouette samples
+        Silhouette samples, in the order of clusters.index()
     mean_silhouettes : float
         Mean silhouette
+    threshold : float/str
+        Threshold for clustering
+    max_rows : int
+        Maximum number of rows drawn. Larger clusters are down-sampled to evenly
+        spaced quantiles of their sorted silhouettes, keeping their height
+        (Default: all rows)
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     fig, ax = plt.subplots(figsize=(6, 6))
 
-    y_lower = 10
-    
-    clusters_sorted = clusters.sort()
-
-    cluster_labels = [i for i in clusters_sorted.index().values()]
-    n_clusters = len(clusters_sorted)
     n_colors = 10
     cluster_colors = sns.cubehelix_palette(n_colors=n_colors, as_cmap=False)[::-1]
-    for i in range(n_colors):
-        # i_cluster = n_clusters[i]
-        # Aggregate the silhouette scores for samples belonging to
-        # cluster i, and sort them
-        cluster_idx = [j for j, x in enumerate(cluster_labels) if x == i]
-        ith_cluster_silhouette_values = sample_silhouette_values[cluster_idx]
 
-        ith_cluster_silhouette_values.sort()
+    groups = _silhouette_groups(clusters, sample_silhouette_values, n_colors)
+    total = sum(len(group) for group in groups)
+    scale = max_rows / total if max_rows is not None and total > max_rows else 1
 
+    x_text = sample_silhouette_values.min() - (sample_silhouette_values.max() - sample_silhouette_values.min()) * 0.03
+    y_lower = 10
+    for i, ith_cluster_silhouette_values in enumerate(groups):
         size_cluster_i = ith_cluster_silhouette_values.shape[0]
-        
-        # if size_cluster_i > 10:
-        #     ax.text(-1.05, y_lower + 0.5 * size_cluster_i, str(i), fontsize=5)
-        #     y_upper = y_lower + size_cluster_i
-
-        #     #color = cm.nipy_spectral(float(i) / n_clusters)
-        #     color = cluster_colors[i]
-        #     ax.fill_betweenx(list(range(y_lower, y_upper)), 0, ith_cluster_silhouette_values, facecolor=color, edgecolor=color, alpha=0.7)
-
-        #     # Compute the new y_lower for next plot
-        #     y_lower = y_upper + 10  # 10 for the 0 samples
-        ax.text(sample_silhouette_values.min() - (sample_silhouette_values.max() - sample_silhouette_values.min()) * 0.03, y_lower + 0.5 * size_cluster_i, str(i), fontsize=5)
         y_upper = y_lower + size_cluster_i
 
-        #color = cm.nipy_spectral(float(i) / n_clusters)
+        if scale < 1 and size_cluster_i > 1:
+            num_rows = max(2, int(size_cluster_i * scale))
+            ith_cluster_silhouette_values = _quantile_rows(ith_cluster_silhouette_values, num_rows)
+            y = np.linspace(y_lower, y_upper - 1, num_rows)
+        else:
+            y = np.arange(y_lower, y_upper)
+
+        ax.text(x_text, y_lower + 0.5 * size_cluster_i, str(i), fontsize=5)
         color = cluster_colors[i]
-        ax.fill_betweenx(list(range(y_lower, y_upper)), 0, ith_cluster_silhouette_values, facecolor=color, edgecolor=color, alpha=0.7)
+        ax.fill_betweenx(y, 0, ith_cluster_silhouette_values, facecolor=color, edgecolor=color, alpha=0.7)
 
         # Compute the new y_lower for next plot
         y_lower = y_upper + 10  # 10 for the 0 samples
@@ -340,6 +861,8 @@ def create_report(clusters, measurement, output_file, **kwargs):
     output_dir : str
         Path to output directory
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     # load html template
     template_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'template', 'template.html')
@@ -385,7 +908,7 @@ def create_report(clusters, measurement, output_file, **kwargs):
         f.write(template)
 
 
-def draw_figures(clusters, silhouette_per_sample, output_dir, threshold):
+def draw_figures(clusters, silhouette_per_sample, output_dir, threshold, dpi=300, fast=False, silhouette_rows=10000):
     """
     Draw figures
 
@@ -393,11 +916,28 @@ def draw_figures(clusters, silhouette_per_sample, output_dir, threshold):
     ----------
     clusters : Cluster
         Cluster object
-    measurement : tuple
-        List of measurement (seq1, seq2, measurement)
+    silhouette_per_sample : tuple
+        Silhouette per sample from Cluster.silhouette (data_list, data_label, values)
     output_dir : str
         Path to output directory
+    threshold : float/str
+        Threshold for clustering
+    dpi : int
+        Resolution of figures
+    fast : bool
+        Draw the histogram with matplotlib only
+    silhouette_rows : int
+        Maximum number of rows in the silhouette plot, well above the pixel
+        height of the figure
+
+    Returns
+    -------
+    hist_file : str
+        Path to histogram of cluster size
+    silhouettes_file : str
+        Path to silhouette plot
     """
+    import matplotlib.pyplot as plt
 
     #output_dir = os.path.dirname(output_file)
     hist_file = os.path.join(output_dir, f"cluster_size_{threshold}.png")
@@ -406,11 +946,16 @@ def draw_figures(clusters, silhouette_per_sample, output_dir, threshold):
     # draw histogram of cluster size
     cluster_size_list = list(map(len, clusters.clusters.values()))
     fig, ax = plt.subplots()
-    sns.histplot(cluster_size_list, ax=ax, bins=30, color='#aa688f', edgecolor='k', linewidth=1, alpha=1, kde=False)
+    if fast:
+        ax.hist(cluster_size_list, bins=30, color='#aa688f', edgecolor='k', linewidth=1)
+    else:
+        import seaborn as sns
+        sns.histplot(cluster_size_list, ax=ax, bins=30, color='#aa688f', edgecolor='k', linewidth=1, alpha=1, kde=False)
     ax.set_xlabel('Cluster size')
     ax.set_ylabel('Number of clusters')
     ax.set_title(f"Distribution of cluster size at {threshold}")
-    fig.savefig(hist_file, dpi=300, transparent=True, bbox_inches='tight')
+    fig.savefig(hist_file, dpi=dpi, transparent=True, bbox_inches='tight')
+    plt.close(fig)
 
     # draw silhouettes
     if silhouette_per_sample[-1] is None:
@@ -419,18 +964,19 @@ def draw_figures(clusters, silhouette_per_sample, output_dir, threshold):
         fig, ax= plt.subplots(figsize=(6, 6))
         ax.text(0.5, 0.5, f"Silhouette coefficient requires\n at least 2 clusters\n and at most {clusters.num_data(by='sum')-1} clusters",
                 horizontalalignment='center', verticalalignment='center',
-                linespacing=2, transform=plt.gca().transAxes)
+                linespacing=2, transform=ax.transAxes)
         ax.set_yticks([])
-        fig.savefig(silhouettes_file, dpi=300)
+        fig.savefig(silhouettes_file, dpi=dpi)
     else:
         mean_silhouettes = np.mean(silhouette_per_sample[-1]).round(3)
-        fig, ax = plot_silhouette(clusters, silhouette_per_sample[-1], mean_silhouettes, threshold)
-        fig.savefig(silhouettes_file, dpi=300, transparent=True, bbox_inches='tight')
+        fig, ax = plot_silhouette(clusters, silhouette_per_sample[-1], mean_silhouettes, threshold, max_rows=silhouette_rows)
+        fig.savefig(silhouettes_file, dpi=dpi, transparent=True, bbox_inches='tight')
+    plt.close(fig)
     
     return hist_file, silhouettes_file
 
 
-def plot_sizebar(size_thres_dict, max_partition_size, output_dir):
+def plot_sizebar(size_thres_dict, max_partition_size, output_dir, dpi=300, fast=False):
     """
     Plot size bar
 
@@ -442,24 +988,142 @@ def plot_sizebar(size_thres_dict, max_partition_size, output_dir):
         Maximum partition size
     output_dir : str
         Path to output directory
+    dpi : int
+        Resolution of figure
+    fast : bool
+        Draw the bars with matplotlib only
     """
+    import matplotlib.pyplot as plt
 
     fig, ax = plt.subplots(figsize=(6, 6))
-    sns.barplot(x=list(size_thres_dict.keys())[::-1], y=list(size_thres_dict.values())[::-1], color='#aa688f')
+    if fast:
+        ax.bar([str(i) for i in list(size_thres_dict.keys())[::-1]], list(size_thres_dict.values())[::-1], color='#aa688f')
+    else:
+        import seaborn as sns
+        sns.barplot(x=list(size_thres_dict.keys())[::-1], y=list(size_thres_dict.values())[::-1], color='#aa688f', ax=ax)
     ax.axhline(y=max_partition_size, color='r', linestyle='--')
     x_min = min([i for i in size_thres_dict.keys() if isinstance(i, float)])
     ax.text(x_min, max_partition_size * 1.1, f"Max partition capacity: {max_partition_size}", color='r')
     ax.set_xlabel('Threshold')
     ax.set_ylabel('Max cluster size')
     ax.set_title('Max cluster size at different threshold')
-    fig.savefig(os.path.join(output_dir, 'size_bar.png'), dpi=300, transparent=True, bbox_inches='tight')
+    fig.savefig(os.path.join(output_dir, 'size_bar.png'), dpi=dpi, transparent=True, bbox_inches='tight')
+    plt.close(fig)
 
     return os.path.join(output_dir, 'size_bar.png')
 
 
-def draw_scatter_histogram(measurement, sequences, output_dir):
+def write_measurement(measurement, output_dir, fmt='csv', chunk_size=1000000):
+    """
+    Export the measurement with derived columns in chunks
+
+    Each pair is written once (qseqid <= sseqid) with the columns qseqid, sseqid,
+    evalue, nident, qlen, slen, npid, nloge and sqlen_category. The derived columns
+    are computed per chunk, so no full-size table is held in memory.
+
+    Parameters
+    ----------
+    measurement : tuple
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen)
+    output_dir : str
+        Path to output directory
+    fmt : str
+        'csv': gzip compressed CSV (measurement.csv.gz)
+        'parquet': Parquet (measurement.parquet), requires pyarrow
+    chunk_size : int
+        Number of hits per chunk
+
+    Returns
+    -------
+    output_file : str
+        Path to output file
+    """
+    import pandas as pd
+    if fmt == 'parquet' and not has_pyarrow():
+        warnings.warn("pyarrow is not installed, the measurement is exported as CSV")
+        fmt = 'csv'
+    if fmt not in ['csv', 'parquet']:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+    categories = np.array(["<100", "100-200", "200-300", ">300"])
+    output_file = os.path.join(output_dir, 'measurement.csv.gz' if fmt == 'csv' else 'measurement.parquet')
+    with contextlib.ExitStack() as stack:
+        writer = None
+        for start in range(0, max(len(measurement), 1), chunk_size):
+            chunk = measurement[start:start + chunk_size]
+            qseqid, sseqid, evalue, nident, qlen, slen = (list(map(operator.itemgetter(i), chunk)) for i in range(6)) if chunk else ([],) * 6
+            keep = np.fromiter(map(operator.le, qseqid, sseqid), dtype=bool, count=len(chunk))
+            columns = {'qseqid':np.asarray(qseqid, dtype=object)[keep], 'sseqid':np.asarray(sseqid, dtype=object)[keep]}
+            for name, values in (('evalue', evalue), ('nident', nident), ('qlen', qlen), ('slen', slen)):
+                columns[name] = np.asarray(values, dtype=np.float64)[keep]
+            min_len = np.minimum(columns['qlen'], columns['slen'])
+            columns['evalue'][columns['evalue'] == 0] = 1e-180
+            columns['npid'] = columns['nident'] / min_len
+            columns['nloge'] = -np.log10(columns['evalue'])
+            columns['sqlen_category'] = categories[np.digitize(min_len, [100, 200, 300], right=True)]
+
+            if fmt == 'csv':
+                if writer is None:
+                    writer = stack.enter_context(gzip.open(output_file, 'wt'))
+                    pd.DataFrame(columns).to_csv(writer, index=False)
+                else:
+                    pd.DataFrame(columns).to_csv(writer, index=False, header=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.table(columns)
+                if writer is None:
+                    writer = stack.enter_context(pq.ParquetWriter(output_file, table.schema))
+                writer.write_table(table)
+
+    return output_file
+
+
+def hit_density(measurement, bins=100):
+    """
+    Bin hits by normalized percentage identity, negative log10 E-value and length
+
+    Each pair is counted once (qseqid <= sseqid); read_blastp keeps the first hit per
+    (qseqid, sseqid). Canonical edge tables have only such pairs.
+
+    Parameters
+    ----------
+    measurement : tuple
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen)
+    bins : int
+        Number of bins along NPID and nlogE
+
+    Returns
+    -------
+    counts : np.array
+        Number of hits per (NPID bin, nlogE bin, length category), shape (bins, bins, 4)
+    npid_edges : np.array
+        Bin edges of normalized percentage identity
+    nloge_edges : np.array
+        Bin edges of negative log10 E-value
+    """
+    seq1, seq2, evalue, nident, qlen, slen = (list(map(operator.itemgetter(i), measurement)) for i in range(6))
+    keep = np.fromiter(map(operator.le, seq1, seq2), dtype=bool, count=len(measurement))
+    evalue = np.asarray(evalue, dtype=np.float64)[keep]
+    min_len = np.minimum(np.asarray(qlen, dtype=np.float64)[keep], np.asarray(slen, dtype=np.float64)[keep])
+    npid = np.asarray(nident, dtype=np.float64)[keep] / min_len
+    nloge = -np.log10(np.where(evalue == 0, 1e-180, evalue))
+    category = np.digitize(min_len, [100, 200, 300], right=True)
+
+    npid_edges = np.linspace(0, max(1.0, npid.max(initial=0)), bins + 1)
+    nloge_edges = np.linspace(min(0.0, nloge.min(initial=0)), max(1.0, nloge.max(initial=0)), bins + 1)
+    counts, _ = np.histogramdd((npid, nloge, category), bins=(npid_edges, nloge_edges, np.arange(5) - 0.5))
+
+    return counts, npid_edges, nloge_edges
+
+
+def draw_scatter_histogram(measurement, sequences, output_dir, dpi=300, bins=100):
     """
-    Draw scatter plot and histogram of measurement
+    Draw binned density and histogram of measurement
+
+    The joint panel is a 2D histogram of all hits and the marginals are stacked
+    histograms per length category from the same bins, so the cost depends on the
+    number of bins, not the number of hits.
 
     Parameters
     ----------
@@ -469,42 +1133,144 @@ def draw_scatter_histogram(measurement, sequences, output_dir):
         Dict of sequences
     output_dir : str
         Path to output directory
+    dpi : int
+        Resolution of figure
+    bins : int
+        Number of bins along each axis
     
     Returns
     -------
     output_file : str
         Path to output file
     """
-    
-    df_measurement = pd.DataFrame(measurement, columns=['qseqid', 'sseqid', 'evalue', 'nident', 'qlen', 'slen'])
-    df_measurement = df_measurement.drop_duplicates(['qseqid', 'sseqid'], keep='first')
-    df_measurement = df_measurement[df_measurement['qseqid'] <= df_measurement['sseqid']]
-    df_measurement['npid'] = df_measurement['nident'] / df_measurement[['qlen', 'slen']].min(axis=1)
-    df_measurement['evalue'] = df_measurement['evalue'].replace(0, 1e-180)
-    df_measurement['nloge'] = -np.log10(df_measurement['evalue'])
-    df_measurement['sqlen_category'] = pd.cut(df_measurement[['qlen', 'slen']].min(axis=1), bins=[0, 100, 200, 300, 1000], labels=["<100", "100-200", "200-300", ">300"])
-    df_measurement.to_csv(os.path.join(output_dir, 'measurement.csv'), index=False)
-
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    counts, npid_edges, nloge_edges = hit_density(measurement, bins=bins)
+    categories = ["<100", "100-200", "200-300", ">300"]
     color_palette = sns.cubehelix_palette(4)
-    
-    # Initialize the JointGrid
-    g = sns.JointGrid(x='npid', y='nloge', data=df_measurement, hue='sqlen_category', height=8)
-    # g = sns.JointGrid(x=measurement_T[3], y=measurement_T[2], hue=qlen_categories, height=8)
 
-    # Plot a scatter plot in the center
-    g.plot_joint(sns.scatterplot, alpha=0.5, palette=color_palette)
-
-    # Plot histograms on the margins
-    g.plot_marginals(sns.histplot, palette=color_palette, kde=False)
-    g.plot_marginals(sns.histplot, palette=color_palette, kde=False)
+    fig = plt.figure(figsize=(8, 8))
+    grid = fig.add_gridspec(2, 2, width_ratios=(5, 1), height_ratios=(1, 5), wspace=0.05, hspace=0.05)
+    ax_joint = fig.add_subplot(grid[1, 0])
+    ax_marg_x = fig.add_subplot(grid[0, 0], sharex=ax_joint)
+    ax_marg_y = fig.add_subplot(grid[1, 1], sharey=ax_joint)
+
+    # 2D histogram in the center
+    joint = counts.sum(axis=2)
+    mesh = ax_joint.pcolormesh(npid_edges, nloge_edges, np.ma.masked_equal(joint, 0).T, cmap=sns.cubehelix_palette(as_cmap=True), norm=matplotlib.colors.LogNorm(vmin=1, vmax=max(1, joint.max())))
+    cax = ax_joint.inset_axes([0.05, 0.93, 0.3, 0.02])
+    fig.colorbar(mesh, cax=cax, orientation='horizontal', label='Number of hits')
+
+    # stacked histograms on the margins from the same bins
+    bottom_x = np.zeros(len(npid_edges) - 1)
+    bottom_y = np.zeros(len(nloge_edges) - 1)
+    for c, label in enumerate(categories):
+        count_x = counts[:, :, c].sum(axis=1)
+        count_y = counts[:, :, c].sum(axis=0)
+        ax_marg_x.bar(npid_edges[:-1], count_x, width=np.diff(npid_edges), bottom=bottom_x, align='edge', color=color_palette[c], label=label)
+        ax_marg_y.barh(nloge_edges[:-1], count_y, height=np.diff(nloge_edges), left=bottom_y, align='edge', color=color_palette[c])
+        bottom_x += count_x
+        bottom_y += count_y
+    ax_marg_x.tick_params(labelbottom=False)
+    ax_marg_y.tick_params(labelleft=False)
 
     # change the labels
-    g.set_axis_labels('Normalized percentage identity', 'Negative log10 E-value')
+    ax_joint.set_xlabel('Normalized percentage identity')
+    ax_joint.set_ylabel('Negative log10 E-value')
 
-    # change the legend title
-    g.ax_joint.legend(loc='upper left', title='Shorter query length')
+    # legend in the free corner
+    ax_legend = fig.add_subplot(grid[0, 1])
+    ax_legend.axis('off')
+    ax_legend.legend(*ax_marg_x.get_legend_handles_labels(), loc='center', title='Shorter query length', fontsize='small', title_fontsize='small')
 
     output_file = os.path.join(output_dir, 'scatter_evalue.png')
-    plt.savefig(output_file, dpi=300, transparent=True, bbox_inches='tight')
+    fig.savefig(output_file, dpi=dpi, transparent=True, bbox_inches='tight')
+    plt.close(fig)
 
     return output_file
+
+
+def figure_summary(clusters, silhouette_per_sample, threshold, bins=30, num_rows=50):
+    """
+    Data of the cluster size and silhouette figures, drawn by the browser
+
+    Parameters
+    ----------
+    clusters : Cluster
+        Cluster object
+    silhouette_per_sample : tuple
+        Silhouette per sample from Cluster.silhouette (data_list, data_label, values)
+    threshold : float/str
+        Threshold for clustering
+    bins : int
+        Number of bins of the cluster size histogram
+    num_rows : int
+        Number of quantiles of the silhouettes per cluster
+
+    Returns
+    -------
+    summary : dict
+        Cluster size histogram and silhouette quantiles of the first 10 clusters
+    """
+    counts, edges = np.histogram(np.fromiter(map(len, clusters.clusters.values()), dtype=np.int64), bins=bins)
+    summary = {'threshold':str(threshold),
+               'sizes':{'edges':np.round(edges, 2).tolist(), 'counts':counts.tolist()},
+               'silhouette':None}
+
+    if silhouette_per_sample[-1] is not None:
+        values = silhouette_per_sample[-1]
+        groups = _silhouette_groups(clusters, values)
+        summary['silhouette'] = {'mean':round(float(np.mean(values)), 3),
+                                 'min':round(float(values.min()), 4),
+                                 'max':round(float(values.max()), 4),
+                                 'clusters':[{'size':len(group),
+                                              'values':np.round(_quantile_rows(group, min(len(group), num_rows)), 4).tolist()} for group in groups]}
+    return summary
+
+
+def sizebar_summary(size_thres_dict, max_partition_size):
+    """
+    Data of the max cluster size figure, drawn by the browser
+
+    Parameters
+    ----------
+    size_thres_dict : dict
+        Dict of threshold and max cluster size
+    max_partition_size : int
+        Maximum partition size
+
+    Returns
+    -------
+    summary : dict
+        Thresholds, max cluster sizes and the partition capacity
+    """
+    return {'thresholds':[str(t) for t in size_thres_dict][::-1],
+            'sizes':[int(size) for size in size_thres_dict.values()][::-1],
+            'capacity':int(max_partition_size)}
+
+
+def density_summary(measurement, bins=50):
+    """
+    Data of the E-value vs identity figure, drawn by the browser
+
+    Parameters
+    ----------
+    measurement : tuple
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen)
+    bins : int
+        Number of bins along each axis
+
+    Returns
+    -------
+    summary : dict
+        Bin edges, 2D histogram of all hits (npid x nloge) and marginal histograms
+        per length category
+    """
+    counts, npid_edges, nloge_edges = hit_density(measurement, bins=bins)
+    return {'categories':["<100", "100-200", "200-300", ">300"],
+            'npid_edges':np.round(npid_edges, 4).tolist(),
+            'nloge_edges':np.round(nloge_edges, 4).tolist(),
+            'counts':counts.sum(axis=2).astype(np.int64).tolist(),
+            'npid_counts':counts.sum(axis=1).T.astype(np.int64).tolist(),
+            'nloge_counts':counts.sum(axis=0).T.astype(np.int64).tolist()}
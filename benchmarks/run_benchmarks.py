@@ -0,0 +1,236 @@
+import argparse
+import datetime
+import gc
+import json
+import operator
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ProtParts.Clustering import Clustering
+from ProtParts.Partitioning import Partitioning
+from ProtParts.Profiler import max_rss
+from ProtParts.utils import read_seq, read_blastp, remove_duplicate, hobohm1, write_cluster, write_partition, has_pyarrow
+from benchmarks.synthetic import generate_families, generate_hits, write_fasta, write_hits
+
+# import the lazily loaded dependencies up front, so the first benchmark using
+# them does not pay for the import
+import Bio.SeqIO
+import networkx
+import sklearn.metrics
+
+# largest input size of each benchmark, above which it is skipped
+# (quadratic in time or memory in the number of sequences)
+DEFAULT_MAX_SIZES = {'Cluster.silhouette':10000,
+                     'hobohm1':10000,
+                     'Clustering._optimize_ratio':1000,
+                     'Partitioning.random_partitioning':100000}
+
+
+def measure(fn, *args, memory=True, **kwargs):
+    """
+    Time a function call, then repeat it under tracemalloc for its peak memory
+
+    Parameters
+    ----------
+    fn : callable
+        Function to benchmark
+    memory : bool
+        Also record the peak memory allocated by the call
+
+    Returns
+    -------
+    result : object
+        Result of the timed call
+    record : dict
+        Wall time, CPU time (seconds), peak memory (bytes) and maximum resident set
+        size of the process (bytes)
+    """
+    gc.collect()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = fn(*args, **kwargs)
+    record = {'wall_time':time.perf_counter() - wall_start, 'cpu_time':time.process_time() - cpu_start}
+
+    peak_memory = None
+    if memory:
+        # tracemalloc slows the call down, so memory is measured in a separate run
+        gc.collect()
+        tracemalloc.start()
+        fn(*args, **kwargs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    record['peak_memory'] = peak_memory
+    record['max_rss'] = max_rss()
+    return result, record
+
+
+def benchmark_size(size, work_dir, memory=True, max_sizes=DEFAULT_MAX_SIZES, threshold=1e-5, num_partitions=5, random_seed=0):
+    """
+    Run every benchmark on one synthetic dataset
+
+    Parameters
+    ----------
+    size : int
+        Number of sequences
+    work_dir : str
+        Directory of the generated input files and written outputs
+    memory : bool
+        Record the peak memory of each benchmark
+    max_sizes : dict
+        Largest input size of each benchmark, above which it is skipped
+    threshold : float
+        Threshold for clustering and redundancy reduction
+    num_partitions : int
+        Number of partitions
+    random_seed : int
+        Random seed of the generator
+
+    Returns
+    -------
+    results : list
+        List of benchmark records
+    """
+    results = []
+    def run(name, items, fn, *args, **kwargs):
+        if size > max_sizes.get(name, float('inf')):
+            print(f"{size:>9d}  {name:<35s} skipped")
+            results.append({'name':name, 'size':size, 'items':items, 'skipped':True})
+            return None
+        result, record = measure(fn, *args, memory=memory, **kwargs)
+        results.append({'name':name, 'size':size, 'items':items, **record})
+        peak_memory = f"{record['peak_memory'] / 2**20:10.1f} MiB" if record['peak_memory'] is not None else ''
+        print(f"{size:>9d}  {name:<35s} {record['wall_time']:9.3f} s {peak_memory}")
+        return result
+
+    # generate the input files
+    seq_file = os.path.join(work_dir, f"synthetic_{size}.fasta")
+    blastp_file = os.path.join(work_dir, f"synthetic_{size}.tab")
+    sequences, family, mutation = generate_families(size, random_seed=random_seed)
+    hits = generate_hits(sequences, family, mutation, random_seed=random_seed)
+    write_fasta(sequences, seq_file)
+    write_hits(hits, blastp_file)
+    del sequences, family, mutation, hits
+
+    # input
+    sequences = run('read_seq', size, read_seq, seq_file)
+    sequences = run('remove_duplicate', size, remove_duplicate, sequences)
+    measurement = run('read_blastp', os.path.getsize(blastp_file), read_blastp, blastp_file)
+    num_hits = len(measurement)
+
+    # clustering
+    clust = Clustering(threshold=threshold, method='graph', measurement_type='distance')
+    run('Clustering._graph', num_hits, clust._graph, sequences, measurement, operator.le)
+    cluster = clust.clustering(sequences, measurement)
+    run('Cluster.silhouette', num_hits, cluster.silhouette, measurement)
+    run('hobohm1', num_hits, hobohm1, sequences, measurement, threshold)
+    run('Clustering._optimize_ratio', num_hits, clust._optimize_ratio, sequences, measurement)
+
+    # partitioning
+    partitioner = Partitioning(num_partitions=num_partitions, num_sequences=len(sequences), method='random')
+    partitions = run('Partitioning.random_partitioning', len(cluster), partitioner.random_partitioning, cluster)
+    if partitions is None:
+        partitions = Partitioning(num_partitions=num_partitions, num_sequences=len(sequences), method='greedy').partition(cluster)
+
+    # writers
+    formats = ['json', 'csv', 'txt', 'fasta'] + (['columnar'] if has_pyarrow() else [])
+    for fmt in formats:
+        out_file = os.path.join(work_dir, f"synthetic_{size}_cluster.{fmt}")
+        run(f"write_cluster.{fmt}", len(sequences), write_cluster, cluster, out_file, fmt, sequences=sequences, method='graph', threshold=threshold)
+    for fmt in formats:
+        out_file = os.path.join(work_dir, f"synthetic_{size}_partition.{fmt}")
+        run(f"write_partition.{fmt}", len(sequences), write_partition, partitions, out_file, fmt, sequences=sequences, method='graph', threshold=threshold)
+
+    return results
+
+
+def environment():
+    """
+    Returns
+    -------
+    environment : dict
+        Commit, versions and machine of the run
+    """
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir, capture_output=True, text=True, check=True).stdout != ''
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {'commit':commit,
+            'dirty':dirty,
+            'timestamp':datetime.datetime.now().isoformat(timespec='seconds'),
+            'python':platform.python_version(),
+            'numpy':np.__version__,
+            'platform':platform.platform(),
+            'cpu_count':os.cpu_count()}
+
+
+def run_benchmarks(sizes, output_file, work_dir=None, memory=True, max_sizes=DEFAULT_MAX_SIZES, random_seed=0):
+    """
+    Parameters
+    ----------
+    sizes : list
+        Numbers of sequences
+    output_file : str
+        Path to output JSON file
+    work_dir : str
+        Directory of the generated input files and written outputs. None: a
+        temporary directory, removed after the run
+    memory : bool
+        Record the peak memory of each benchmark
+    max_sizes : dict
+        Largest input size of each benchmark, above which it is skipped
+    random_seed : int
+        Random seed of the generator
+
+    Returns
+    -------
+    report : dict
+        Environment and benchmark records, as written to output_file
+    """
+    report = {'environment':environment(), 'sizes':list(sizes), 'random_seed':random_seed, 'results':[]}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = tmp_dir if work_dir is None else work_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for size in sizes:
+            report['results'].extend(benchmark_size(size, work_dir, memory=memory, max_sizes=max_sizes, random_seed=random_seed))
+
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ProtParts on synthetic protein families', formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--sizes', action='store', dest='sizes', type=str, default='1000,10000,100000,1000000',
+                        help='Numbers of sequences (use comma , to separate multiple sizes)\n(Default: 1000,10000,100000,1000000)')
+    parser.add_argument('-o', action='store', dest='output_file', type=str, default='benchmark.json',
+                        help='Output JSON file\n(Default: benchmark.json)')
+    parser.add_argument('--workdir', action='store', dest='work_dir', type=str, default=None,
+                        help='Directory of the generated input files and written outputs.\nNone: a temporary directory\n(Default: None)')
+    parser.add_argument('--no-memory', action='store_false', dest='memory',
+                        help='Skip the peak memory runs, which repeat every benchmark under tracemalloc')
+    parser.add_argument('--max-size', action='append', dest='max_sizes', default=[], metavar='NAME=SIZE',
+                        help='Largest input size of a benchmark, above which it is skipped.\n'
+                             + '\n'.join(f"{name}={size}" for name, size in DEFAULT_MAX_SIZES.items()) + '\n(Default: the values above)')
+    parser.add_argument('--seed', action='store', dest='random_seed', type=int, default=0,
+                        help='Random seed of the generator\n(Default: 0)')
+    args = parser.parse_args(argv)
+
+    max_sizes = dict(DEFAULT_MAX_SIZES)
+    for item in args.max_sizes:
+        name, _, size = item.partition('=')
+        max_sizes[name] = float('inf') if size in ['inf', 'none'] else int(size)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    run_benchmarks(sizes, args.output_file, work_dir=args.work_dir, memory=args.memory, max_sizes=max_sizes, random_seed=args.random_seed)
+
+
+if __name__ == '__main__':
+    main()
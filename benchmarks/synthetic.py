@@ -0,0 +1,164 @@
+import numpy as np
+
+AMINO_ACIDS = np.frombuffer(b'ACDEFGHIKLMNPQRSTVWY', dtype=np.uint8)
+
+
+def generate_families(num_sequences, mean_family_size=5, min_length=80, max_length=400, max_mutation=0.6, random_seed=0):
+    """
+    Generate synthetic protein families
+
+    Each family has a random root sequence. Members are copies of the root with a
+    member-specific fraction of substituted residues, so members of one family
+    share a known fraction of identical residues.
+
+    Parameters
+    ----------
+    num_sequences : int
+        Number of sequences
+    mean_family_size : float
+        Mean family size (geometric distribution)
+    min_length : int
+        Minimum root sequence length
+    max_length : int
+        Maximum root sequence length
+    max_mutation : float
+        Maximum fraction of substituted residues of a member
+    random_seed : int
+        Random seed
+
+    Returns
+    -------
+    sequences : dict
+        Dict of sequence id and sequence
+    family : np.array
+        Family index of each sequence
+    mutation : np.array
+        Fraction of substituted residues of each sequence
+    """
+    rng = np.random.default_rng(random_seed)
+    # every family has at least one member, so num_sequences draws are enough
+    sizes = rng.geometric(1 / mean_family_size, num_sequences)
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), num_sequences) + 1]
+    sizes[-1] -= sizes.sum() - num_sequences
+    family = np.repeat(np.arange(len(sizes)), sizes)
+    mutation = rng.uniform(0, max_mutation, num_sequences)
+
+    sequences = {}
+    seq_idx = 0
+    for fam_idx, size in enumerate(sizes):
+        root = rng.choice(AMINO_ACIDS, rng.integers(min_length, max_length + 1))
+        members = np.broadcast_to(root, (size, len(root))).copy()
+        mutated = rng.random(members.shape) < mutation[seq_idx:seq_idx + size, None]
+        members[mutated] = rng.choice(AMINO_ACIDS, mutated.sum())
+        for member in members:
+            sequences[f"SYN{seq_idx:07d}"] = member.tobytes().decode('ascii')
+            seq_idx += 1
+    return sequences, family, mutation
+
+
+def generate_hits(sequences, family, mutation, hits_per_sequence=20, noise_hits=1, random_seed=0):
+    """
+    Generate a BLASTP hit table of synthetic protein families
+
+    Every sequence hits itself, the members of its family (a random sample of
+    hits_per_sequence members in larger families) and noise_hits random sequences
+    with a weak E-value. The identity of two members is
+    the expected fraction of residues unchanged in both, and the E-value falls
+    exponentially with the number of identical residues.
+
+    Parameters
+    ----------
+    sequences : dict
+        Dict of sequence id and sequence from generate_families
+    family : np.array
+        Family index of each sequence
+    mutation : np.array
+        Fraction of substituted residues of each sequence
+    hits_per_sequence : int
+        Maximum number of family hits per sequence, like max_target_seqs
+    noise_hits : int
+        Number of random weak hits per sequence
+    random_seed : int
+        Random seed
+
+    Returns
+    -------
+    measurement : list
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen)
+    """
+    rng = np.random.default_rng(random_seed)
+    seq_ids = list(sequences)
+    lengths = np.fromiter(map(len, sequences.values()), dtype=np.int64, count=len(seq_ids))
+    num_sequences = len(seq_ids)
+    starts = np.flatnonzero(np.r_[True, family[1:] != family[:-1]])
+    family_start = np.repeat(starts, np.diff(np.r_[starts, num_sequences]))
+    family_size = np.diff(np.r_[starts, num_sequences])[np.searchsorted(starts, np.arange(num_sequences), side='right') - 1]
+
+    # query and subject indices of family hits: every member of a family up to
+    # hits_per_sequence (self hit included), and random members beyond that
+    num_mates = np.minimum(family_size, hits_per_sequence)
+    query = [np.repeat(np.arange(num_sequences), num_mates)]
+    rank = np.arange(len(query[0])) - np.repeat(np.cumsum(num_mates) - num_mates, num_mates)
+    large = np.repeat(family_size > hits_per_sequence, num_mates)
+    rank[large] = (rng.random(large.sum()) * np.repeat(family_size, num_mates)[large]).astype(np.int64)
+    subject = [np.repeat(family_start, num_mates) + rank]
+    # self hits are kept for large families
+    query.append(np.arange(num_sequences)[family_size > hits_per_sequence])
+    subject.append(query[-1])
+    num_family = sum(map(len, query))
+    # noise hits
+    for _ in range(noise_hits):
+        query.append(np.arange(num_sequences))
+        subject.append(rng.integers(0, num_sequences, num_sequences))
+    query = np.concatenate(query)
+    subject = np.concatenate(subject)
+    noise = np.zeros(len(query), dtype=bool)
+    noise[num_family:] = True
+
+    # one hit per pair, like read_blastp
+    pair = query * num_sequences + subject
+    _, first = np.unique(pair, return_index=True)
+    first.sort()
+    query, subject, noise = query[first], subject[first], noise[first]
+    noise &= family[query] != family[subject]
+
+    min_length = np.minimum(lengths[query], lengths[subject])
+    identity = np.where(query == subject, 1.0, (1 - mutation[query]) * (1 - mutation[subject]) + 0.05)
+    identity[noise] = rng.uniform(0.05, 0.15, noise.sum())
+    nident = np.round(identity.clip(0, 1) * min_length)
+    evalue = 10.0 ** (2 - nident / 3)
+    evalue[noise] = rng.uniform(0.1, 10, noise.sum())
+    evalue = np.where(evalue < 1e-180, 0.0, np.minimum(evalue, 10.0))
+
+    return list(zip(map(seq_ids.__getitem__, query.tolist()), map(seq_ids.__getitem__, subject.tolist()),
+                    evalue.tolist(), nident.tolist(), lengths[query].astype(np.float64).tolist(), lengths[subject].astype(np.float64).tolist()))
+
+
+def write_fasta(sequences, out_file, width=60):
+    """
+    Parameters
+    ----------
+    sequences : dict
+        Dict of sequence id and sequence
+    out_file : str
+        Path to output file
+    width : int
+        Line width of sequences
+    """
+    with open(out_file, 'w') as f:
+        for seq_id, seq in sequences.items():
+            f.write(f">{seq_id}\n")
+            f.write('\n'.join(seq[i:i + width] for i in range(0, len(seq), width)) + '\n')
+
+
+def write_hits(measurement, out_file):
+    """
+    Parameters
+    ----------
+    measurement : list
+        List of measurement (seq1, seq2, evalue, nident, qlen, slen)
+    out_file : str
+        Path to output file (blastp outfmt 6 qseqid sseqid evalue nident qlen slen)
+    """
+    with open(out_file, 'w') as f:
+        f.writelines(f"{seq1}\t{seq2}\t{evalue:.3g}\t{nident:.0f}\t{qlen:.0f}\t{slen:.0f}\n" for seq1, seq2, evalue, nident, qlen, slen in measurement)
@@ -1,7 +1,71 @@
 import argparse
-from ProtParts.main import clust_partition
+import sys
+from ProtParts.main import clust_partition, query_tree, serve, write_shards, merge_shards
+
+
+def query(argv):
+    argparser = argparse.ArgumentParser(prog='protparts.py query', description="Query a saved merge tree", formatter_class=argparse.RawTextHelpFormatter)
+    argparser.add_argument('tree_file', action='store', help="Merge tree file (*_mergetree.npz)")
+    argparser.add_argument('-c', action='store', dest='threshold_c', type=str, required=True, help="Threshold for clustering (use comma , to separate multiple thresholds)")
+    argparser.add_argument('-s', action='store', dest='stat', default='count', choices=['count', 'max', 'cluster'], help="count: number of clusters\nmax: maximum cluster size\ncluster: clusters\n(Default: count)")
+    argparser.add_argument('-f', action='store', dest='fmt', default='JSON', choices=['JSON', 'TXT', 'CSV', 'COLUMNAR'], help="Output format of clusters\n(Default: JSON)")
+    argparser.add_argument('-o', action='store', dest='output_file', default=None, help="Output file of clusters\n(Default: print to stdout)")
+    argparser.add_argument('--pretty', action='store_true', dest='pretty', help="Indent JSON output")
+
+    args = argparser.parse_args(argv)
+    query_tree(args)
+
+
+def serve_args(argv):
+    argparser = argparse.ArgumentParser(prog='protparts.py serve', description="Serve clustering and partitioning requests with datasets kept in memory", formatter_class=argparse.RawTextHelpFormatter)
+    argparser.add_argument('--host', action='store', dest='host', default='127.0.0.1', help="Host of the HTTP server, a loopback address\n(Default: 127.0.0.1)")
+    argparser.add_argument('--port', action='store', dest='port', type=int, default=8000, help="Port of the HTTP server\n(Default: 8000)")
+    argparser.add_argument('--socket', action='store', dest='unix_socket', default=None, help="Path to a Unix socket, used instead of host and port")
+    argparser.add_argument('--data-root', action='store', dest='data_root', default='.', help="Directory of the datasets. Paths outside it are refused\n(Default: current directory)")
+    argparser.add_argument('--max-datasets', action='store', dest='max_datasets', type=int, default=4, help="Maximum number of datasets kept in memory\n(Default: 4)")
+    argparser.add_argument('--makeblastdb', action='store', dest='makeblastdb_exec', help="Path to makeblastdb executable\n(Default: config.MAKEBLASTDB_EXEC)")
+    argparser.add_argument('--blastp', action='store', dest='blastp_exec', help="Path to blastp executable\n(Default: config.BLASTP_EXEC)")
+    argparser.add_argument('--tmpdir', action='store', dest='tmp_dir', help="Path to temporary directory\n(Default: a new temporary directory per dataset)")
+
+    args = argparser.parse_args(argv)
+    serve(args)
+
+
+def shard(argv):
+    argparser = argparse.ArgumentParser(prog='protparts.py shard', description="Prepare an all-vs-all BLASTP search split into query shards", formatter_class=argparse.RawTextHelpFormatter)
+    argparser.add_argument('-i', action='store', dest='input_file', required=True, help="Input fasta file")
+    argparser.add_argument('-d', action='store', dest='shard_dir', required=True, help="Shard directory, shared by all nodes")
+    argparser.add_argument('-n', action='store', dest='num_shards', type=int, required=True, help="Number of query shards")
+    argparser.add_argument('--threads', action='store', dest='num_threads', type=int, default=4, help="Number of BLASTP threads per shard\n(Default: 4)")
+    argparser.add_argument('--makeblastdb', action='store', dest='makeblastdb_exec', help="Path to makeblastdb executable\n(Default: config.MAKEBLASTDB_EXEC)")
+    argparser.add_argument('--blastp', action='store', dest='blastp_exec', help="Path to blastp executable on the nodes\n(Default: config.BLASTP_EXEC)")
+
+    args = argparser.parse_args(argv)
+    write_shards(args)
+
+
+def merge(argv):
+    argparser = argparse.ArgumentParser(prog='protparts.py merge', description="Check the shards of a BLASTP search and merge their outputs", formatter_class=argparse.RawTextHelpFormatter)
+    argparser.add_argument('manifest_file', action='store', help="Shard manifest (manifest.json)")
+    argparser.add_argument('-o', action='store', dest='output_file', default=None, help="Merged blastp output, written if all shards are done\n(Default: only check the shards)")
+
+    args = argparser.parse_args(argv)
+    return merge_shards(args)
+
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        query(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_args(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'shard':
+        shard(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        sys.exit(0 if merge(sys.argv[2:]) else 1)
+
     argparser = argparse.ArgumentParser(description="Protein clustering and partitioning", formatter_class=argparse.RawTextHelpFormatter)
     argparser.add_argument('-i', action='store', dest='input_file', required=True, help="Input fasta file")
     argparser.add_argument('-c', action='store', dest='threshold_c', type=str, help="Threshold for clustering (use comma , to separate multiple thresholds)")
@@ -9,9 +73,30 @@ if __name__ == '__main__':
     argparser.add_argument('--expe', action='store', dest='exp_e', type=int, help="Ending exponent for threshold")
     argparser.add_argument('-r', action='store', dest='threshold_r', type=float, default=None, help="Threshold for sequence redundancy reduction.\nNone: skip redundancy reduction\n(Default: None)")
     argparser.add_argument('-p', action='store', dest='num_partitions', type=int, help="Number of partitions. 0: skip partitioning")
-    argparser.add_argument('-f', action='store', dest='fmt', default='JSON', choices=['JSON', 'TXT', 'CSV', 'FASTA'], help="Output format\n(Default: JSON)")
+    argparser.add_argument('--partition-method', action='store', dest='partition_method', default='greedy', choices=['greedy', 'random'], help="Partitioning method.\ngreedy: largest cluster first into the fullest partition it fits\nrandom: random partition with room\n(Default: greedy)")
+    argparser.add_argument('--split', action='store_true', dest='split', help="Split clusters larger than the partition capacity\nalong their weakest edges instead of reporting NA")
+    argparser.add_argument('--split-fasta', action='store', dest='split_fasta', default=None, choices=['partition', 'fold'], help="Also write one FASTA file per partition into *_split/.\nfold: plus one training file of all other partitions per fold")
+    argparser.add_argument('--replicates', action='store', dest='replicates', type=int, default=1, help="Number of replicate partitionings (random seeds 0..N-1)\nwritten together to *_replicates.csv\n(Default: 1)")
+    argparser.add_argument('-f', action='store', dest='fmt', default='JSON', choices=['JSON', 'TXT', 'CSV', 'FASTA', 'COLUMNAR'], help="Output format\nCOLUMNAR: Parquet if pyarrow is installed, NPZ otherwise\n(Default: JSON)")
     argparser.add_argument('-o', action='store', dest='output_dir', required=True, help="Output directory")
+    argparser.add_argument('--matrix', action='store_true', dest='matrix', help="Write one table of cluster (and partition) labels,\none row per sequence and one column per threshold,\ninstead of one result file per threshold")
+    argparser.add_argument('--pretty', action='store_true', dest='pretty', help="Indent JSON output")
+    argparser.add_argument('--compress', action='store', dest='compress', default='zip', choices=['zip', 'gzip', 'none'], help="Compression of result files, written as they are produced.\nzip: entries of *_protparts.zip\ngzip: one .gz file per result\nnone: plain files\n(Default: zip)")
+    argparser.add_argument('--jobs', action='store', dest='jobs', type=int, default=1, help="Number of background workers writing result files\nand rendering figures\n(Default: 1)")
+    argparser.add_argument('--figures', action='store', dest='figures', default='full', choices=['none', 'fast', 'full'], help="Figures in the report.\nnone: no figures\nfast: per-threshold cluster size and silhouette figures only,\ndrawn with matplotlib\nfull: all figures\n(Default: full)")
+    argparser.add_argument('--dpi', action='store', dest='dpi', type=int, default=300, help="Resolution of figures\n(Default: 300)")
+    argparser.add_argument('--report', action='store', dest='report', default='static', choices=['static', 'interactive'], help="Report format.\nstatic: figures rendered as PNG files\ninteractive: figures drawn by the browser from data embedded in one HTML file\n(Default: static)")
+    argparser.add_argument('--export-measurement', action='store', dest='export_measurement', default=None, choices=['csv', 'parquet'], help="Export the BLASTP hits with derived columns (npid, nloge, length category).\ncsv: measurement.csv.gz\nparquet: measurement.parquet (requires pyarrow)\n(Default: no export)")
+    argparser.add_argument('--checkpoint', action='store_true', dest='checkpoint', help="Save the result of every stage in *_checkpoint/")
+    argparser.add_argument('--resume', action='store_true', dest='resume', help="Reuse the stages checkpointed in *_checkpoint/ by a previous run\nwhose inputs and parameters are unchanged. Implies --checkpoint")
+    argparser.add_argument('--trace-memory', action='store_true', dest='trace_memory', help="Record the peak memory allocated in each stage with tracemalloc\n(slows the run down)")
+    argparser.add_argument('--profile', action='store_true', dest='profile', help="Dump a cProfile profile of each stage into *_profile/")
     argparser.add_argument('--prune', action='store_true', dest='prune', help="Pruning clusters to improve clustering performance")
+    argparser.add_argument('--representatives', action='store_true', dest='representatives', help="Run BLASTP on representatives only. Sequences contained in\nor nearly identical to a longer sequence inherit its hits")
+    argparser.add_argument('--rep-similarity', type=float, default=0.9, dest='rep_similarity', help="With --representatives, minimum fraction of the 5-mers of a\nsequence shared with its representative (default: 0.9)")
+    argparser.add_argument('--recall', action='store_true', dest='recall', help="With --representatives, also run the full BLASTP\nand report the recall of its hits")
+    argparser.add_argument('--edges', action='store', dest='edges', default='directed', choices=['directed', 'min', 'max', 'mean'], help="Hits kept per sequence pair.\ndirected: the first hit of each direction\nmin/max: one hit per pair, with the smallest/largest E-value\nmean: one hit per pair, with the mean E-value and identity\n(Default: directed)")
+    argparser.add_argument('--shards', action='store', dest='shards', default=None, help="Use the hits of a sharded BLASTP search (manifest.json\nfrom protparts.py shard) instead of running BLASTP")
     argparser.add_argument('--makeblastdb', action='store', dest='makeblastdb_exec', help="Path to makeblastdb executable\n(Default: config.MAKEBLASTDB_EXEC)")
     argparser.add_argument('--blastp', action='store', dest='blastp_exec', help="Path to blastp executable\n(Default: config.BLASTP_EXEC)")
     argparser.add_argument('--tmpdir', action='store', dest='tmp_dir', help="Path to temporary directory\n(Default: config.TMP_DIR)")
@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+import unittest
+from ProtParts.utils import read_blastp, read_seq
+from benchmarks.synthetic import generate_families, generate_hits, write_fasta, write_hits
+from benchmarks.run_benchmarks import DEFAULT_MAX_SIZES, run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_synthetic(self):
+        sequences, family, mutation = generate_families(500, random_seed=1)
+        self.assertEqual(len(sequences), 500)
+        self.assertEqual(len(family), 500)
+        hits = generate_hits(sequences, family, mutation, random_seed=1)
+        self.assertEqual(len({(x[0], x[1]) for x in hits}), len(hits))
+        self.assertTrue(all((seq_id, seq_id) in {(x[0], x[1]) for x in hits} for seq_id in sequences))
+
+        seq_file = os.path.join(self.tmp_dir.name, 'synthetic.fasta')
+        blastp_file = os.path.join(self.tmp_dir.name, 'synthetic.tab')
+        write_fasta(sequences, seq_file)
+        write_hits(hits, blastp_file)
+        self.assertEqual({k:str(v.seq) for k, v in read_seq(seq_file).items()}, sequences)
+        self.assertEqual([(x[0], x[1]) for x in read_blastp(blastp_file)], [(x[0], x[1]) for x in hits])
+
+
+    def test_run_benchmarks(self):
+        output_file = os.path.join(self.tmp_dir.name, 'benchmark.json')
+        # the random retry loop is not guaranteed to terminate, so it is skipped here
+        max_sizes = {**DEFAULT_MAX_SIZES, 'Partitioning.random_partitioning':0}
+        run_benchmarks([200], output_file, memory=False, max_sizes=max_sizes)
+        with open(output_file) as f:
+            report = json.load(f)
+        names = {record['name'] for record in report['results']}
+        self.assertTrue({'read_seq', 'read_blastp', 'Clustering._graph', 'Cluster.silhouette', 'hobohm1', 'write_cluster.json'} <= names)
+        self.assertTrue(all(record.get('skipped') or record['wall_time'] >= 0 for record in report['results']))
+
+
+if __name__ == '__main__':
+    unittest.main()
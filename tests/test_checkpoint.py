@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from ProtParts.Checkpoint import Checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_dir = os.path.join(self.tmp_dir.name, 'checkpoint')
+        self.calls = []
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def stage(self, value):
+        self.calls.append(value)
+        return {'value':value}
+
+
+    def test_resume(self):
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        key = checkpoint.key('input', 1)
+        self.assertEqual(checkpoint.run('first', key, self.stage, 1), {'value':1})
+        self.assertEqual(checkpoint.run('second', checkpoint.key(key, 'second'), self.stage, 2), {'value':2})
+
+        # completed stages are loaded
+        checkpoint = Checkpoint(self.checkpoint_dir, resume=True)
+        self.assertEqual(checkpoint.run('first', key, self.stage, 1), {'value':1})
+        self.assertEqual(checkpoint.run('second', checkpoint.key(key, 'second'), self.stage, 2), {'value':2})
+        self.assertEqual(self.calls, [1, 2])
+
+        # a changed input invalidates the later stages
+        key = checkpoint.key('input', 3)
+        checkpoint.run('first', key, self.stage, 3)
+        checkpoint.run('second', checkpoint.key(key, 'second'), self.stage, 4)
+        self.assertEqual(self.calls, [1, 2, 3, 4])
+
+
+    def test_no_resume(self):
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        checkpoint.run('first', 'key', self.stage, 1)
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        checkpoint.run('first', 'key', self.stage, 1)
+        self.assertEqual(self.calls, [1, 1])
+
+
+    def test_disabled(self):
+        checkpoint = Checkpoint(None, resume=True)
+        checkpoint.run('first', 'key', self.stage, 1)
+        checkpoint.run('first', 'key', self.stage, 1)
+        self.assertEqual(self.calls, [1, 1])
+        self.assertFalse(os.path.exists(self.checkpoint_dir))
+
+
+    def test_missing_file(self):
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        checkpoint.run('first', 'key', self.stage, 1)
+        os.remove(os.path.join(self.checkpoint_dir, 'first.pkl'))
+        checkpoint = Checkpoint(self.checkpoint_dir, resume=True)
+        self.assertEqual(checkpoint.get('first', 'key'), (False, None))
+
+
+    def test_file_key(self):
+        input_file = os.path.join(self.tmp_dir.name, 'input.fa')
+        with open(input_file, 'w') as f:
+            f.write('>A\nMKV\n')
+        key = Checkpoint.file_key(input_file)
+        with open(input_file, 'a') as f:
+            f.write('>B\nMKL\n')
+        self.assertNotEqual(Checkpoint.file_key(input_file), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
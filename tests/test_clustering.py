@@ -0,0 +1,35 @@
+import random
+import unittest
+from ProtParts.Clustering import Clustering
+
+
+class TestClustering(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.sequences = {f"S{i:04d}":None for i in range(300)}
+        ids = list(self.sequences)
+        self.measurement = []
+        for _ in range(1200):
+            seq1, seq2 = random.sample(ids, 2)
+            self.measurement.append((seq1, seq2, 10 ** -random.uniform(0, 30), 50.0, 100.0, 100.0))
+
+
+    def test_split(self):
+        clust = Clustering(threshold=1e-2, method='graph', measurement_type='distance')
+        cluster = clust.clustering(self.sequences, self.measurement)
+        max_size = 20
+        self.assertGreater(cluster.num_data(by='max'), max_size)
+
+        cluster_split, cut_edges = clust.split(cluster, self.measurement, max_size)
+        self.assertLessEqual(cluster_split.num_data(by='max'), max_size)
+        self.assertEqual(sorted(cluster_split.index()), sorted(cluster.index()))
+        index = cluster_split.index()
+        self.assertTrue(all(index[seq1] != index[seq2] for seq1, seq2, _ in cut_edges))
+        for seq1, seq2, measure, *_ in self.measurement:
+            if measure <= 1e-2 and index[seq1] != index[seq2]:
+                self.assertIn(frozenset((seq1, seq2)), {frozenset(e[:2]) for e in cut_edges})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'pandas', 'Bio', 'networkx', 'sklearn']
+
+
+def run_python(code):
+    """
+    Run code in a fresh interpreter and return its stdout
+    """
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+class TestImport(unittest.TestCase):
+
+    def test_no_heavy_imports(self):
+        for module in ['ProtParts', 'ProtParts.Clustering', 'ProtParts.Partitioning', 'ProtParts.main']:
+            loaded = run_python(f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES} if m in sys.modules))").split()
+            self.assertEqual(loaded, [], module)
+
+
+    def test_import_time(self):
+        # best of 3, well above the time without the heavy dependencies
+        elapsed = min(float(run_python("import time; t = time.perf_counter(); import ProtParts.main; print(time.perf_counter() - t)")) for _ in range(3))
+        self.assertLess(elapsed, 1.0)
+
+
+    def test_no_filesystem_side_effects(self):
+        run_python("import os\n"
+                   "def fail(*args, **kwargs):\n"
+                   "    raise AssertionError('filesystem write at import')\n"
+                   "os.mkdir = os.makedirs = fail\n"
+                   "import ProtParts, ProtParts.main, ProtParts.settings")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,13 @@
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
 import unittest
 from ProtParts.main import clust_partition
+from ProtParts.Measure import Measure
+from ProtParts.utils import read_seq
 
 
 class TestClustPartition(unittest.TestCase):
@@ -21,5 +29,56 @@ class TestClustPartition(unittest.TestCase):
         except Exception as e:
             self.fail(f'clust_partition raised an exception: {e}')
 
+
+class TestFigures(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmp_dir.name, 'input.fa')
+        with open(self.input_file, 'w') as f:
+            for i in range(40):
+                f.write(f">S{i:02d}\n{''.join(random.choices('ACDEFGHIKLMNPQRSTVWY', k=50))}\n")
+
+        # hits of a sharded search written by the test, so no BLAST is needed
+        self.manifest_file = Measure().blastp_shards(read_seq(self.input_file), 'true', 'blastp', os.path.join(self.tmp_dir.name, 'shards'), 1, input_file=self.input_file)
+        with open(self.manifest_file) as f:
+            output_file = json.load(f)['shards'][0]['output']
+        with open(output_file, 'w') as f:
+            for i in range(40):
+                f.write(f"S{i:02d}\tS{i:02d}\t1e-30\t50\t50\t50\n")
+                f.write(f"S{i:02d}\tS{random.randrange(40):02d}\t{10 ** -random.uniform(0, 20):.3g}\t20\t50\t50\n")
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def run_figures(self, figures):
+        output_dir = os.path.join(self.tmp_dir.name, figures)
+        args = argparse.Namespace(input_file=self.input_file, threshold_c=None, exp_s=None, exp_e=None, threshold_r=None, num_partitions=3,
+                                  partition_method='greedy', split=False, split_fasta=None, replicates=1, fmt='JSON', output_dir=output_dir,
+                                  matrix=False, pretty=False, compress='none', jobs=1, figures=figures, dpi=50, report='static',
+                                  export_measurement=None, checkpoint=False, resume=False, trace_memory=False, profile=False, prune=False,
+                                  representatives=False, rep_similarity=0.9, recall=False, edges='directed', shards=self.manifest_file,
+                                  makeblastdb_exec=None, blastp_exec=None, tmp_dir=os.path.join(self.tmp_dir.name, 'tmp'))
+        clust_partition(args)
+        # figure kinds, without the threshold
+        return {name if name in ['scatter_evalue.png', 'size_bar.png'] else name.rsplit('_', 1)[0] for name in map(os.path.basename, glob.glob(os.path.join(output_dir, '*.png')))}
+
+
+    def test_figures(self):
+        self.assertEqual(self.run_figures('none'), set())
+        self.assertEqual(self.run_figures('fast'), {'cluster_size', 'silhouette'})
+        self.assertEqual(self.run_figures('full'), {'cluster_size', 'silhouette', 'scatter_evalue.png', 'size_bar.png'})
+
+
+    def test_shards_representatives(self):
+        args = argparse.Namespace(input_file=self.input_file, shards=self.manifest_file, representatives=True,
+                                  makeblastdb_exec=None, blastp_exec=None, tmp_dir=os.path.join(self.tmp_dir.name, 'tmp'))
+        with self.assertRaises(ValueError):
+            clust_partition(args)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from ProtParts.Measure import Measure
+
+
+class TestMeasure(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sequences = {f"S{i}":SeqRecord(Seq('MKV' + 'A' * i), id=f"S{i}") for i in range(10)}
+        self.measure = Measure()
+        # no BLAST here: makeblastdb is replaced by a no-op and shard outputs are written by the test
+        self.manifest_file = self.measure.blastp_shards(self.sequences, 'true', 'blastp', self.tmp_dir.name, 3, input_file='input.fa', evalue=10)
+        with open(self.manifest_file) as f:
+            self.manifest = json.load(f)
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def write_output(self, shard, suffix=''):
+        with open(shard['query']) as f:
+            queries = [line[1:].strip() for line in f if line.startswith('>')]
+        with open(shard['output'] + suffix, 'w') as f:
+            for seq_id in queries:
+                f.write(f"{seq_id}\t{seq_id}\t1e-50\t10\t10\t10\n")
+        return queries
+
+
+    def test_manifest(self):
+        shards = self.manifest['shards']
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(sum(shard['num_queries'] for shard in shards), len(self.sequences))
+        self.assertTrue(all(self.manifest['database'] in shard['command'] and shard['output'] + '.part' in shard['command'] for shard in shards))
+        with open(os.path.join(self.tmp_dir.name, 'commands.sh')) as f:
+            self.assertEqual(f.read().splitlines(), [shard['command'] for shard in shards])
+
+
+    def test_merge_shards(self):
+        shards = self.manifest['shards']
+        queries = self.write_output(shards[0])
+        self.write_output(shards[1], suffix='.part')
+        self.assertEqual(self.measure.shard_status(self.manifest_file), {'done':[0], 'missing':[2], 'partial':[1]})
+        with self.assertRaises(ValueError):
+            self.measure.merge_shards(self.manifest_file)
+
+        # a truncated output is partial
+        os.remove(shards[1]['output'] + '.part')
+        self.write_output(shards[1])
+        with open(shards[2]['output'], 'w') as f:
+            f.write("S9\tS9\t1e-50")
+        self.assertEqual(self.measure.shard_status(self.manifest_file)['partial'], [2])
+
+        # an empty output of a finished shard is done
+        open(shards[2]['output'], 'w').close()
+        self.assertEqual(self.measure.shard_status(self.manifest_file)['done'], [0, 1, 2])
+
+        self.write_output(shards[2])
+        measurement = self.measure.merge_shards(self.manifest_file)
+        self.assertEqual([row[0] for row in measurement], list(self.sequences))
+        self.assertEqual(measurement[0], (queries[0], queries[0], 1e-50, 10.0, 10.0, 10.0))
+
+        # the shards of another input are rejected
+        self.assertEqual(len(self.measure.merge_shards(self.manifest_file, input_file='input.fa', num_sequences=len(self.sequences))), len(self.sequences))
+        with self.assertRaises(ValueError):
+            self.measure.merge_shards(self.manifest_file, input_file='other.fa')
+        with self.assertRaises(ValueError):
+            self.measure.merge_shards(self.manifest_file, num_sequences=len(self.sequences) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
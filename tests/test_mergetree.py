@@ -0,0 +1,44 @@
+import os
+import random
+import tempfile
+import unittest
+from ProtParts.Clustering import Clustering, MergeTree
+
+
+class TestMergeTree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.sequences = {f"S{i:04d}":None for i in range(300)}
+        ids = list(self.sequences)
+        self.measurement = []
+        for _ in range(1200):
+            seq1, seq2 = random.sample(ids, 2)
+            self.measurement.append((seq1, seq2, 10 ** -random.uniform(0, 30), 50.0, 100.0, 100.0))
+        self.thresholds = [1e-1, 1e-5, 1e-10, 1e-20, 1e-29, 1e-40]
+
+
+    def test_cluster_matches_graph(self):
+        tree = MergeTree.build(self.sequences, self.measurement)
+        for t_c in self.thresholds:
+            clust = Clustering(threshold=t_c, method='graph', measurement_type='distance')
+            cluster = clust.clustering(self.sequences, self.measurement)
+            self.assertEqual(tree.cluster(t_c), cluster)
+            self.assertEqual(tree.num_clusters(t_c), len(cluster))
+            self.assertEqual(tree.max_cluster_size(t_c), cluster.num_data(by='max'))
+
+
+    def test_save_load(self):
+        tree = MergeTree.build(self.sequences, self.measurement)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tree_file = os.path.join(tmp_dir, 'tree.npz')
+            tree.save(tree_file)
+            tree_loaded = MergeTree.load(tree_file)
+        self.assertEqual(tree_loaded.ids, tree.ids)
+        self.assertEqual(len(tree_loaded), len(tree))
+        for t_c in self.thresholds:
+            self.assertEqual(tree_loaded.cluster(t_c), tree.cluster(t_c))
+
+
+if __name__ == '__main__':
+    unittest.main()
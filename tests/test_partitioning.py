@@ -0,0 +1,97 @@
+import random
+import unittest
+from ProtParts.Clustering import Cluster
+from ProtParts.Partitioning import Partitioning
+
+
+class TestPartitioning(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        clusters = {}
+        num_sequences = 0
+        for cidx in range(400):
+            size = random.choice([1, 1, 1, 2, 3, 5, 8, 20])
+            clusters[cidx] = [f"S{num_sequences + i}" for i in range(size)]
+            num_sequences += size
+        self.cluster = Cluster(clusters)
+        self.num_sequences = num_sequences
+        self.num_partitions = 5
+
+
+    def _partition_sizes(self, partitions):
+        return [sum(len(c) for c in par.values()) for par in partitions.values()]
+
+
+    def test_greedy_partitioning(self):
+        partitioner = Partitioning(num_partitions=self.num_partitions, num_sequences=self.num_sequences, method='greedy')
+        for random_seed in (None, 0, 1):
+            partitions = partitioner.greedy_partitioning(self.cluster, random_seed=random_seed)
+            self.assertEqual(sorted(c_id for par in partitions.values() for c_id in par), list(range(len(self.cluster))))
+            self.assertEqual(self._partition_sizes(partitions), list(partitioner.partition_size().values()))
+
+
+    def test_greedy_partitioning_exact(self):
+        # the largest remaining capacity first would give 7/5
+        cluster = Cluster({cidx:[f"S{cidx}_{i}" for i in range(size)] for cidx, size in enumerate([3, 3, 2, 2, 2])})
+        partitioner = Partitioning(num_partitions=2, num_sequences=12, method='greedy')
+        for random_seed in [None] + list(range(10)):
+            partitions = partitioner.greedy_partitioning(cluster, random_seed=random_seed)
+            self.assertEqual(self._partition_sizes(partitions), [6, 6])
+            self.assertEqual(partitioner.excess(partitions), 0)
+        cluster_ids, assignments = partitioner.batch_partitioning(cluster, list(range(10)))
+        self.assertTrue(all(partitioner.excess(partitioner.to_partitions(cluster, cluster_ids, row)) == 0 for row in assignments))
+
+        # clusters fitting one by one but not together
+        cluster = Cluster({cidx:[f"S{cidx}_{i}" for i in range(size)] for cidx, size in enumerate([4, 4, 4])})
+        partitioner = Partitioning(num_partitions=2, num_sequences=12, method='greedy')
+        with self.assertWarns(UserWarning):
+            partitions = partitioner.greedy_partitioning(cluster)
+        self.assertEqual(partitioner.excess(partitions), 2)
+
+
+    def test_greedy_partitioning_seed(self):
+        partitioner = Partitioning(num_partitions=self.num_partitions, num_sequences=self.num_sequences, method='greedy')
+        self.assertEqual(partitioner.partition(self.cluster, random_seed=3), partitioner.partition(self.cluster, random_seed=3))
+        self.assertNotEqual(partitioner.partition(self.cluster, random_seed=3), partitioner.partition(self.cluster, random_seed=4))
+
+
+    def test_batch_partitioning(self):
+        partitioner = Partitioning(num_partitions=self.num_partitions, num_sequences=self.num_sequences, method='greedy')
+        random_seeds = [0, 1, 2, 7]
+        cluster_ids, assignments = partitioner.batch_partitioning(self.cluster, random_seeds)
+        self.assertEqual(assignments.shape, (len(random_seeds), len(self.cluster)))
+        for r, random_seed in enumerate(random_seeds):
+            partitions = partitioner.to_partitions(self.cluster, cluster_ids, assignments[r])
+            self.assertEqual(partitions, partitioner.greedy_partitioning(self.cluster, random_seed=random_seed))
+
+        # replicates follow the partitioning method
+        partitioner = Partitioning(num_partitions=self.num_partitions, num_sequences=self.num_sequences, method='random')
+        cluster_ids, assignments = partitioner.batch_partitioning(self.cluster, random_seeds)
+        for r, random_seed in enumerate(random_seeds):
+            partitions = partitioner.to_partitions(self.cluster, cluster_ids, assignments[r])
+            self.assertEqual(partitions, partitioner.random_partitioning(self.cluster, random_seed=random_seed))
+
+
+    def test_leakage(self):
+        partitioner = Partitioning(num_partitions=self.num_partitions, num_sequences=self.num_sequences, method='greedy')
+        partitions = partitioner.partition(self.cluster)
+        seq_ids = [name for c in self.cluster.clusters.values() for name in c]
+        measurement = [(random.choice(seq_ids), random.choice(seq_ids), 10 ** -random.uniform(0, 60), 50.0, 100.0, 100.0) for _ in range(2000)]
+
+        leakage = partitioner.leakage(partitions, measurement)
+        partition_index = {name:pidx for pidx, par in partitions.items() for c in par.values() for name in c}
+        cross = [x for x in measurement if partition_index[x[0]] != partition_index[x[1]]]
+        self.assertEqual(leakage['num_cross'], len(cross))
+        self.assertEqual(leakage['pair_counts'].sum(), len(cross))
+        self.assertEqual(leakage['bin_counts'].sum(), len(cross))
+        self.assertEqual(leakage['closest'][2], min(x[2] for x in cross))
+
+        # self hits and hits of unpartitioned sequences are not counted
+        leakage = partitioner.leakage(partitions, measurement + [(seq_ids[0], seq_ids[0], 1e-90), (seq_ids[0], 'unknown', 1e-90)])
+        self.assertEqual(leakage['num_hits'], sum(x[0] != x[1] for x in measurement))
+        self.assertEqual(leakage['num_cross'], len(cross))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import io
+import json
+import random
+import unittest
+from ProtParts import Pipeline
+import numpy as np
+from ProtParts.Clustering import Cluster, Clustering, DistanceMatrix
+from ProtParts.Partitioning import Partitioning
+from ProtParts.utils import hobohm1
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.sequences = {f"S{i:03d}":'M' + ''.join(random.choices('ACDEFGHIKLMNPQRSTVWY', k=30)) for i in range(100)}
+        ids = list(self.sequences)
+        self.measurement = [(seq_id, seq_id, 0.0, 31.0, 31.0, 31.0) for seq_id in ids]
+        for _ in range(150):
+            seq1, seq2 = random.sample(ids, 2)
+            self.measurement.append((seq1, seq2, 10 ** -random.uniform(0, 30), 20.0, 31.0, 31.0))
+
+
+    def test_cluster(self):
+        pipeline = Pipeline(self.sequences, self.measurement)
+        for t_c in [1e-3, 1e-10]:
+            clust = Clustering(threshold=t_c, method='graph', measurement_type='distance')
+            self.assertEqual(pipeline.cluster(t_c), clust.clustering(pipeline.sequences, self.measurement))
+        self.assertIs(pipeline.cluster(1e-3), pipeline.cluster(1e-3))
+
+
+    def test_redundancy_reduction(self):
+        pipeline = Pipeline(self.sequences, self.measurement, threshold_r=1e-10)
+        expected = hobohm1(Pipeline(self.sequences, self.measurement).sequences, self.measurement, 1e-10)
+        self.assertEqual(list(pipeline.sequences), list(expected))
+        self.assertLess(len(pipeline.sequences), len(self.sequences))
+        self.assertEqual(pipeline.cluster(1e-5).num_data(by='sum'), len(pipeline.sequences))
+
+
+    def test_measurement_only(self):
+        pipeline = Pipeline(measurement=self.measurement)
+        self.assertEqual(sorted(pipeline.sequences), sorted(self.sequences))
+        self.assertEqual(pipeline.cluster(1e-10).num_data(by='sum'), len(self.sequences))
+
+
+    def test_silhouette_distances(self):
+        pipeline = Pipeline(self.sequences, self.measurement)
+        for t_c in [1e-3, 1e-10]:
+            metric, (data_list, data_label, values) = pipeline.silhouette(t_c)
+            expected_metric, (_, _, expected_values) = pipeline.cluster(t_c).silhouette(self.measurement)
+            self.assertAlmostEqual(metric, expected_metric)
+            np.testing.assert_allclose(values, expected_values)
+        self.assertIsNotNone(pipeline.distances._matrix)
+
+        # clusters of a subset of the sequences use a submatrix
+        subset = Cluster({0:['S000', 'S001', 'S002'], 1:['S003', 'S004']})
+        metric, (_, _, values) = subset.silhouette(self.measurement, distances=DistanceMatrix(list(self.sequences), self.measurement))
+        expected_metric, (_, _, expected_values) = subset.silhouette(self.measurement)
+        self.assertAlmostEqual(metric, expected_metric)
+        np.testing.assert_allclose(values, expected_values)
+
+        # directed hits fill their own direction only, canonical edges both
+        self.assertEqual(DistanceMatrix(['A', 'B'], [('A', 'B', 1e-5)]).matrix.tolist(), [[0, 1e-5], [11, 0]])
+        self.assertEqual(DistanceMatrix(['A', 'B'], [('A', 'B', 1e-5)], symmetric=True).matrix.tolist(), [[0, 1e-5], [1e-5, 0]])
+        self.assertTrue(Pipeline(self.sequences, self.measurement, edges='min').distances.symmetric)
+
+
+    def test_directed_default(self):
+        # the default results are those of the directed hits, as before canonical edges
+        from sklearn.metrics import silhouette_samples
+        pipeline = Pipeline(self.sequences, self.measurement)
+        cluster = pipeline.cluster(1e-10)
+        index = cluster.index()
+        positions = dict(zip(index, range(len(index))))
+        pivot = np.full((len(index), len(index)), 11.0)
+        for seq1, seq2, evalue, *_ in self.measurement:
+            pivot[positions[seq1], positions[seq2]] = evalue
+        np.fill_diagonal(pivot, 0)
+        metric, _ = pipeline.silhouette(1e-10)
+        self.assertAlmostEqual(metric, np.mean(silhouette_samples(pivot, list(index.values()), metric='precomputed')))
+
+        # only the hits of shorter sequences to kept ones remove them
+        sequences = {'A':'M' * 40, 'B':'M' * 30, 'C':'M' * 20}
+        measurement = [('A', 'B', 1e-20, 30.0, 40.0, 30.0), ('C', 'A', 1e-20, 20.0, 20.0, 40.0)]
+        self.assertEqual(list(Pipeline(sequences, measurement, threshold_r=1e-10, remove_duplicates=False).sequences), ['A', 'B'])
+        self.assertEqual(list(Pipeline(sequences, measurement, threshold_r=1e-10, remove_duplicates=False, edges='min').sequences), ['A'])
+
+
+    def test_partition(self):
+        pipeline = Pipeline(self.sequences, self.measurement)
+        partitions = pipeline.partition(1e-25, 5)
+        expected = Partitioning(num_partitions=5, num_sequences=100, method='greedy').partition(pipeline.cluster(1e-25))
+        self.assertEqual(partitions, expected)
+        self.assertIs(pipeline.partition(1e-25, 5), partitions)
+
+        with self.assertRaises(ValueError):
+            pipeline.partition(1e-1, 5)
+        partitions = pipeline.partition(1e-1, 5, split=True)
+        self.assertEqual(sum(len(c) for par in partitions.values() for c in par.values()), 100)
+        self.assertEqual(pipeline.leakage(partitions)['num_hits'], sum(row[0] != row[1] for row in self.measurement))
+
+
+    def test_write(self):
+        pipeline = Pipeline(self.sequences, self.measurement)
+        f = io.StringIO()
+        pipeline.write_partitions(pipeline.partition(1e-25, 5), f, fmt='json', threshold=1e-25)
+        self.assertEqual(len(json.loads(f.getvalue())), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+from ProtParts.Profiler import Profiler
+from ProtParts.Report import Report
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_stages(self):
+        profile_dir = os.path.join(self.tmp_dir.name, 'profile')
+        profiler = Profiler(trace_memory=True, profile_dir=profile_dir)
+        with profiler.stage('sequences', items=3):
+            sum(range(1000))
+        for threshold in (1e-5, 1e-10):
+            with profiler.stage('cluster', threshold=threshold) as record:
+                data = [0] * 100000
+                record['items'] = len(data)
+
+        self.assertEqual([(r['stage'], r['threshold'], r['items']) for r in profiler.records], [('sequences', None, 3), ('cluster', 1e-5, 100000), ('cluster', 1e-10, 100000)])
+        self.assertGreaterEqual(profiler.records[1]['peak_memory'], 100000 * 8)
+        self.assertTrue(all(r['wall_time'] >= 0 and r['cpu_time'] >= 0 and r['max_rss'] > 0 for r in profiler.records))
+        pstats.Stats(profiler.records[1]['profile'])
+
+        timing_file = os.path.join(self.tmp_dir.name, 'timing.json')
+        profiler.save(timing_file)
+        with open(timing_file) as f:
+            timing = json.load(f)
+        self.assertEqual(len(timing['stages']), 3)
+
+        rows = profiler.rows()
+        self.assertEqual(len(rows), 4)
+        report = Report()
+        report.write_timing(rows)
+        self.assertIn('<td>cluster</td><td>1e-05</td><td>100000</td>', report.report)
+
+
+    def test_exception(self):
+        profiler = Profiler()
+        with self.assertRaises(ValueError):
+            with profiler.stage('blastp'):
+                raise ValueError
+        self.assertEqual(profiler.records[0]['stage'], 'blastp')
+        self.assertIsNone(profiler.records[0]['peak_memory'])
+
+
+    def test_no_resource(self):
+        # no resource module on Windows
+        profiler = Profiler()
+        with mock.patch.dict('sys.modules', {'resource':None}):
+            with profiler.stage('sequences'):
+                pass
+        self.assertIsNone(profiler.records[0]['max_rss'])
+        self.assertEqual(profiler.rows()[1][5], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import json
+import re
+import unittest
+from ProtParts.Report import Report
+
+
+class TestReport(unittest.TestCase):
+
+    def test_write_interactive(self):
+        figures = [{'threshold':'1e-05', 'sizes':{'edges':[1, 2], 'counts':[3]}, 'silhouette':None}]
+        sizebar = {'thresholds':['</script>'], 'sizes':[3], 'capacity':5}
+        report = Report()
+        report.write_interactive(figures, sizebar=sizebar)
+        data = re.search(r'<script type="application/json" id="figures-data">(.*?)</script>', report.report, re.S).group(1)
+        self.assertEqual(json.loads(data), {'figures':figures, 'density':None, 'sizebar':sizebar})
+        self.assertNotIn('<img', report.report)
+
+
+    def test_write_leakage(self):
+        leakage = {'num_hits':10, 'num_cross':2, 'closest':('A', 'B', 1e-5, 0, 1), 'bins':[1e-10, 1e-5, 1],
+                   'bin_counts':[1, 1], 'pair_counts':[[0, 2], [2, 0]]}
+        report = Report()
+        report.write_leakage([[1e-5, leakage]])
+        self.assertIn('<td># cross-partition hits</td><td>2 (20.00%)</td>', report.report)
+        self.assertNotIn('cut edges', report.report)
+
+        report = Report()
+        report.write_leakage([[1e-5, {**leakage, 'num_cut':4, 'num_cut_cross':3}]])
+        self.assertIn('<td># cut edges</td><td>4</td>', report.report)
+        self.assertIn('<td># cut edges across partitions</td><td>3</td>', report.report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import http.client
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import unittest
+from ProtParts import Pipeline
+from ProtParts.Server import make_server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        ids = [f"S{i:03d}" for i in range(60)]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.blastp_file = os.path.join(self.tmp_dir.name, 'hits.tab')
+        with open(self.blastp_file, 'w') as f:
+            for _ in range(80):
+                seq1, seq2 = random.sample(ids, 2)
+                f.write(f"{seq1}\t{seq2}\t{10 ** -random.uniform(0, 30):.3g}\t20\t30\t30\n")
+        self.tree_file = os.path.join(self.tmp_dir.name, 'hits_mergetree.npz')
+        Pipeline.from_blastp(self.blastp_file).save_tree(self.tree_file)
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def start(self, server):
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+
+    def get(self, conn, path):
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+
+    def test_http(self):
+        server = make_server(port=0, data_root=self.tmp_dir.name, max_datasets=1)
+        self.start(server)
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_port)
+
+        status, stats = self.get(conn, f"/stats?dataset={self.blastp_file}&threshold=1e-5,1e-20")
+        self.assertEqual(status, 200)
+        pipeline = Pipeline.from_blastp(self.blastp_file)
+        self.assertEqual(stats['num_sequences'], len(pipeline.sequences))
+        self.assertEqual(stats['thresholds']['1e-20']['max_cluster_size'], pipeline.tree.max_cluster_size(1e-20))
+
+        status, result = self.get(conn, f"/cluster?dataset={self.blastp_file}&threshold=1e-20")
+        self.assertEqual({int(k):v for k, v in result['clusters'].items()}, pipeline.cluster(1e-20).clusters)
+
+        status, result = self.get(conn, f"/partition?dataset={self.blastp_file}&threshold=1e-25&partitions=3&leakage=1")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(result['partitions']), 3)
+        self.assertIn('num_cross', result['leakage'])
+
+        # least recently used dataset is evicted
+        status, stats = self.get(conn, f"/stats?dataset={self.tree_file}")
+        self.assertIsNone(stats['num_hits'])
+        status, result = self.get(conn, "/datasets")
+        self.assertEqual([d['kind'] for d in result['datasets']], ['tree'])
+
+        status, result = self.get(conn, f"/cluster?dataset={self.blastp_file}")
+        self.assertEqual(status, 400)
+        status, result = self.get(conn, "/unknown")
+        self.assertEqual(status, 404)
+
+        # relative paths are resolved against the data root, and nothing outside it is served
+        status, stats = self.get(conn, "/stats?dataset=hits.tab")
+        self.assertEqual(status, 200)
+        os.symlink('/etc/hostname', os.path.join(self.tmp_dir.name, 'link.txt'))
+        for dataset in ['../hits.tab', '/etc/hostname', 'link.txt']:
+            status, result = self.get(conn, f"/stats?dataset={dataset}")
+            self.assertEqual(status, 400)
+            self.assertIn('outside the data root', result['error'])
+
+
+    def test_host(self):
+        with self.assertRaises(ValueError):
+            make_server(host='0.0.0.0', port=0)
+
+
+    def test_unix_socket(self):
+        socket_file = os.path.join(self.tmp_dir.name, 'protparts.sock')
+        server = make_server(unix_socket=socket_file, data_root=self.tmp_dir.name)
+        self.start(server)
+        status, stats = self.get(UnixHTTPConnection(socket_file), f"/stats?dataset={self.tree_file}&threshold=1e-5")
+        self.assertEqual(status, 200)
+        self.assertEqual(stats['num_sequences'], len(Pipeline.from_tree(self.tree_file).sequences))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import unittest
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from ProtParts.Clustering import Cluster
+from ProtParts.utils import canonical_edges, density_summary, edge_recall, figure_summary, hit_density, hobohm1, pair_agreement, plot_silhouette, read_blastp, representative_edges, representative_groups, sizebar_summary
+
+
+class TestUtils(unittest.TestCase):
+
+    def test_hit_density(self):
+        measurement = [('A', 'B', 0.0, 50.0, 100.0, 80.0),
+                       ('B', 'A', 0.0, 50.0, 80.0, 100.0),
+                       ('A', 'C', 1e-10, 20.0, 150.0, 250.0),
+                       ('C', 'D', 1.0, 10.0, 400.0, 500.0)]
+        counts, npid_edges, nloge_edges = hit_density(measurement, bins=10)
+        self.assertEqual(counts.shape, (10, 10, 4))
+        self.assertEqual(counts.sum(), 3)
+        self.assertEqual(counts.sum(axis=(0, 1)).tolist(), [1, 1, 0, 1])
+        self.assertEqual(nloge_edges[-1], 180)
+        self.assertEqual(counts[np.searchsorted(npid_edges, 50 / 80) - 1, -1, 0], 1)
+
+
+    def test_canonical_edges(self):
+        measurement = [('A', 'A', 0.0, 100.0, 100.0, 100.0),
+                       ('B', 'A', 1e-20, 50.0, 80.0, 100.0),
+                       ('A', 'B', 1e-30, 60.0, 100.0, 80.0),
+                       ('C', 'A', 1e-5, 20.0, 250.0, 150.0)]
+        edges = {(x[0], x[1]):x for x in canonical_edges(measurement, merge='min')}
+        self.assertEqual(edges, {('A', 'A'):measurement[0], ('A', 'B'):measurement[2], ('A', 'C'):('A', 'C', 1e-5, 20.0, 150.0, 250.0)})
+        edges = {(x[0], x[1]):x for x in canonical_edges(measurement, merge='max')}
+        self.assertEqual(edges[('A', 'B')], ('A', 'B', 1e-20, 50.0, 100.0, 80.0))
+        edges = {(x[0], x[1]):x for x in canonical_edges(measurement, merge='mean')}
+        self.assertAlmostEqual(edges[('A', 'B')][2], (1e-20 + 1e-30) / 2)
+        self.assertEqual(edges[('A', 'B')][3], 55.0)
+        with self.assertRaises(ValueError):
+            canonical_edges(measurement, merge='sum')
+
+        # hobohm1 reads canonical edges in either direction, and directed hits in their own only
+        sequences = {'A':type('Record', (), {'seq':'M' * 100}), 'B':type('Record', (), {'seq':'M' * 80})}
+        self.assertEqual(list(hobohm1(sequences, canonical_edges(measurement), 1e-10, symmetric=True)), ['A'])
+        self.assertEqual(list(hobohm1(sequences, measurement, 1e-10)), ['A'])
+        self.assertEqual(list(hobohm1(sequences, [measurement[2]], 1e-10)), ['A', 'B'])
+
+
+    def test_read_blastp_merge(self):
+        hits = [('A', 'A', 0.0, 100.0, 100.0, 100.0),
+                ('A', 'B', 1e-30, 60.0, 100.0, 80.0),
+                ('A', 'B', 1e-3, 10.0, 100.0, 80.0),
+                ('A', 'C', 1e-5, 20.0, 150.0, 250.0),
+                ('B', 'A', 1e-20, 50.0, 80.0, 100.0),
+                ('B', 'A', 1e-2, 5.0, 80.0, 100.0)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            blastp_file = os.path.join(tmp_dir, 'hits.tab')
+            with open(blastp_file, 'w') as f:
+                f.writelines('\t'.join(map(str, hit)) + '\n' for hit in hits)
+            directed = read_blastp(blastp_file)
+            self.assertEqual(len(directed), 4)
+            for merge in ['min', 'max', 'mean']:
+                # merged while reading, from the first hit of each direction only
+                self.assertEqual(read_blastp(blastp_file, merge=merge), canonical_edges(directed, merge=merge))
+                self.assertEqual(read_blastp([blastp_file], merge=merge), canonical_edges(hits, merge=merge))
+
+
+    def test_representatives(self):
+        record = lambda seq: type('Record', (), {'seq':seq})
+        sequences = {'A':record('MKTAYIAKQRQISFVKSHFSRQ'),
+                     'B':record('AYIAKQRQISFVKSH'),
+                     'C':record('MKTAYIAKQR'),
+                     'D':record('WWWWWWWWWWWWWWWW'),
+                     'E':record('MKT')}
+        representatives = representative_groups(sequences, k=5)
+        self.assertEqual(representatives, {'B':'A', 'C':'A'})
+        edges = representative_edges(sequences, representatives)
+        self.assertEqual(edges[0], ('B', 'A', 0.0, 15.0, 15.0, 22.0))
+
+        cluster = Cluster({0:['A', 'B', 'C'], 1:['D'], 2:['E']})
+        measurement = [('A', 'B', 1e-20), ('A', 'C', 1e-10), ('A', 'D', 1e-8), ('E', 'E', 0.0)]
+        self.assertEqual(edge_recall(measurement, cluster, 1e-5), (3, 2 / 3))
+        self.assertEqual(edge_recall(measurement, cluster, 1e-30), (0, None))
+        self.assertEqual(pair_agreement(cluster, cluster), (1.0, 1.0))
+        precision, ari = pair_agreement(Cluster({0:['A', 'B', 'C', 'D'], 1:['E']}), cluster)
+        self.assertEqual(precision, 0.5)
+        self.assertAlmostEqual(ari, 4 / 9)
+
+        # point mutants join their parent family
+        rng = np.random.default_rng(0)
+        amino_acids = np.array(list('ACDEFGHIKLMNPQRSTVWY'))
+        parents = [rng.choice(amino_acids, 200) for _ in range(5)]
+        sequences = {f"P{i}":record(''.join(parent)) for i, parent in enumerate(parents)}
+        for i, parent in enumerate(parents):
+            for j in range(200):
+                mutant = parent.copy()
+                mutant[rng.choice(200, 2, replace=False)] = rng.choice(amino_acids, 2)
+                sequences[f"P{i}_{j}"] = record(''.join(mutant))
+        representatives = representative_groups(sequences)
+        self.assertEqual(len(sequences) - len(representatives), 5)
+        self.assertTrue(all(rep_id == member_id.split('_')[0] for member_id, rep_id in representatives.items()))
+        # containment alone misses them
+        self.assertGreater(len(sequences) - len(representative_groups(sequences, min_similarity=None)), 900)
+
+
+    def test_plot_silhouette(self):
+        rng = np.random.default_rng(0)
+        labels = rng.integers(0, 12, 5000)
+        clusters = Cluster({i:[f"S{j}" for j in np.flatnonzero(labels == i)] for i in range(12)})
+        values = rng.uniform(-1, 1, 5000)
+        for max_rows in [None, 100]:
+            fig, ax = plot_silhouette(clusters, values[np.argsort(labels, kind='stable')], 0.0, '1e-5', max_rows=max_rows)
+            self.assertEqual(len(ax.collections), 10)
+            num_rows = sum(len(c.get_paths()[0].vertices) for c in ax.collections)
+            if max_rows is None:
+                self.assertGreater(num_rows, 2 * (labels < 10).sum())
+            else:
+                self.assertLess(num_rows, 4 * max_rows)
+            y_max = max(c.get_paths()[0].vertices[:, 1].max() for c in ax.collections)
+            self.assertEqual(y_max, 10 * 10 + (labels < 10).sum() - 1)
+            plt.close(fig)
+
+        # bands follow the cluster ids, not the positions of the ids
+        clusters = Cluster({0:['A', 'B', 'C'], 2:['D', 'E'], 5:['F']})
+        fig, ax = plot_silhouette(clusters, np.array([0.5, -0.1, 0.3, 0.9, 0.7, 0.0]), 0.0, '1e-5')
+        self.assertEqual([text.get_position()[1] for text in ax.texts][:6], [11.5, 23, 34, 45, 55, 65.5])
+        plt.close(fig)
+
+
+    def test_figure_summary(self):
+        clusters = Cluster({0:['A', 'B', 'C'], 1:['D', 'E'], 2:['F']})
+        values = np.array([0.5, -0.1, 0.3, 0.9, 0.7, 0.0])
+        summary = figure_summary(clusters, (None, None, values), 1e-5, bins=3, num_rows=2)
+        self.assertEqual(summary['threshold'], '1e-05')
+        self.assertEqual(summary['sizes']['counts'], [1, 1, 1])
+        silhouette = summary['silhouette']
+        self.assertEqual([c['size'] for c in silhouette['clusters']], [3, 2, 1] + [0] * 7)
+        self.assertEqual(silhouette['clusters'][0]['values'], [-0.1, 0.5])
+        self.assertEqual(silhouette['clusters'][2]['values'], [0.0])
+        self.assertIsNone(figure_summary(clusters, (None, None, None), 1e-5)['silhouette'])
+
+        sizebar = sizebar_summary({1e-1:10, 1e-2:4}, 6)
+        self.assertEqual(sizebar, {'thresholds':['0.01', '0.1'], 'sizes':[4, 10], 'capacity':6})
+
+        measurement = [('A', 'B', 1e-10, 50.0, 100.0, 80.0), ('C', 'D', 1.0, 10.0, 400.0, 500.0)]
+        density = density_summary(measurement, bins=5)
+        self.assertEqual(np.array(density['counts']).sum(), 2)
+        self.assertEqual(np.array(density['npid_counts']).sum(axis=1).tolist(), [1, 0, 0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import functools
+import gzip
+import json
+import os
+import tempfile
+import zipfile
+import unittest
+import numpy as np
+import pandas as pd
+from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from ProtParts.Archive import Archive
+from ProtParts.Clustering import Cluster
+from ProtParts.Partitioning import Partitioning
+from ProtParts.utils import group_labels, write_cluster, write_label_matrix, write_measurement, write_partition, write_partition_split
+
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = Cluster({0:['A', 'B', 'C'], 1:['D'], 2:['E', 'F'], 3:['G']})
+        partitioner = Partitioning(num_partitions=3, num_sequences=7, method='greedy')
+        self.partitions = partitioner.partition(self.cluster)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_write_cluster_columnar(self):
+        out_file = os.path.join(self.tmp_dir.name, 'clusters.npz')
+        write_cluster(self.cluster, out_file, 'COLUMNAR')
+        with np.load(out_file) as data:
+            cluster_index = dict(zip(data['sequence_id'].tolist(), data['cluster_id'].tolist()))
+        self.assertEqual(cluster_index, self.cluster.index())
+
+
+    def test_write_partition_columnar(self):
+        out_file = os.path.join(self.tmp_dir.name, 'partitions.npz')
+        write_partition(self.partitions, out_file, 'COLUMNAR')
+        with np.load(out_file) as data:
+            self.assertTrue(np.issubdtype(data['partition_id'].dtype, np.integer))
+            rows = set(zip(data['sequence_id'].tolist(), data['cluster_id'].tolist(), data['partition_id'].tolist()))
+        expected = {(name, cidx, pidx) for pidx, par in self.partitions.items() for cidx, c in par.items() for name in c}
+        self.assertEqual(rows, expected)
+
+
+    def test_write_json(self):
+        for pretty in (False, True):
+            out_file = os.path.join(self.tmp_dir.name, 'partitions.json')
+            write_partition(self.partitions, out_file, 'json', pretty=pretty)
+            with open(out_file) as f:
+                text = f.read()
+            expected = {f"Partition_{pidx}":{f"Cluster_{cidx}":c for cidx, c in par.items()} for pidx, par in self.partitions.items()}
+            self.assertEqual(json.loads(text), expected)
+            self.assertEqual(text, json.dumps(expected, indent=4) if pretty else json.dumps(expected, separators=(',', ':')))
+
+
+    def test_write_partition_split(self):
+        sequences = {name:SeqRecord(Seq('M' * (i + 1)), id=name) for i, name in enumerate('ABCDEFG')}
+        out_files = write_partition_split(self.partitions, os.path.join(self.tmp_dir.name, 'example'), sequences, folds=True)
+        partition_index = {name:pidx for pidx, par in self.partitions.items() for c in par.values() for name in c}
+        for pidx, (valid_file, train_file) in out_files.items():
+            valid = [record.id for record in SeqIO.parse(valid_file, 'fasta')]
+            train = [record.id for record in SeqIO.parse(train_file, 'fasta')]
+            self.assertEqual(sorted(valid), sorted(name for name, p in partition_index.items() if p == pidx))
+            self.assertEqual(sorted(valid + train), sorted(sequences))
+
+
+    def test_write_label_matrix(self):
+        seq_ids = list('ABCDEFGH')
+        seq_index = dict(zip(seq_ids, range(len(seq_ids))))
+        labels = {'Cluster_0.1':group_labels(self.cluster.clusters, seq_index),
+                  'Partition_0.1':group_labels({pidx:[name for c in par.values() for name in c] for pidx, par in self.partitions.items()}, seq_index)}
+        self.assertEqual(labels['Cluster_0.1'].tolist(), [0, 0, 0, 1, 2, 2, 3, -1])
+
+        out_file = os.path.join(self.tmp_dir.name, 'labels.csv')
+        write_label_matrix(seq_ids, labels, out_file)
+        with open(out_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], 'SequenceID,Cluster_0.1,Partition_0.1')
+        self.assertEqual(lines[-1], 'H,-1,-1')
+        self.assertEqual(len(lines), len(seq_ids) + 1)
+
+
+    def test_archive_zip(self):
+        zip_file = os.path.join(self.tmp_dir.name, 'results.zip')
+        archive = Archive(self.tmp_dir.name, zip_file, compress='zip', num_workers=2)
+        link = archive.write('clusters.json', functools.partial(write_cluster, self.cluster, fmt='json'))
+        archive.write('partitions.npz', functools.partial(write_partition, self.partitions, fmt='columnar'), binary=True)
+        archive.close()
+        self.assertEqual(link, zip_file)
+        with zipfile.ZipFile(zip_file) as zipin:
+            self.assertEqual(sorted(zipin.namelist()), ['clusters.json', 'partitions.npz'])
+            self.assertEqual(len(json.loads(zipin.read('clusters.json'))), len(self.cluster))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['results.zip'])
+
+
+    def test_archive_gzip(self):
+        archive = Archive(self.tmp_dir.name, compress='gzip', num_workers=2)
+        links = [archive.write(f"clusters_{i}.csv", functools.partial(write_cluster, self.cluster, fmt='csv')) for i in range(3)]
+        archive.close()
+        for link in links:
+            with gzip.open(link, 'rt') as f:
+                self.assertEqual(len(f.readlines()), self.cluster.num_data(by='sum') + 1)
+
+
+    def test_write_measurement(self):
+        measurement = [('A', 'B', 0.0, 90.0, 100.0, 120.0), ('B', 'A', 0.0, 90.0, 120.0, 100.0),
+                       ('A', 'C', 1e-5, 60.0, 100.0, 250.0), ('D', 'A', 1e-3, 30.0, 400.0, 100.0),
+                       ('C', 'D', 1e-1, 40.0, 250.0, 400.0)]
+        out_file = write_measurement(measurement, self.tmp_dir.name, chunk_size=2)
+        data = pd.read_csv(out_file)
+        self.assertEqual(list(zip(data['qseqid'], data['sseqid'])), [('A', 'B'), ('A', 'C'), ('C', 'D')])
+        np.testing.assert_allclose(data['npid'], [0.9, 0.6, 0.16])
+        np.testing.assert_allclose(data['nloge'], [180, 5, 1])
+        self.assertEqual(data['sqlen_category'].tolist(), ['<100', '<100', '200-300'])
+
+
+if __name__ == '__main__':
+    unittest.main()